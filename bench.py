@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Headless benchmark: replay recorded video through the full tracking pipeline.
+
+Frames from a video file, URL, camera index or image sequence go through the
+real trackers (capture -> detection), Brain's aim logic and a simulated
+turret (sim_turret.py), so a change can be measured without a camera, brick
+or Arduino. Reports fps, per-stage latency percentiles, CPU, peak RSS,
+motor commands per target and time-to-fire, and writes them as JSON so runs
+can be compared across commits.
+
+    python bench.py --source clip.mp4 --kind face
+    python bench.py --source 'frames/*.jpg' --kind hotdog --json hotdog.json
+    python bench.py --source clip.mp4 --json after.json --compare before.json
+"""
+
+import argparse
+import contextlib
+import glob
+import importlib.util
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from brain import Brain
+from sim_turret import SimulatedTurretController
+from structured_logging import setup_logging, shutdown_logging
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+STAGES = ('capture', 'detect', 'aim', 'actuate', 'frame')
+
+
+def load_parse_source():
+    """robo-drink/camera.py's parse_source; the hyphenated directory is not importable as a package"""
+    path = os.path.join(REPO_DIR, 'robo-drink', 'camera.py')
+    spec = importlib.util.spec_from_file_location('robo_drink_camera', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.parse_source
+
+
+class StageTimer:
+    """Collects per-stage durations in milliseconds"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {stage: [] for stage in STAGES}
+
+    def record(self, stage, ms):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(ms)
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(stage, (time.perf_counter() - start) * 1000)
+        return timed
+
+
+class ReplayCapture:
+    """cv2.VideoCapture look-alike over a recorded source.
+
+    `source` is whatever parse_source returns: a camera index, a video
+    path/URL, or (as a string) an image directory or glob pattern.
+    """
+
+    def __init__(self, source, timer, realtime=False, max_frames=None):
+        self.timer = timer
+        self.realtime = realtime
+        self.max_frames = max_frames
+        self.images = None
+        self.cap = None
+        self.source_fps = None
+        if isinstance(source, str) and (os.path.isdir(source) or glob.has_magic(source)):
+            pattern = os.path.join(source, '*') if os.path.isdir(source) else source
+            self.images = sorted(p for p in glob.glob(pattern) if p.lower().endswith(IMAGE_EXTENSIONS))
+            if not self.images:
+                raise SystemExit(f"No images found for '{source}'")
+        else:
+            self.cap = cv2.VideoCapture(source)
+            if not self.cap.isOpened():
+                raise SystemExit(f"Could not open source '{source}'")
+            self.source_fps = self.cap.get(cv2.CAP_PROP_FPS) or None
+        self.frames_read = 0
+        self.exhausted = False
+        self.last_read_start = None
+        self._index = 0
+        self._next_due = None
+        self._lock = threading.Lock()
+        # Peek the first frame so the bench knows the frame size before anything runs
+        ret, self.first_frame = self._read_raw()
+        if not ret:
+            raise SystemExit(f"Could not read any frames from '{source}'")
+        self._pending = self.first_frame
+
+    def _read_raw(self):
+        if self.images is not None:
+            if self._index >= len(self.images):
+                return False, None
+            frame = cv2.imread(self.images[self._index])
+            self._index += 1
+            return frame is not None, frame
+        return self.cap.read()
+
+    def read(self):
+        with self._lock:
+            if self.exhausted or (self.max_frames is not None and self.frames_read >= self.max_frames):
+                self.exhausted = True
+                return False, None
+            if self.realtime and self.source_fps:
+                # Hold frames back to the recording's own rate, like a live camera
+                now = time.perf_counter()
+                if self._next_due is not None and now < self._next_due:
+                    time.sleep(self._next_due - now)
+                self._next_due = max(now, self._next_due or now) + 1.0 / self.source_fps
+            start = time.perf_counter()
+            if self._pending is not None:
+                ret, frame, self._pending = True, self._pending, None
+            else:
+                ret, frame = self._read_raw()
+            if not ret:
+                self.exhausted = True
+                return False, None
+            self.frames_read += 1
+            self.last_read_start = start
+            self.timer.record('capture', (time.perf_counter() - start) * 1000)
+            return ret, frame
+
+    def isOpened(self):
+        return not self.exhausted
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+
+
+class PipelineBench:
+    """Instruments a Brain built on a ReplayCapture and SimulatedTurretController, then runs it to the end"""
+
+    def __init__(self, brain, turret, capture, kind, timer, arm=True, tracker_fps=None, adaptive=False,
+                 motion_gate=True):
+        self.brain = brain
+        self.turret = turret
+        self.capture = capture
+        self.kind = kind
+        self.timer = timer
+        self.arm = arm
+        self.targets = []
+        self.target = None
+        self.frames = 0
+        self._lock = threading.Lock()
+
+        if kind == 'face':
+            self.tracker = brain.face_tracker
+            find_name, event, handler = 'find_faces', 'face_detected', brain._on_face_detected
+        else:
+            self.tracker = brain.hotdog_recognizer
+            find_name, event, handler = 'find_hotdogs', 'hotdog_detected', brain._on_hotdog_detected
+        if not motion_gate:
+            self.tracker.motion_gate = None
+        # Fixed-rate pacing unless the production adaptive pacer is asked for
+        self.tracker.pacer.full_fps = tracker_fps or 10000  # effectively unthrottled
+        self.tracker.pacer.adaptive = adaptive
+
+        # Model warm-up outside the measurement
+        getattr(self.tracker, find_name)(capture.first_frame)
+
+        setattr(self.tracker, find_name, timer.wrap('detect', getattr(self.tracker, find_name)))
+        # Re-register Brain's aim handler behind our target bookkeeping, timed
+        self.tracker.off(event, handler)
+        self.tracker.on(event, self._on_detected)
+        self.tracker.on(event, timer.wrap('aim', handler))
+        self.tracker.on('frame_ready', self._on_frame_ready)
+        turret.rotate_both = timer.wrap('actuate', turret.rotate_both)
+        turret_fire = turret.fire
+
+        def fire(*args, **kwargs):
+            turret_fire(*args, **kwargs)
+            self._close_target(fired=True)
+        turret.fire = fire
+
+    def _rotate_count(self):
+        return sum(1 for command in self.turret.commands if command['type'] == 'rotate')
+
+    def _on_detected(self, event):
+        with self._lock:
+            if self.target is None:
+                self.target = {
+                    'acquired_at': time.perf_counter(),
+                    'acquired_frame': self.frames,
+                    'rotations_at_start': self._rotate_count(),
+                }
+
+    def _close_target(self, fired):
+        with self._lock:
+            target, self.target = self.target, None
+        if target is None:
+            return
+        result = {
+            'fired': fired,
+            'commands': self._rotate_count() - target['rotations_at_start'],
+            'frames': self.frames - target['acquired_frame'] + 1,
+        }
+        if fired:
+            result['time_to_fire'] = time.perf_counter() - target['acquired_at']
+        self.targets.append(result)
+
+    def _on_frame_ready(self, event):
+        self.frames += 1
+        if self.capture.last_read_start is not None:
+            self.timer.record('frame', (time.perf_counter() - self.capture.last_read_start) * 1000)
+        if event['box'] is None and self.target is not None:
+            self._close_target(fired=False)
+
+    def _start(self):
+        self.brain.fireable = self.arm
+        if self.kind == 'face':
+            self.brain.start_tracking_faces()
+        else:
+            self.brain.start_tracking_hotdogs()
+
+    def run(self):
+        self._start()
+        while True:
+            self.tracker.thread.join()
+            if self.capture.exhausted:
+                break
+            # Brain stops tracking after a shot; re-arm for the next target like the next order would
+            self._start()
+        self._close_target(fired=False)
+
+
+def summarize(values):
+    if not values:
+        return None
+    values = np.asarray(values, dtype=float)
+    return {
+        'count': int(values.size),
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(values.max()),
+    }
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def peak_rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+
+def git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True, timeout=5)
+        return result.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_bench(args):
+    parse_source = load_parse_source()
+    timer = StageTimer()
+    capture = ReplayCapture(parse_source(args.source), timer, realtime=args.realtime, max_frames=args.frames)
+    turret = SimulatedTurretController(time_scale=args.motor_time_scale)
+    turret.sync_axes = not args.no_sync_axes
+
+    # Pipeline logging costs the same as in production when --verbose, nothing otherwise
+    setup_logging(level='DEBUG' if args.verbose else 'CRITICAL')
+    quiet = open(os.devnull, 'w') if not args.verbose else None
+    with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+        # Built-in tunables, so a local config file cannot skew the comparison
+        height, width = capture.first_frame.shape[:2]
+        brain = Brain(controller=turret, cap=capture, config_path=None, frame_size=(width, height))
+        # Cooldown on the same scaled clock the simulated solenoid uses
+        brain.fire_control.cooldown = turret.fire_cooldown * args.motor_time_scale
+        bench = PipelineBench(brain, turret, capture, args.kind, timer, arm=not args.no_arm,
+                              tracker_fps=args.tracker_fps, adaptive=args.adaptive,
+                              motion_gate=not args.no_motion_gate)
+
+        cpu_start = cpu_seconds()
+        start_time = time.perf_counter()
+        try:
+            bench.run()
+        except KeyboardInterrupt:
+            brain.stop()
+        elapsed = time.perf_counter() - start_time
+        cpu_used = cpu_seconds() - cpu_start
+        brain.destroy()
+    if quiet:
+        quiet.close()
+    shutdown_logging()
+
+    fired = [t for t in bench.targets if t['fired']]
+    fires = [c for c in turret.commands if c['type'] == 'fire']
+    return {
+        'commit': git_commit(),
+        'timestamp': time.time(),
+        'source': args.source,
+        'kind': args.kind,
+        'resolution': [width, height],
+        'frames': bench.frames,
+        'seconds': elapsed,
+        'fps': bench.frames / elapsed if elapsed > 0 else 0.0,
+        'cpu_seconds': cpu_used,
+        'cpu_percent': cpu_used / elapsed * 100 if elapsed > 0 else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'stages_ms': {stage: summarize(samples) for stage, samples in timer.samples.items()},
+        'pipeline_stages': brain.perf.snapshot()['stages'],
+        'motion_gate': brain.motion_gate_stats()[args.kind],
+        'targets': {
+            'count': len(bench.targets),
+            'fired': len(fired),
+            'commands_per_target': summarize([t['commands'] for t in bench.targets]),
+            'time_to_fire_s': summarize([t['time_to_fire'] for t in fired]),
+            'frames_to_fire': summarize([t['frames'] for t in fired]),
+        },
+        'commands': {
+            'rotate': sum(1 for c in turret.commands if c['type'] == 'rotate'),
+            'fire': len(fires),
+            'fire_suppressed': sum(1 for c in fires if c['suppressed']),
+        },
+    }
+
+
+def _fmt(value, spec='.1f'):
+    return format(value, spec) if value is not None else '-'
+
+
+def print_report(results):
+    print(f"🧪 {results['kind']} pipeline on {results['source']} "
+          f"({results['resolution'][0]}x{results['resolution'][1]}, commit {results['commit'] or '?'})")
+    print(f"   {results['frames']} frames in {results['seconds']:.1f}s = {results['fps']:.1f} fps, "
+          f"CPU {results['cpu_percent']:.0f}%, peak RSS {results['peak_rss_mb']:.0f} MB")
+    print(f"{'stage':>10} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for stage, summary in results['stages_ms'].items():
+        if summary:
+            print(f"{stage:>10} {summary['count']:>7} {summary['p50']:>8.2f} {summary['p95']:>8.2f} "
+                  f"{summary['p99']:>8.2f} {summary['max']:>8.2f}")
+    targets = results['targets']
+    commands = targets['commands_per_target'] or {}
+    time_to_fire = targets['time_to_fire_s'] or {}
+    frames_to_fire = targets['frames_to_fire'] or {}
+    print(f"🎯 {targets['count']} targets, {targets['fired']} fired, "
+          f"{_fmt(commands.get('mean'))} motor commands/target, "
+          f"time-to-fire p50 {_fmt(time_to_fire.get('p50'), '.2f')}s p95 {_fmt(time_to_fire.get('p95'), '.2f')}s "
+          f"({_fmt(frames_to_fire.get('p50'), '.0f')} frames)")
+
+
+def _metric_rows(results):
+    yield 'fps', results['fps']
+    yield 'cpu_percent', results['cpu_percent']
+    yield 'peak_rss_mb', results['peak_rss_mb']
+    for stage, summary in results['stages_ms'].items():
+        if summary:
+            yield f'{stage}_p50_ms', summary['p50']
+            yield f'{stage}_p95_ms', summary['p95']
+    for key in ('commands_per_target', 'time_to_fire_s', 'frames_to_fire'):
+        summary = results['targets'].get(key)
+        if summary:
+            yield f'{key}_p50', summary['p50']
+
+
+def print_comparison(baseline, results):
+    print(f"📊 Against {baseline.get('commit') or 'baseline'}:")
+    print(f"{'metric':>26} {'before':>10} {'after':>10} {'change':>8}")
+    before = dict(_metric_rows(baseline))
+    for name, value in _metric_rows(results):
+        if name not in before:
+            continue
+        old = before[name]
+        change = f"{(value - old) / old * 100:+.1f}%" if old else '-'
+        print(f"{name:>26} {old:>10.2f} {value:>10.2f} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded video through the tracking pipeline headlessly")
+    parser.add_argument("--source", required=True,
+                        help="Video path/URL, camera index, image directory or glob (e.g. 'frames/*.jpg')")
+    parser.add_argument("--kind", choices=["face", "hotdog"], default="face")
+    parser.add_argument("--frames", type=int, default=None, help="Stop after this many frames")
+    parser.add_argument("--realtime", action="store_true", help="Replay at the recording's frame rate")
+    parser.add_argument("--tracker-fps", type=int, default=None,
+                        help="Tracker loop rate (face tracker runs at 30, hotdog at 10 live); unthrottled if omitted")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Use the adaptive frame pacer (idle rate without a target) instead of a fixed rate")
+    parser.add_argument("--no-motion-gate", action="store_true", help="Run inference on every frame")
+    parser.add_argument("--motor-time-scale", type=float, default=1.0,
+                        help="Scale simulated motor travel time; 0 makes moves instantaneous")
+    parser.add_argument("--no-sync-axes", action="store_true",
+                        help="Send pan/tilt at their requested powers instead of synchronizing arrival")
+    parser.add_argument("--no-arm", action="store_true", help="Track without arming, so nothing fires")
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    parser.add_argument("--compare", default=None, help="Baseline JSON from an earlier run to diff against")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's own logging")
+    args = parser.parse_args()
+
+    results = run_bench(args)
+    print_report(results)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"📄 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
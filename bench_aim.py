@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the per-event aim cost: detection error -> motor command.
+
+Compares the original handler arithmetic (map_range closure rebuilt on every
+event), the policy curve evaluated in floating point, and the lookup tables
+Brain actually uses. Before timing, every pixel error in the frame is checked
+to give bit-identical commands on all three paths.
+
+    python bench_aim.py
+    python bench_aim.py --events 500000 --width 640 --height 360 --json aim.json
+"""
+
+import argparse
+import json
+import random
+import time
+
+from targeting import default_policies
+
+
+def legacy_aim(x, y, center_x, center_y, dead_zone):
+    """The face/hotdog handler arithmetic before targeting policies, verbatim"""
+    MIN_POWER_PAN = 18
+    MAX_POWER_PAN = 100
+    MIN_POWER_TILT = 18
+    MAX_POWER_TILT = 100
+    MIN_STEP_PAN_DEG = 1
+    MAX_STEP_PAN_DEG = 20
+    MIN_STEP_TILT_DEG = 1
+    MAX_STEP_TILT_DEG = 10
+    DEAD_X = dead_zone
+    DEAD_Y = dead_zone
+    MAX_DX = max(center_x, 1)
+    MAX_DY = max(center_y, 1)
+
+    def map_range(val, in_min, in_max, out_min, out_max):
+        if in_max <= in_min:
+            return out_min
+        t = max(0.0, min(1.0, (val - in_min) / (in_max - in_min)))
+        return out_min + t * (out_max - out_min)
+
+    pan_power = pan_angle = tilt_power = tilt_angle = 0
+    dx = x - center_x
+    if abs(dx) > DEAD_X:
+        mag = abs(dx)
+        scaled_power = map_range(mag, DEAD_X, MAX_DX, MIN_POWER_PAN, MAX_POWER_PAN)
+        scaled_step = map_range(mag, DEAD_X, MAX_DX, MIN_STEP_PAN_DEG, MAX_STEP_PAN_DEG)
+        pan_power = -int(round(scaled_power)) if dx > 0 else int(round(scaled_power))
+        pan_angle = int(round(scaled_step))
+    dy = y - center_y
+    if abs(dy) > DEAD_Y:
+        mag = abs(dy)
+        scaled_power = map_range(mag, DEAD_Y, MAX_DY, MIN_POWER_TILT, MAX_POWER_TILT)
+        scaled_step = map_range(mag, DEAD_Y, MAX_DY, MIN_STEP_TILT_DEG, MAX_STEP_TILT_DEG)
+        tilt_power = -int(round(scaled_power)) if dy < 0 else int(round(scaled_power))
+        tilt_angle = int(round(scaled_step))
+    return pan_power, pan_angle, tilt_power, tilt_angle
+
+
+def check_identical(policy, center_x, center_y):
+    """Compare all three paths for every pixel error on each axis (plus some off-frame)"""
+    margin = 2 * policy.dead_zone + 10
+    for x in range(-margin, 2 * center_x + margin):
+        dx = x - center_x
+        expected = legacy_aim(x, center_y, center_x, center_y, policy.dead_zone)
+        float_path = policy.pan.compute(dx) + policy.tilt.compute(0)
+        if policy.aim(dx, 0) != expected or float_path != expected:
+            raise SystemExit(f"{policy.name}: pan error {dx} differs: {policy.aim(dx, 0)} vs {expected}")
+    for y in range(-margin, 2 * center_y + margin):
+        dy = y - center_y
+        expected = legacy_aim(center_x, y, center_x, center_y, policy.dead_zone)
+        float_path = policy.pan.compute(0) + policy.tilt.compute(dy)
+        if policy.aim(0, dy) != expected or float_path != expected:
+            raise SystemExit(f"{policy.name}: tilt error {dy} differs: {policy.aim(0, dy)} vs {expected}")
+
+
+def time_ns_per_event(fn, points):
+    start = time.perf_counter_ns()
+    for x, y in points:
+        fn(x, y)
+    return (time.perf_counter_ns() - start) / len(points)
+
+
+def bench(policy, center_x, center_y, points, repeats):
+    paths = {
+        "legacy": lambda x, y: legacy_aim(x, y, center_x, center_y, policy.dead_zone),
+        "float_curve": lambda x, y: policy.pan.compute(x - center_x) + policy.tilt.compute(y - center_y),
+        "lookup_table": lambda x, y: policy.aim(*policy.error(x, y)),
+    }
+    # Best of several runs; the minimum is the least disturbed by the rest of the machine
+    return {name: round(min(time_ns_per_event(fn, points) for _ in range(repeats)), 1) for name, fn in paths.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-event aim mapping cost")
+    parser.add_argument("--events", type=int, default=200000, help="Detections per timed run")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    center_x, center_y = args.width // 2, args.height // 2
+    rng = random.Random(0)
+    points = [(rng.randrange(args.width), rng.randrange(args.height)) for _ in range(args.events)]
+
+    results = {}
+    for kind, policy in default_policies().items():
+        policy.bind(center_x, center_y)
+        check_identical(policy, center_x, center_y)
+        results[kind] = bench(policy, center_x, center_y, points, args.repeats)
+
+    print(f"🎯 aim mapping, {args.width}x{args.height}, {args.events} events, best of {args.repeats} (bit-identical ✓)")
+    print(f"{'class':>8} {'legacy ns':>10} {'float ns':>10} {'table ns':>10} {'speedup':>8}")
+    for kind, timings in results.items():
+        speedup = timings['legacy'] / timings['lookup_table']
+        print(f"{kind:>8} {timings['legacy']:>10} {timings['float_curve']:>10} {timings['lookup_table']:>10} "
+              f"{speedup:>7.1f}x")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"width": args.width, "height": args.height, "events": args.events, "ns_per_event": results},
+                      f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Dispense throughput benchmark: orders per minute, shot by shot vs planned
+vs planned with one valve per condiment (volleys).
+
+Runs a batch of orders through the real DispenseScheduler, Brain and fire
+control against the simulated turret (sim_turret.py). Instead of a camera,
+one synthetic feeder per target class publishes detections at the tracker
+frame rate, with the pixel error derived from where the simulated motors
+are relative to the target's pan/tilt position, so aiming, dwell, firing,
+homing and cooldown all take their real time.
+
+    python bench_dispense.py
+    python bench_dispense.py --orders 10 --condiments ketchup mustard relish --face-index 1
+    python bench_dispense.py --mode planned --json dispense.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from brain import Brain
+from dispense_queue import CANCELLED, DONE, FAILED, DispenseScheduler
+from sim_turret import SimulatedTurretController
+from structured_logging import setup_logging, shutdown_logging
+
+MODES = ('legacy', 'planned', 'valves')
+
+
+class StaticCapture:
+    """Stands in for the camera; the feeders replace the trackers, so frames are never read"""
+
+    def __init__(self, width=1920, height=1080):
+        self.frame = np.zeros((height, width, 3), dtype=np.uint8)
+
+    def read(self):
+        return True, self.frame
+
+    def isOpened(self):
+        return True
+
+    def get(self, prop):
+        return 0
+
+    def release(self):
+        pass
+
+
+class SyntheticFeeder:
+    """Publishes detections of a target fixed at (pan, tilt) degrees while its tracker is started"""
+
+    def __init__(self, kind, tracker, turret, target, center, px_per_deg=12.0, fps=30):
+        self.kind = kind
+        self.tracker = tracker
+        self.turret = turret
+        self.target = target
+        self.center = center
+        self.px_per_deg = px_per_deg
+        self.interval = 1.0 / fps
+        self.active = False
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        # The feeder is the tracker: Brain's start/stop_tracking switch it on and off
+        tracker.start_tracking = lambda: setattr(self, 'active', True)
+        tracker.stop_tracking = lambda: setattr(self, 'active', False)
+
+    def _run(self):
+        while self.running:
+            if self.active:
+                now = time.monotonic()
+                pan = self.turret.pan_motor.tacho_at(now)
+                tilt = self.turret.tilt_motor.tacho_at(now)
+                # Pan moves against the pixel error and tilt with it (targeting.PAN_SIGN / TILT_SIGN)
+                dx = (pan - self.target[0]) * self.px_per_deg
+                dy = (self.target[1] - tilt) * self.px_per_deg
+                x, y = int(self.center[0] + dx), int(self.center[1] + dy)
+                self.tracker.emit(f'{self.kind}_detected', {'coordinates': (x, y), 'box': (x - 40, y - 40, x + 40, y + 40)})
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        self.thread.join(timeout=1.0)
+
+
+def run_mode(mode, args):
+    turret = SimulatedTurretController(cooldown=args.cooldown)
+    brain = Brain(controller=turret, cap=StaticCapture(), config_path=None)
+    # 'valves' puts every condiment on its own solenoid channel
+    condiments = dict.fromkeys(args.condiments)
+    valves = {condiment: channel % turret.valve_channels for channel, condiment in enumerate(condiments)}
+    brain.dispense_settings = dict(brain.dispense_settings, planned=mode != 'legacy',
+                                   valves=valves if mode == 'valves' else {})
+    center = (brain.center_x, brain.center_y)
+    feeders = [SyntheticFeeder('face', brain.face_tracker, turret, args.face_at, center, fps=args.fps),
+               SyntheticFeeder('hotdog', brain.hotdog_recognizer, turret, args.hotdog_at, center, fps=args.fps)]
+    for feeder in feeders:
+        feeder.thread.start()
+    scheduler = DispenseScheduler(brain, state_file=None, target_timeout=args.target_timeout)
+    finished = threading.Semaphore(0)
+    scheduler.on('job_updated', lambda job: job['status'] in (DONE, FAILED, CANCELLED) and finished.release())
+    scheduler.start()
+
+    start = time.monotonic()
+    jobs = [scheduler.submit(args.condiments, face_index=args.face_index) for _ in range(args.orders)]
+    for _ in jobs:
+        finished.acquire()
+    elapsed = time.monotonic() - start
+
+    scheduler.stop()
+    for feeder in feeders:
+        feeder.stop()
+    brain.destroy()
+
+    shots = [c for c in turret.commands if c['type'] == 'fire']
+    done = [job for job in jobs if job.status == DONE]
+    return {
+        'orders': args.orders,
+        'done': len(done),
+        'seconds': round(elapsed, 2),
+        'orders_per_minute': round(len(done) / elapsed * 60, 2) if elapsed > 0 else 0.0,
+        'shots': len(shots),
+        'suppressed_shots': sum(1 for c in shots if c['suppressed']),
+        'moves': sum(1 for c in turret.commands if c['type'] == 'rotate'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Orders per minute through the dispense pipeline on a simulated turret")
+    parser.add_argument('--mode', choices=MODES + ('both',), default='both')
+    parser.add_argument('--orders', type=int, default=3)
+    parser.add_argument('--condiments', nargs='+', default=['ketchup', 'mustard', 'relish'])
+    parser.add_argument('--face-index', type=int, default=1, help="Condiment aimed at the face (-1 for none)")
+    parser.add_argument('--face-at', type=float, nargs=2, default=(40, 10), metavar=('PAN', 'TILT'))
+    parser.add_argument('--hotdog-at', type=float, nargs=2, default=(-30, -5), metavar=('PAN', 'TILT'))
+    parser.add_argument('--cooldown', type=float, default=5.0, help="Turret fire cooldown in seconds")
+    parser.add_argument('--fps', type=float, default=30, help="Synthetic detections per second")
+    parser.add_argument('--target-timeout', type=float, default=30.0)
+    parser.add_argument('--json', help="Also write the results to this file")
+    parser.add_argument('--verbose', action='store_true', help="Keep Brain's console output and debug logging")
+    args = parser.parse_args()
+    if args.face_index < 0:
+        args.face_index = None
+
+    setup_logging(level='DEBUG' if args.verbose else 'CRITICAL')
+    results = {}
+    for mode in (MODES if args.mode == 'both' else (args.mode,)):
+        quiet = open(os.devnull, 'w') if not args.verbose else None
+        with contextlib.redirect_stdout(quiet) if quiet else contextlib.nullcontext():
+            results[mode] = run_mode(mode, args)
+        if quiet:
+            quiet.close()
+        print(f"{mode:8s} {results[mode]['orders_per_minute']:6.2f} orders/min  "
+              f"({results[mode]['done']}/{args.orders} orders in {results[mode]['seconds']}s, "
+              f"{results[mode]['shots']} shots, {results[mode]['moves']} moves)")
+    shutdown_logging()
+    if 'legacy' in results and results['legacy']['orders_per_minute']:
+        for mode in results:
+            if mode != 'legacy':
+                speedup = results[mode]['orders_per_minute'] / results['legacy']['orders_per_minute']
+                print(f"{mode} is {speedup:.2f}x legacy")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark the inference pool: detector throughput (fps) against worker count.
+
+    python bench_inference_pool.py --kind face --workers 1 2 4
+    python bench_inference_pool.py --kind hotdog --source clip.mp4 --frames 300 --json pool.json
+"""
+
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from inference_pool import InferencePool
+
+
+def load_frames(source, count, shape):
+    """Load `count` frames from a video/image source, or synthesize noise frames"""
+    if source is None:
+        rng = np.random.default_rng(0)
+        return [rng.integers(0, 255, size=shape, dtype=np.uint8) for _ in range(min(count, 16))]
+    cap = cv2.VideoCapture(source)
+    frames = []
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    if not frames:
+        raise SystemExit(f"Could not read any frames from '{source}'")
+    return frames
+
+
+def bench_workers(kind, workers, frames, total):
+    pool = InferencePool(kind, workers=workers, frame_shape=frames[0].shape)
+    pool.start()
+    try:
+        # Warm-up so model initialisation does not count
+        for i in range(workers):
+            pool.submit(frames[i % len(frames)], block=True)
+        list(pool.drain())
+
+        infer_ms = []
+        start_time = time.perf_counter()
+        for i in range(total):
+            pool.submit(frames[i % len(frames)], block=True)
+            infer_ms.extend(ms for _, _, ms in pool.results())
+        infer_ms.extend(ms for _, _, ms in pool.drain())
+        elapsed = time.perf_counter() - start_time
+    finally:
+        pool.stop()
+
+    return {
+        'workers': workers,
+        'frames': total,
+        'seconds': elapsed,
+        'fps': total / elapsed,
+        'infer_ms_p50': float(np.percentile(infer_ms, 50)) if infer_ms else None,
+        'infer_ms_p95': float(np.percentile(infer_ms, 95)) if infer_ms else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure inference pool fps against worker count")
+    parser.add_argument("--kind", choices=["face", "hotdog"], default="face")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--frames", type=int, default=200, help="Frames to run per worker count")
+    parser.add_argument("--source", default=None, help="Video/image path; synthetic frames if omitted")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--json", default=None, help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    frames = load_frames(args.source, args.frames, (args.height, args.width, 3))
+    print(f"🧪 {args.kind} pool benchmark: {args.frames} frames of {frames[0].shape[1]}x{frames[0].shape[0]}, "
+          f"{os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'fps':>8} {'speedup':>8} {'p50 ms':>8} {'p95 ms':>8}")
+
+    results = []
+    for workers in args.workers:
+        result = bench_workers(args.kind, workers, frames, args.frames)
+        results.append(result)
+        speedup = result['fps'] / results[0]['fps']
+        print(f"{workers:>8} {result['fps']:>8.1f} {speedup:>7.2f}x "
+              f"{result['infer_ms_p50'] or 0:>8.1f} {result['infer_ms_p95'] or 0:>8.1f}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'kind': args.kind, 'cpus': os.cpu_count(), 'results': results}, f, indent=2)
+        print(f"📄 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,61 +1,250 @@
 import asyncio
 import threading
-from face_tracker import FaceTracker
 from turret import PanTiltTurretController
 from nxt.motor import Port
 import math
 import cv2
-from hotdog_recognizer import HotdogRecognizer
 from event_system import EventEmitter
+from video_stream import MJPEGStreamer
+from detection_store import DetectionStore
+from targeting import default_policies
+from config_store import ConfigStore, DEFAULT_CONFIG_FILE, check_number
+from face_identity import FaceIdentityService, FaceTrackIdentities
+from dispense_planner import DEFAULT_SETTINGS as DISPENSE_SETTINGS, check_settings, plan_shots
+from fire_control import FireControl, FIRING, LOCKED
+from perf import PerfRecorder
+from telemetry_recorder import TelemetryRecorder
+from structured_logging import get_logger
+from overlay import render_overlay
+from ipc_transport import CapturePublisher, IPCEventServer, SharedFrameBuffer, DEFAULT_SOCKET_PATH
 import time
 
+log = get_logger('brain')
 
-class Brain:
-    def __init__(self, face_threshold_distance=150, glizzy_threshold_distance=100):
-        # Initialize turret controller with retry logic
-        try:
-            print("🔌 Initializing turret controller...")
-            self.controller = PanTiltTurretController(Port.B, Port.A)
-            print("✅ Turret controller initialized successfully")
-        except Exception as e:
-            print(f"🚨 FATAL ERROR: Failed to initialize turret controller: {e}")
-            print("🚨 Brain cannot start without turret controller")
-            print("🛑 Exiting program...")
-            raise SystemExit(f"Brain initialization failed: {e}")
-            
-        self.face_threshold_distance = face_threshold_distance
-        self.glizzy_threshold_distance = glizzy_threshold_distance
-        self.cap = cv2.VideoCapture(2) #1920x1080
-        self.center_x = 960
-        self.center_y = 540
-        self.face_tracker = FaceTracker(self.cap)
-        self.hotdog_recognizer = HotdogRecognizer(self.cap)
+# Tracker settings kept in the config file when the trackers run in detector workers (FaceTracker/HotdogRecognizer defaults)
+REMOTE_TRACKER_SETTINGS = {'face': {'fps': 30, 'confidence': 0.6}, 'hotdog': {'fps': 10, 'confidence': 0.0}}
+
+
+class Brain(EventEmitter):
+    def __init__(self, face_threshold_distance=150, glizzy_threshold_distance=100, remote_detection=False,
+                 ipc_socket_path=DEFAULT_SOCKET_PATH, controller=None, cap=None, config_path=DEFAULT_CONFIG_FILE,
+                 frame_size=(1920, 1080)):
+        """`controller` and `cap` replace the NXT turret and camera (e.g. bench.py's simulated ones).
+
+        `frame_size` (width, height) of the camera's frames sets the aim center the target policies are bound to.
+
+        Tunables are loaded from (and hot reloaded from) `config_path`; None keeps the built-in defaults.
+        """
+        super().__init__()
+        # State pushed to clients via 'state_changed' (see state_stream.py)
+        self._fireable = False
+        self._release_time = 0.5
+        self._current_mode = None
+        self.last_motor_command = None
+        self.detections = DetectionStore()
+        self.perf = PerfRecorder()
+
+        # Turret controller: the NXT brick (with retry logic) unless one is injected
+        if controller is not None:
+            self.controller = controller
+        else:
+            self.controller = self._init_controller()
+        self.controller.perf = self.perf
+        for event in ('homing_started', 'homing_progress', 'homing_done', 'homing_cancelled', 'homing_failed'):
+            self.controller.homing.on(event, lambda _: self.emit('state_changed', 'homing'))
+        # Searching/tracking/locked/firing/homing/cooldown, with shots scheduled on the monotonic clock
+        self.fire_control = FireControl(cooldown=getattr(self.controller, 'fire_cooldown', 5.0))
+        self.fire_control.on('fire', self._fire_at)
+        self.fire_control.on('home', self._go_home)
+        self.fire_control.on('transition', lambda _: self.emit('state_changed', 'fire_control'))
+        for event in ('homing_done', 'homing_cancelled', 'homing_failed'):
+            self.controller.homing.on(event, self._on_homing_finished)
+        self.fire_control.start()
+        self._shot_fired = threading.Event()  # set on every shot; dispense_sequence waits on it
+        self.dispense_settings = dict(DISPENSE_SETTINGS)
+        # Tacho, commands and target error at the telemetry tick, for offline replay
+        self.telemetry_recorder = TelemetryRecorder(self.controller)
+        self.telemetry_recorder.start()
+
+        self.cap = cap if cap is not None else cv2.VideoCapture(2) #1920x1080
+        self.center_x = frame_size[0] // 2
+        self.center_y = frame_size[1] // 2
+        # Dead zones, dwell and motor curves per target class (see targeting.py)
+        self.policies = {kind: policy.bind(self.center_x, self.center_y) for kind, policy in
+                         default_policies(face_threshold_distance, glizzy_threshold_distance).items()}
+        # With remote detection the YOLO models live only in the detector workers
+        self.remote_detection = remote_detection
+        self.face_tracker = None
+        self.hotdog_recognizer = None
+        if not remote_detection:
+            from face_tracker import FaceTracker
+            from hotdog_recognizer import HotdogRecognizer
+            self.face_tracker = FaceTracker(self.cap, detection_store=self.detections, perf=self.perf)
+            self.hotdog_recognizer = HotdogRecognizer(self.cap, detection_store=self.detections, perf=self.perf)
+        self._register_motion_gate_metrics()
+        self.face_identity = None  # FaceIdentityService, loaded on the first identity-gated order
+        # Runtime tunables; registering reads the current values as defaults
+        self.config = ConfigStore(config_path)
+        self._register_config()
+        self.config.start()
         self.fireable = False
         self.release_time = 0.5  # Default release time in seconds
+        self.video_streamer = MJPEGStreamer()
         
         # Store home position (initial turret position)
         self.home_pan_position = None
         self.home_tilt_position = None
         self._store_home_position()
         
-        self._setup_event_listeners()
-
         self.running = False
         
         # Current detection data
         self.current_mode = None  # 'face' or 'hotdog'
         
-        # Hotdog firing delay tracking
-        self.hotdog_center_start_time = None
-        self.hotdog_fire_delay = 1.0  # 1 second delay before firing
-        self.hotdog_in_center = False
-        self.hotdog_firing_in_progress = False  # Flag to disable movement during firing
+
+        # Remote detection: detector_worker.py processes run inference and publish over IPC
+        self.ipc_server = None
+        self.frame_buffer = None
+        self.capture_publisher = None
+        if remote_detection:
+            self._setup_remote_detection(ipc_socket_path)
+        else:
+            self._setup_event_listeners()
+
+    @property
+    def fireable(self):
+        return self._fireable
+
+    @fireable.setter
+    def fireable(self, value):
+        if value != self._fireable:
+            self._fireable = value
+            self.fire_control.arm(value)
+            # Armed means a shot is wanted soon: run the loops at full rate
+            for pacer in self._pacers():
+                pacer.boost(value)
+            self.emit('state_changed', 'fireable')
+
+    @property
+    def release_time(self):
+        return self._release_time
+
+    @release_time.setter
+    def release_time(self, value):
+        if value != self._release_time:
+            self._release_time = value
+            self.fire_control.release_time = value
+            self.emit('state_changed', 'release_time')
+
+    @property
+    def current_mode(self):
+        return self._current_mode
+
+    @current_mode.setter
+    def current_mode(self, value):
+        if value != self._current_mode:
+            self._current_mode = value
+            self.emit('state_changed', 'mode')
+
+    @property
+    def face_threshold_distance(self):
+        return self.policies['face'].dead_zone
+
+    @property
+    def glizzy_threshold_distance(self):
+        return self.policies['hotdog'].dead_zone
+
+    def _trackers(self):
+        """Local tracking loops by kind; empty with remote detection"""
+        if self.remote_detection:
+            return {}
+        return {'face': self.face_tracker, 'hotdog': self.hotdog_recognizer}
+
+    def _pacers(self):
+        pacers = []
+        for name in ('face_tracker', 'hotdog_recognizer', 'capture_publisher'):
+            owner = getattr(self, name, None)
+            if owner is not None:
+                pacers.append(owner.pacer)
+        return pacers
+
+    def _register_motion_gate_metrics(self):
+        for kind, tracker in self._trackers().items():
+            gate = tracker.motion_gate
+            if gate is None:
+                continue
+            self.perf.gauge('ketchup_bot_motion_gate_skip_ratio', 'Fraction of frames the motion gate kept from the detector',
+                            lambda gate=gate: gate.skip_ratio, detector=kind)
+            self.perf.gauge('ketchup_bot_motion_gate_skipped_frames_total', 'Frames that skipped inference',
+                            lambda gate=gate: gate.skipped, metric_type='counter', detector=kind)
+            self.perf.gauge('ketchup_bot_motion_gate_cpu_saved_seconds', 'Estimated inference time avoided by the motion gate',
+                            lambda gate=gate: gate.cpu_saved_seconds, detector=kind)
+
+    def motion_gate_stats(self):
+        """Skip ratio and estimated CPU saved by each tracker's motion gate"""
+        return {kind: tracker.motion_gate.stats() if tracker.motion_gate is not None else None
+                for kind, tracker in self._trackers().items()}
+
+    def pacing_stats(self):
+        """Current adaptive frame rate of each capture/tracking loop"""
+        stats = {kind: tracker.pacer.stats() for kind, tracker in self._trackers().items()}
+        if self.capture_publisher:
+            stats["capture"] = self.capture_publisher.pacer.stats()
+        return stats
+
+    def get_state(self):
+        """Snapshot of everything the kiosk displays"""
+        return {
+            "fireable": self.fireable,
+            "tracking_mode": self.current_mode,
+            "release_time": self.release_time,
+            "detection": self.detections.latest(self.current_mode) if self.current_mode else None,
+            "motor": self.last_motor_command,
+            "fire_control": self.fire_control.state,
+            "homing": self.controller.homing.status(),
+            "motors": self.controller.telemetry.latest(),
+            "timestamp": time.time(),
+        }
+
+    def _record_detection(self, kind, event):
+        # Local trackers write the detection store themselves; remote detections only arrive here
+        if self.remote_detection:
+            if event is None:
+                self.detections.clear(kind)
+            else:
+                self.detections.update(kind, event['box'], event['coordinates'])
+                if self.capture_publisher:
+                    self.capture_publisher.pacer.note_target()
+        self.emit('state_changed', 'detection')
+
+    def _rotate_both(self, pan_power, pan_angle, tilt_power, tilt_angle, trace=None):
+        self.controller.rotate_both(pan_power, pan_angle, tilt_power, tilt_angle)
+        if trace is not None:
+            trace.mark('motor_command')
+        self.last_motor_command = {
+            "pan_power": pan_power,
+            "pan_angle": pan_angle,
+            "tilt_power": tilt_power,
+            "tilt_angle": tilt_angle,
+        }
+        self.emit('state_changed', 'motor')
+
+    def _init_controller(self):
+        try:
+            print("🔌 Initializing turret controller...")
+            controller = PanTiltTurretController(Port.B, Port.A)
+            print("✅ Turret controller initialized successfully")
+            return controller
+        except Exception as e:
+            print(f"🚨 FATAL ERROR: Failed to initialize turret controller: {e}")
+            print("🚨 Brain cannot start without turret controller")
+            print("🛑 Exiting program...")
+            raise SystemExit(f"Brain initialization failed: {e}")
 
     def _store_home_position(self):
         """Store the current turret position as the home position"""
         try:
-            pan_tacho = self.controller.pan_motor.get_tacho().tacho_count
-            tilt_tacho = self.controller.tilt_motor.get_tacho().tacho_count
+            pan_tacho, tilt_tacho = self.controller.positions()
             self.home_pan_position = pan_tacho
             self.home_tilt_position = tilt_tacho
             print(f"🏠 Home position stored - Pan: {pan_tacho}, Tilt: {tilt_tacho}")
@@ -71,258 +260,281 @@ class Brain:
         self.hotdog_recognizer.on('hotdog_lost', self._on_hotdog_lost)
         self.face_tracker.on('error', self._on_error)
         self.hotdog_recognizer.on('error', self._on_error)
+        self.face_tracker.on('frame_ready', self._on_frame_ready)
+        self.hotdog_recognizer.on('frame_ready', self._on_frame_ready)
+
+    def _setup_remote_detection(self, socket_path):
+        """Share camera frames through shared memory and receive detections from worker processes"""
+        ret, frame = self.cap.read()
+        shape = frame.shape if ret else (self.center_y * 2, self.center_x * 2, 3)
+        self.frame_buffer = SharedFrameBuffer(create=True, shape=shape)
+        self.ipc_server = IPCEventServer(socket_path, frame_buffer=self.frame_buffer)
+        # Workers publish all the time; only forward events for the active mode
+        self.ipc_server.on('face_detected', lambda event: self.current_mode == 'face' and self._on_face_detected(event))
+        self.ipc_server.on('face_lost', lambda event: self.current_mode == 'face' and self._on_face_lost(event))
+        self.ipc_server.on('hotdog_detected', lambda event: self.current_mode == 'hotdog' and self._on_hotdog_detected(event))
+        self.ipc_server.on('hotdog_lost', lambda event: self.current_mode == 'hotdog' and self._on_hotdog_lost(event))
+        self.ipc_server.on('error', self._on_error)
+        self.ipc_server.start()
+        self.capture_publisher = CapturePublisher(self.cap, self.frame_buffer)
+        self.capture_publisher.on('frame_ready', self._on_frame_ready)
+        self.capture_publisher.start()
+        print(f"🔌 Remote detection enabled - waiting for detector workers on {socket_path}")
 
     def _on_face_detected(self, event):
-        x, y = event['coordinates']
-        print(f"Face detected at {x}, {y}")
+        self._on_target_detected('face', event)
 
-        #if face is in dead zone, fire solenoid
-        if self.fireable and abs(x - self.center_x) < self.face_threshold_distance and abs(y - self.center_y) < self.face_threshold_distance:
-            print(f"Face is in dead zone, FIRE (release_time={self.release_time}s)")
-            self.controller.fire(release_time=self.release_time)
-            self.fireable = False
-            # Stop tracking after firing
-            self.face_tracker.stop_tracking()
-            self.current_mode = None
-            self.controller.reset(self.home_pan_position, self.home_tilt_position)
-
-        # --- tunables (play with these) ---
-        MIN_POWER_PAN  = 18    # barely enough to overcome friction
-        MAX_POWER_PAN  = 100
-        MIN_POWER_TILT = 18
-        MAX_POWER_TILT = 100
-
-        MIN_STEP_PAN_DEG  = 1  # small taps when close
-        MAX_STEP_PAN_DEG  = 20 # bigger chunks when far
-        MIN_STEP_TILT_DEG = 1
-        MAX_STEP_TILT_DEG = 10
-
-        # Use your dead zone as a threshold; nothing happens inside it
-        DEAD_X = self.face_threshold_distance
-        DEAD_Y = self.face_threshold_distance
-
-        # Estimate max possible error as distance from center to edge
-        # (assuming center_x/center_y are half-width/half-height)
-        MAX_DX = max(self.center_x, 1)
-        MAX_DY = max(self.center_y, 1)
-
-        def map_range(val, in_min, in_max, out_min, out_max):
-            # linear map with clamping
-            if in_max <= in_min:
-                return out_min
-            t = max(0.0, min(1.0, (val - in_min) / (in_max - in_min)))
-            return out_min + t * (out_max - out_min)
-
-        pan_power = 0
-        pan_angle = 0
-        tilt_power = 0
-        tilt_angle = 0
-
-        # Horizontal (pan)
-        dx = x - self.center_x
-        if abs(dx) > DEAD_X:
-            # scale power & step by how far past the dead zone we are
-            mag = abs(dx)
-            scaled_power = map_range(mag, DEAD_X, MAX_DX, MIN_POWER_PAN, MAX_POWER_PAN)
-            scaled_step  = map_range(mag, DEAD_X, MAX_DX, MIN_STEP_PAN_DEG, MAX_STEP_PAN_DEG)
-
-            if dx > 0:
-                print("Face is to the left")
-                pan_power = -int(round(scaled_power))   # negative = counter the left offset (clockwise per your comment)
-            else:
-                print("Face is to the right")
-                pan_power = int(round(scaled_power))
-
-            pan_angle = int(round(scaled_step))
-
-        # Vertical (tilt)
-        dy = y - self.center_y
-        if abs(dy) > DEAD_Y:
-            mag = abs(dy)
-            scaled_power = map_range(mag, DEAD_Y, MAX_DY, MIN_POWER_TILT, MAX_POWER_TILT)
-            scaled_step  = map_range(mag, DEAD_Y, MAX_DY, MIN_STEP_TILT_DEG, MAX_STEP_TILT_DEG)
-
-            if dy < 0:
-                print("Face is above")
-                tilt_power = -int(round(scaled_power))  # negative = up (per your comment)
-            else:
-                print("Face is below")
-                tilt_power = int(round(scaled_power))
+    def _on_face_lost(self, event):
+        self._on_target_lost('face')
 
-            tilt_angle = int(round(scaled_step))
+    def _on_hotdog_detected(self, event):
+        self._on_target_detected('hotdog', event)
 
+    def _on_hotdog_lost(self, event):
+        self._on_target_lost('hotdog')
+
+    def _on_target_detected(self, kind, event):
+        """Aim at and, once armed and centered for the policy's dwell time, fire on a detection"""
+        trace = event.get('trace')
+        if trace is not None:
+            trace.mark('dispatch')
+        policy = self.policies[kind]
+        x, y = event['coordinates']
+        log.debug(f'{kind}_detected', x=x, y=y, track_id=event.get('track_id'))
+        self._record_detection(kind, event)
+
+        dx, dy = policy.error(x, y)
+        self.telemetry_recorder.note_error((dx, dy))
+        # Fire control schedules the shot itself; detections only tell it where the target is
+        state = self.fire_control.observe(kind, (dx, dy), policy.in_fire_zone(dx, dy), policy.dwell)
+        # During a burst the next shot's target, if it is another class, is aimed at while the pulse runs
+        if ((state == FIRING and not self.fire_control.pre_aiming(kind))
+                or (state == LOCKED and policy.hold_while_dwelling)):
+            log.debug('aim_paused', target=kind, reason=state)
+            return
+
+        pan_power, pan_angle, tilt_power, tilt_angle = policy.aim(dx, dy)
+        log.debug('aim', target=kind, dx=dx, dy=dy, pan_power=pan_power, pan_angle=pan_angle,
+                  tilt_power=tilt_power, tilt_angle=tilt_angle)
+        if trace is not None:
+            trace.mark('aim')
         # Move both axes together (only if at least one needs to move)
         if pan_angle or tilt_angle:
-            self.controller.rotate_both(pan_power, pan_angle, tilt_power, tilt_angle)
+            self._rotate_both(pan_power, pan_angle, tilt_power, tilt_angle, trace)
+
+    def _fire_at(self, shot):
+        kind = shot['kind']
+        log.info('fire', target=kind, release_time=shot['pulse'], planned=shot['planned'], late_ms=shot['late_ms'])
+        self.perf.record('fire', shot['late_ns'])
+        # Planned shots are spaced by fire control; the controller then only refuses overlapping pulses
+        self.controller.fire(release_time=shot['pulse'], cooldown=shot['pulse'] if shot['planned'] else None,
+                             valves=shot['valves'])
+        self.fireable = False
+        if not shot['planned']:
+            # Stop tracking after firing; fire control sends the turret home once the pulse is over
+            tracker = self._trackers().get(kind)
+            if tracker is not None:
+                tracker.stop_tracking()
+            self.current_mode = None
+        self._shot_fired.set()
 
-    
-    def _on_face_lost(self, event):
-        print("Face lost")
-        # Use non-blocking reset to home position to avoid camera freezing
+    def _on_homing_finished(self, result):
+        # A run replaced by a newer homing reports cancelled; only the current run ends fire control's homing
+        if result.get('generation') == self.controller.homing.generation:
+            self.fire_control.homing_finished(result)
+
+    def _go_home(self, request):
         try:
             self.controller.reset(self.home_pan_position, self.home_tilt_position)
         except Exception as e:
-            print(f"Reset error (non-blocking): {e}")
-        pass
-     
-    def _on_hotdog_detected(self, event):
-        x, y = event['coordinates']
-        print(f"hotdog detected at {x}, {y}")
+            log.warning('reset_failed', error=str(e), reason=request['reason'])
+            self.fire_control.homing_finished()
 
-        # Check if hotdog is in the center zone
-        is_in_center = (self.fireable and 
-                       abs(x - self.center_x) < self.hotdog_threshold_distance and 
-                       abs(y - self.center_y) < self.hotdog_threshold_distance)
-        
-        if is_in_center:
-            current_time = time.time()
-            
-            if not self.hotdog_in_center:
-                # Hotdog just entered center zone - start timer and disable movement
-                print("Hotdog entered center zone - starting 1 second timer and disabling movement")
-                self.hotdog_center_start_time = current_time
-                self.hotdog_in_center = True
-                self.hotdog_firing_in_progress = True  # Disable movement during firing sequence
-            else:
-                # Hotdog was already in center - check if enough time has passed
-                time_in_center = current_time - self.hotdog_center_start_time
-                print(f"Hotdog in center for {time_in_center:.1f} seconds - movement disabled")
-                
-                if time_in_center >= self.hotdog_fire_delay:
-                    print(f"Hotdog stayed in center for 1 second - FIRE! (release_time={self.release_time}s)")
-                    self.controller.fire(release_time=self.release_time)
-                    self.fireable = False
-                    # Stop tracking after firing
-                    self.hotdog_recognizer.stop_tracking()
-                    self.current_mode = None
-                    self.controller.reset(self.home_pan_position, self.home_tilt_position)
-                    # Reset the tracking state
-                    self.hotdog_in_center = False
-                    self.hotdog_center_start_time = None
-                    self.hotdog_firing_in_progress = False
-        else:
-            # Hotdog is not in center zone - reset timer and re-enable movement
-            if self.hotdog_in_center:
-                print("Hotdog moved out of center zone - resetting timer and re-enabling movement")
-                self.hotdog_in_center = False
-                self.hotdog_center_start_time = None
-                self.hotdog_firing_in_progress = False
-
-        # Only move turret if we're not in the firing sequence
-        if not self.hotdog_firing_in_progress:
-            # --- tunables (play with these) ---
-            MIN_POWER_PAN  = 18    # barely enough to overcome friction
-            MAX_POWER_PAN  = 100
-            MIN_POWER_TILT = 18
-            MAX_POWER_TILT = 100
-
-            MIN_STEP_PAN_DEG  = 1  # small taps when close
-            MAX_STEP_PAN_DEG  = 20 # bigger chunks when far
-            MIN_STEP_TILT_DEG = 1
-            MAX_STEP_TILT_DEG = 10
-
-            # Use your dead zone as a threshold; nothing happens inside it
-            DEAD_X = self.glizzy_threshold_distance
-            DEAD_Y = self.glizzy_threshold_distance
-
-            # Estimate max possible error as distance from center to edge
-            # (assuming center_x/center_y are half-width/half-height)
-            MAX_DX = max(self.center_x, 1)
-            MAX_DY = max(self.center_y, 1)
-
-            def map_range(val, in_min, in_max, out_min, out_max):
-                # linear map with clamping
-                if in_max <= in_min:
-                    return out_min
-                t = max(0.0, min(1.0, (val - in_min) / (in_max - in_min)))
-                return out_min + t * (out_max - out_min)
-
-            pan_power = 0
-            pan_angle = 0
-            tilt_power = 0
-            tilt_angle = 0
-
-            # Horizontal (pan)
-            dx = x - self.center_x
-            if abs(dx) > DEAD_X:
-                # scale power & step by how far past the dead zone we are
-                mag = abs(dx)
-                scaled_power = map_range(mag, DEAD_X, MAX_DX, MIN_POWER_PAN, MAX_POWER_PAN)
-                scaled_step  = map_range(mag, DEAD_X, MAX_DX, MIN_STEP_PAN_DEG, MAX_STEP_PAN_DEG)
-
-                if dx > 0:
-                    print("Hotdog is to the left")
-                    pan_power = -int(round(scaled_power))   # negative = counter the left offset (clockwise per your comment)
-                else:
-                    print("Hotdog is to the right")
-                    pan_power = int(round(scaled_power))
-
-                pan_angle = int(round(scaled_step))
-
-            # Vertical (tilt)
-            dy = y - self.center_y
-            if abs(dy) > DEAD_Y:
-                mag = abs(dy)
-                scaled_power = map_range(mag, DEAD_Y, MAX_DY, MIN_POWER_TILT, MAX_POWER_TILT)
-                scaled_step  = map_range(mag, DEAD_Y, MAX_DY, MIN_STEP_TILT_DEG, MAX_STEP_TILT_DEG)
-
-                if dy < 0:
-                    print("Hotdog is above")
-                    tilt_power = -int(round(scaled_power))  # negative = up (per your comment)
-                else:
-                    print("Hotdog is below")
-                    tilt_power = int(round(scaled_power))
-
-                tilt_angle = int(round(scaled_step))
-
-            # Move both axes together (only if at least one needs to move)
-            if pan_angle or tilt_angle:
-                self.controller.rotate_both(pan_power, pan_angle, tilt_power, tilt_angle)
-        else:
-            print("Hotdog mode: Movement disabled during firing sequence")
+    def _on_target_lost(self, kind):
+        log.info(f'{kind}_lost')
+        self._record_detection(kind, None)
+        self.telemetry_recorder.note_error(None)
+        self.fire_control.lose(kind, home=self.policies[kind].home_on_lost)
 
-    def _on_hotdog_lost(self, event):
-        print("Hotdog lost")
-        # Reset the timing state when hotdog is lost
-        if self.hotdog_in_center:
-            print("Resetting hotdog center timer - hotdog lost")
-            self.hotdog_in_center = False
-            self.hotdog_center_start_time = None
-            self.hotdog_firing_in_progress = False  # Re-enable movement when hotdog is lost
-        # self.controller.reset()
-        pass
-    
     def _on_error(self, event):
-        print(f"Error: {event}")
+        log.error('tracker_error', error=str(event))
     
     def _on_frame_ready(self, event):
-        #skip gui for now
-        pass
+        # Only annotate when someone is watching /stream.mjpg; no extra inference either way
+        if not self.video_streamer.has_viewers:
+            return
+        self.video_streamer.publish(render_overlay(event['frame'].copy(), self))
+
 
 
+    def _start_tracking(self, kind):
+        trackers = self._trackers()
+        for other, tracker in trackers.items():
+            if other != kind:
+                tracker.stop_tracking()
+        self.current_mode = kind
+        if kind in trackers:
+            trackers[kind].start_tracking()
 
     def start_tracking_faces(self):
-        self.hotdog_recognizer.stop_tracking()
-        self.current_mode = 'face'
-        self.face_tracker.start_tracking()
+        self._start_tracking('face')
     
     def start_tracking_hotdogs(self):
-        self.face_tracker.stop_tracking()
-        self.current_mode = 'hotdog'
-        self.hotdog_recognizer.start_tracking()
+        self._start_tracking('hotdog')
     
     def stop(self):
-        self.face_tracker.stop_tracking()
-        self.hotdog_recognizer.stop_tracking()
+        for tracker in self._trackers().values():
+            tracker.stop_tracking()
         self.current_mode = None
 
-    def reset_to_home(self):
-        """Reset turret to the home position (position when camera was initialized)"""
+    def reset_to_home(self, wait=False):
+        """Start homing the turret (to its position when the camera was initialized); returns the homing status"""
         try:
             print("🏠 Resetting turret to home position...")
-            self.controller.reset(self.home_pan_position, self.home_tilt_position)
+            self.controller.reset(self.home_pan_position, self.home_tilt_position, wait=wait)
         except Exception as e:
             print(f"❌ Error resetting to home position: {e}")
+        return self.controller.homing.status()
+
+    def cancel_homing(self):
+        """Stop a homing motion where it is"""
+        self.controller.homing.cancel(wait=True)
+        return self.controller.homing.status()
+
+    def _register_config(self):
+        for kind in self.policies:
+            def apply_policy(values, kind=kind):
+                # Lookup tables are rebuilt here, once per change, never per event
+                policy = self.policies[kind].updated(**values)
+                return lambda: self.policies.__setitem__(kind, policy)
+            self.config.register(f'targeting.{kind}', self.policies[kind].to_dict(), apply_policy)
+
+        trackers = self._trackers()
+        for kind, remote_defaults in REMOTE_TRACKER_SETTINGS.items():
+            tracker = trackers.get(kind)
+
+            def apply_tracker(values, tracker=tracker):
+                check_number(values, 'fps', minimum=1, maximum=120)
+                check_number(values, 'confidence', minimum=0.0, maximum=1.0)
+
+                def commit():
+                    # Detector workers take their own settings; the values are only kept for local runs
+                    if tracker is not None:
+                        tracker.fps = values['fps']
+                        tracker.pacer.full_fps = values['fps']
+                        tracker.confidence = values['confidence']
+                return commit
+            defaults = {'fps': tracker.fps, 'confidence': tracker.confidence} if tracker is not None else remote_defaults
+            self.config.register(f'trackers.{kind}', defaults, apply_tracker)
+
+        def apply_turret(values):
+            check_number(values, 'fire_cooldown', minimum=0.0, maximum=60.0)
+
+            def commit():
+                self.controller.fire_cooldown = values['fire_cooldown']
+                self.fire_control.cooldown = values['fire_cooldown']
+            return commit
+        self.config.register('turret', {'fire_cooldown': getattr(self.controller, 'fire_cooldown', 5.0)},
+                             apply_turret)
+
+        def apply_dispense(values):
+            check_settings(values, getattr(self.controller, 'valve_channels', 1))
+            return lambda: setattr(self, 'dispense_settings', values)
+        self.config.register('dispense', self.dispense_settings, apply_dispense)
+
+        def apply_fire_control(values):
+            check_number(values, 'max_detection_age', minimum=0.01, maximum=10.0)
+            return lambda: setattr(self.fire_control, 'max_detection_age', values['max_detection_age'])
+        self.config.register('fire_control', {'max_detection_age': self.fire_control.max_detection_age},
+                             apply_fire_control)
+
+    def update_policy(self, kind, **tunables):
+        """Change a target class's tunables through the config store (validated, persisted)"""
+        if kind not in self.policies:
+            raise KeyError(f"Unknown target class: {kind}")
+        self.config.update({'targeting': {kind: tunables}})
+        log.info('policy_updated', target=kind, **tunables)
+        return self.policies[kind].to_dict()
+
+    def set_target_identity(self, photo):
+        """Aim only at the face matching `photo` (an /uploads/ URL); None goes back to the biggest face"""
+        if photo is None:
+            if self.face_tracker is not None and self.face_tracker.identities is not None:
+                self.face_tracker.identities.set_target(None)
+            return None
+        if self.remote_detection:
+            print("⚠️ Identity-gated aiming needs local face tracking; aiming at the biggest face")
+            return None
+        if self.face_identity is None:
+            self.face_identity = FaceIdentityService()
+        embedding = self.face_identity.embed(photo, allow_paths=False)
+        self.face_identity.save_cache()
+        if embedding is None:
+            raise ValueError(f"No face found in {photo}")
+        if self.face_tracker.identities is None:
+            self.face_tracker.identities = FaceTrackIdentities(self.face_identity)
+        self.face_tracker.identities.set_target(embedding)
+        log.info('target_identity', photo=photo)
+        return self.face_tracker.identities.stats()
+
+    def identity_stats(self):
+        if self.face_tracker is None:
+            return None
+        identities = self.face_tracker.identities
+        return identities.stats() if identities is not None else None
+
+    def dispense_sequence(self, job, condiments, face_index=None, target_timeout=30.0, on_state=None, photo=None):
+        """Dispense an order's condiments as a planned burst of shots (see dispense_planner.py).
+
+        Runs as a DispenseScheduler job: `job` provides cancellation, timeout
+        and progress reporting. The condiment at `face_index` is aimed at a
+        face, everything else at a hotdog; with the order's `photo`, only at
+        the face matching it.
+        `on_state(state, index, condiment)` is told 'aiming' and 'firing'.
+        """
+        settings = self.dispense_settings
+        planned = settings['planned']
+        steps = plan_shots(condiments, face_index, self.release_time, settings['pulse_seconds'],
+                           group_targets=planned and settings['group_targets'],
+                           valves=settings['valves'] if planned else None)
+        fired = 0
+        if photo and face_index is not None:
+            self.set_target_identity(photo)
+        try:
+            for number, step in enumerate(steps):
+                index, condiment = step['index'], step['condiment']
+                job.report_progress({"index": index, "step": number, "total": len(steps), "condiment": condiment})
+                if on_state:
+                    on_state('aiming', index, condiment)
+                if planned:
+                    self.fire_control.set_plan(step['target'], step['pulse'], step['dwell'], settings['shot_gap'],
+                                               step['valves'])
+                self._shot_fired.clear()
+                # Reached while the previous pulse still runs: the next target is acquired and aimed at meanwhile
+                if self.current_mode != step['target']:
+                    if step['target'] == 'face':
+                        self.start_tracking_faces()
+                    else:
+                        self.start_tracking_hotdogs()
+                self.fireable = True
+                deadline = time.monotonic() + target_timeout
+                while not self._shot_fired.wait(0.05):
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f"No target for {condiment} within {target_timeout}s")
+                    job.check_cancelled()
+                # A volley dispenses several condiments with one shot
+                for index, condiment in step['shots']:
+                    fired += 1
+                    if on_state:
+                        on_state('firing', index, condiment)
+        finally:
+            self.fireable = False
+            if planned:
+                self.fire_control.clear_plan()
+            self.stop()
+            if photo and face_index is not None:
+                self.set_target_identity(None)
+        return {"fired": fired, "condiments": len(condiments)}
 
     def run(self):
         self.running = True
@@ -340,13 +552,25 @@ class Brain:
                      
     def destroy(self):
         self.stop()
-        self.face_tracker.destroy()
+        self.config.stop()
+        self.fire_control.stop()
+        self.telemetry_recorder.stop()
+        for tracker in self._trackers().values():
+            tracker.destroy()
         self.controller.destroy()
-        self.hotdog_recognizer.destroy()
+        if self.capture_publisher:
+            self.capture_publisher.stop()
+        if self.ipc_server:
+            self.ipc_server.destroy()
+        if self.frame_buffer:
+            self.frame_buffer.close()
         self.cap.release()
+        super().destroy()
 
 
 if __name__ == "__main__":
+    from structured_logging import setup_logging
+    setup_logging()
     brain = Brain()
 
     try:
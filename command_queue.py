@@ -0,0 +1,243 @@
+"""
+Command layer between the FastAPI handlers and Brain.
+
+Control endpoints never touch the hardware themselves: they submit a command
+and get a job id back straight away. Commands run one at a time on a single
+worker thread, so two control requests never interleave. They are not the
+only code driving the hardware: the trackers aim and DispenseScheduler's
+worker tracks and fires on their own threads. The turret serializes access
+itself (its motion lock around two-axis moves, stops and readiness polls,
+the cooldown lock around shots and the solenoid link's write lock), and
+FireControl alone decides when a shot goes off.
+
+Orders (the tip-driven condiment sequence) are queued by
+dispense_queue.DispenseScheduler, whose jobs build on Job for the timeout,
+cooperative cancellation and progress reports. Completion can be awaited
+from async code or streamed as job updates.
+"""
+
+import asyncio
+import itertools
+import json
+import queue
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, Optional
+
+from event_system import EventEmitter
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+TIMED_OUT = 'timed_out'
+TERMINAL_STATES = (DONE, FAILED, CANCELLED, TIMED_OUT)
+
+
+class JobCancelled(Exception):
+    """Raised inside a workflow when its job is cancelled or times out"""
+
+
+class Job:
+    def __init__(self, job_id, name, fn, args, kwargs, timeout=None):
+        self.id = job_id
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.timeout = timeout
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.progress = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self._owner = None  # CommandQueue that runs this job
+        self._lock = threading.Lock()
+        self._version = 0
+        self._waiters = []  # (loop, future) pairs woken on every update
+
+    @property
+    def done(self):
+        return self.status in TERMINAL_STATES
+
+    def check_cancelled(self):
+        """Call from workflows between steps; raises JobCancelled once cancelled or past the timeout"""
+        if self.cancel_event.is_set():
+            raise JobCancelled(self.status)
+        if self.timeout is not None and self.started_at is not None and time.time() - self.started_at > self.timeout:
+            raise JobCancelled(TIMED_OUT)
+
+    def report_progress(self, progress):
+        """Publish workflow progress (any JSON-serialisable value) to waiters and streams"""
+        if self._owner is not None:
+            self._owner.set_progress(self, progress)
+        else:
+            self._update(progress=progress)
+
+    def _update(self, **fields):
+        with self._lock:
+            for key, value in fields.items():
+                setattr(self, key, value)
+            self._version += 1
+            waiters, self._waiters = self._waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future)
+
+    async def changed(self, since_version):
+        """Wait until the job has been updated after `since_version`; returns the new version"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._version > since_version:
+                return self._version
+            self._waiters.append((loop, future))
+        await future
+        return self._version
+
+    async def wait(self, timeout=None):
+        """Await completion (or `timeout` seconds) and return the job as a dict"""
+        async def until_done():
+            version = self._version
+            while not self.done:
+                version = await self.changed(version)
+        try:
+            await asyncio.wait_for(until_done(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.to_dict()
+
+    async def updates(self):
+        """Async generator of job snapshots, ending with the terminal one"""
+        version = -1
+        while True:
+            version = await self.changed(version)
+            snapshot = self.to_dict()
+            yield snapshot
+            if snapshot['status'] in TERMINAL_STATES:
+                return
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class CommandQueue(EventEmitter):
+    """Serial executor for short control commands.
+
+    Emits 'job_updated' with the job dict on every state change.
+    """
+
+    def __init__(self, max_history=200):
+        super().__init__()
+        self.jobs: Dict[str, Job] = {}
+        self.max_history = max_history
+        self._ids = itertools.count(1)
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue()
+        self._jobs_lock = threading.Lock()
+        self.running = False
+        self._worker = None
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._worker = threading.Thread(target=self._worker_loop, daemon=True)
+            self._worker.start()
+
+    def stop(self):
+        self.running = False
+        self._queue.put(None)
+        for job in list(self.jobs.values()):
+            if not job.done:
+                self.cancel(job.id)
+        if self._worker:
+            self._worker.join(timeout=5)
+
+    def _new_job(self, name, fn, args, kwargs, timeout) -> Job:
+        job = Job(str(next(self._ids)), name, fn, args, kwargs, timeout)
+        job._owner = self
+        with self._jobs_lock:
+            self.jobs[job.id] = job
+            # Forget the oldest finished jobs so the history stays bounded
+            if len(self.jobs) > self.max_history:
+                for old_id in [j.id for j in self.jobs.values() if j.done][:len(self.jobs) - self.max_history]:
+                    del self.jobs[old_id]
+        return job
+
+    def submit(self, name, fn: Callable[..., Any], *args, **kwargs) -> Job:
+        """Queue a short command to run on the command thread"""
+        job = self._new_job(name, fn, args, kwargs, timeout=None)
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id) -> Optional[Job]:
+        job = self.jobs.get(job_id)
+        if job is None or job.done:
+            return job
+        if job.status == QUEUED:
+            self._set_status(job, CANCELLED, finished_at=time.time())
+        job.cancel_event.set()
+        return job
+
+    def set_progress(self, job, progress):
+        self._set_status(job, job.status, progress=progress)
+
+    def _set_status(self, job, status, **fields):
+        job._update(status=status, **fields)
+        self.emit('job_updated', job.to_dict())
+
+    def _worker_loop(self):
+        while self.running:
+            job = self._queue.get()
+            if job is None:
+                break
+            if job.done:  # cancelled while queued
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        self._set_status(job, RUNNING, started_at=time.time())
+        try:
+            result = job.fn(*job.args, **job.kwargs)
+            self._set_status(job, DONE, result=result, finished_at=time.time())
+        except JobCancelled as e:
+            status = TIMED_OUT if str(e) == TIMED_OUT else CANCELLED
+            self._set_status(job, status, finished_at=time.time())
+        except Exception as e:
+            print(f"Command '{job.name}' failed: {e}")
+            traceback.print_exc()
+            self._set_status(job, FAILED, error=str(e), finished_at=time.time())
+
+
+async def job_response(job: Job, wait=False, timeout=None):
+    """Endpoint helper: the job dict now, or once it finished when `wait` is set"""
+    if wait:
+        return await job.wait(timeout)
+    return job.to_dict()
+
+
+async def job_event_stream(job: Job):
+    """Server-sent events of a job's updates, for StreamingResponse"""
+    async for snapshot in job.updates():
+        yield f"data: {json.dumps(snapshot)}\n\n"
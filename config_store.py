@@ -0,0 +1,193 @@
+"""
+Runtime-tunable configuration with validation and hot reload.
+
+Tunables that used to be constants (dead zones, motor curves, dwell, fire
+cooldown, tracker fps and confidence) live in one store. Components register
+a section with its current values and an `apply` function:
+
+    store.register('trackers.face', {'fps': 30, 'confidence': 0.6}, apply_face_tracker)
+
+`apply(values)` validates the full section (raising ValueError) and returns
+a zero-argument commit function. A change is applied all-or-nothing: every
+affected section is validated first and only then are the commits run, so a
+bad value never leaves the system half reconfigured.
+
+The store is backed by a JSON file (nested by section, e.g.
+{"trackers": {"face": {"fps": 15}}}); sections or keys missing from the file
+keep their defaults. The file is polled for changes and reloaded in place,
+and updates made through the API are written back atomically.
+"""
+
+import copy
+import json
+import os
+import threading
+import time
+
+from event_system import EventEmitter
+
+DEFAULT_CONFIG_FILE = os.environ.get(
+    'KETCHUP_CONFIG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ketchup_config.json'))
+
+
+def check_number(values, key, minimum=None, maximum=None, integer=False):
+    """Raise ValueError unless values[key] is a number within [minimum, maximum]"""
+    value = values[key]
+    if isinstance(value, bool) or not isinstance(value, int if integer else (int, float)):
+        raise ValueError(f"{key} must be {'an integer' if integer else 'a number'}")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{key} must be >= {minimum}")
+    if maximum is not None and value > maximum:
+        raise ValueError(f"{key} must be <= {maximum}")
+
+
+def _lookup(nested, section):
+    node = nested
+    for part in section.split('.'):
+        if not isinstance(node, dict) or part not in node:
+            return None
+        node = node[part]
+    return node
+
+
+class ConfigStore(EventEmitter):
+    def __init__(self, path=DEFAULT_CONFIG_FILE, poll_interval=1.0):
+        super().__init__()
+        self.path = path  # None keeps the config in memory only
+        self.poll_interval = poll_interval
+        self.sections = {}  # section -> {"defaults", "apply"}
+        self.values = {}  # section -> current values
+        self.loaded_at = None
+        self.last_error = None
+        self.running = False
+        self._file_stamp = None
+        self._lock = threading.RLock()
+        self._thread = None
+
+    def register(self, section, defaults, apply):
+        with self._lock:
+            self.sections[section] = {"defaults": dict(defaults), "apply": apply}
+            self.values[section] = dict(defaults)
+
+    def get(self):
+        """The whole config, nested by section"""
+        with self._lock:
+            nested = {}
+            for section, values in self.values.items():
+                node = nested
+                *parents, leaf = section.split('.')
+                for part in parents:
+                    node = node.setdefault(part, {})
+                node[leaf] = copy.deepcopy(values)
+            return nested
+
+    def _apply(self, candidate):
+        """Validate every changed section, then commit them all; returns the changed section names"""
+        with self._lock:
+            changed = [section for section, values in candidate.items() if values != self.values.get(section)]
+            commits = []
+            for section in changed:
+                if section not in self.sections:
+                    raise ValueError(f"Unknown config section: {section}")
+                unknown = set(candidate[section]) - set(self.sections[section]["defaults"])
+                if unknown:
+                    raise ValueError(f"Unknown keys in {section}: {', '.join(sorted(unknown))}")
+                try:
+                    commits.append(self.sections[section]["apply"](dict(candidate[section])))
+                except (TypeError, KeyError) as e:
+                    raise ValueError(f"Invalid {section}: {e}") from e
+            for commit in commits:
+                commit()
+            for section in changed:
+                self.values[section] = dict(candidate[section])
+        if changed:
+            self.emit('config_changed', changed)
+        return changed
+
+    def _candidate(self, nested, base):
+        """Flat section -> values, with `nested` laid over `base`"""
+        unknown = [key for key in nested if not any(section.split('.')[0] == key for section in self.sections)]
+        if unknown:
+            raise ValueError(f"Unknown config sections: {', '.join(sorted(unknown))}")
+        candidate = {}
+        for section in self.sections:
+            values = dict(base[section])
+            patch = _lookup(nested, section)
+            if patch is not None:
+                if not isinstance(patch, dict):
+                    raise ValueError(f"{section} must be an object")
+                values.update(patch)
+            candidate[section] = values
+        return candidate
+
+    def update(self, patch, persist=True):
+        """Apply a partial nested config, e.g. {"turret": {"fire_cooldown": 3}}; returns the changed sections"""
+        with self._lock:
+            changed = self._apply(self._candidate(patch, self.values))
+            if changed and persist:
+                self.save()
+            return changed
+
+    def reload(self):
+        """Re-read the file over the registered defaults; a bad file leaves the running config untouched"""
+        if not self.path or not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path) as f:
+                nested = json.load(f)
+            with self._lock:
+                defaults = {section: spec["defaults"] for section, spec in self.sections.items()}
+                changed = self._apply(self._candidate(nested, defaults))
+        except (OSError, ValueError) as e:
+            self.last_error = f"{self.path}: {e}"
+            print(f"⚠️ Config not reloaded, keeping current values: {self.last_error}")
+            return []
+        self.last_error = None
+        self.loaded_at = time.time()
+        if changed:
+            print(f"🔧 Config reloaded: {', '.join(changed)}")
+        return changed
+
+    def save(self):
+        """Write the current config atomically (temp file, then rename)"""
+        if not self.path:
+            return
+        tmp_path = self.path + '.tmp'
+        with self._lock:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.get(), f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            # Our own write must not trigger a reload
+            self._file_stamp = self._stamp()
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def start(self):
+        """Load the file and start watching it for edits"""
+        self._file_stamp = self._stamp() if self.path else None
+        self.reload()
+        if self.path and not self.running:
+            self.running = True
+            self._thread = threading.Thread(target=self._watch_loop, daemon=True)
+            self._thread.start()
+
+    def _watch_loop(self):
+        while self.running:
+            time.sleep(self.poll_interval)
+            stamp = self._stamp()
+            if stamp is not None and stamp != self._file_stamp:
+                self._file_stamp = stamp
+                self.reload()
+
+    def stop(self):
+        self.running = False
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval + 1)
+
+    def status(self):
+        return {"path": self.path, "loaded_at": self.loaded_at, "last_error": self.last_error}
@@ -0,0 +1,39 @@
+import threading
+import time
+from typing import Dict, Optional
+
+
+class DetectionStore:
+    """Latest detection per kind ('face', 'hotdog').
+
+    Trackers write here as part of their normal loop; display/stream renderers
+    only read, so drawing an overlay never costs another inference.
+    """
+
+    def __init__(self, max_age=0.5):
+        self.max_age = max_age  # seconds before a detection is considered stale
+        self._lock = threading.Lock()
+        self._detections: Dict[str, dict] = {}
+
+    def update(self, kind, box, coordinates):
+        x, y = coordinates
+        detection = {
+            'kind': kind,
+            'box': [int(v) for v in box],
+            'coordinates': [float(x), float(y)],
+            'timestamp': time.monotonic(),
+        }
+        with self._lock:
+            self._detections[kind] = detection
+
+    def clear(self, kind):
+        with self._lock:
+            self._detections.pop(kind, None)
+
+    def latest(self, kind) -> Optional[dict]:
+        """Most recent detection of `kind`, or None if there is none or it is stale"""
+        with self._lock:
+            detection = self._detections.get(kind)
+        if detection is None or time.monotonic() - detection['timestamp'] > self.max_age:
+            return None
+        return detection
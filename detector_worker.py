@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Out-of-process detector worker.
+
+Reads the newest frame from the shared frame buffer, runs the face or hotdog
+model on it and publishes the same events the in-process trackers emit
+('face_detected'/'face_lost' or 'hotdog_detected'/'hotdog_lost') to the
+brain process over the IPC event socket.
+
+    python detector_worker.py --kind face
+    python detector_worker.py --kind hotdog --fps 10
+    python detector_worker.py --kind face --workers 4   # process-pool mode
+"""
+
+import argparse
+import time
+
+from ipc_transport import (
+    DEFAULT_FRAME_BUFFER_NAME,
+    DEFAULT_SOCKET_PATH,
+    IPCEventPublisher,
+    SharedFrameBuffer,
+)
+
+
+def load_detector(kind):
+    """Return a frame -> biggest box callable for the given detector kind"""
+    if kind == 'face':
+        from face_tracker import FaceTracker
+        return FaceTracker(None).get_biggest_face_coordinates
+    if kind == 'hotdog':
+        from hotdog_recognizer import HotdogRecognizer
+        return HotdogRecognizer(None).find_biggest_hotdog
+    raise ValueError(f"Unknown detector kind: {kind}")
+
+
+def _publish_box(publisher, kind, box, seq, has_target):
+    """Publish a detected/lost event for one result and return the new has_target state"""
+    if box is not None:
+        x_center = box[0] + box[2] / 2
+        y_center = box[1] + box[3] / 2
+        publisher.emit(f'{kind}_detected', {
+            'coordinates': (x_center, y_center),
+            'box': box,
+            'frame_seq': seq,
+        })
+        return True
+    if has_target:
+        publisher.emit(f'{kind}_lost', None)
+    return False
+
+
+def run_worker(kind, socket_path=DEFAULT_SOCKET_PATH, frame_buffer_name=DEFAULT_FRAME_BUFFER_NAME, fps=30):
+    detect = load_detector(kind)
+    frame_buffer = SharedFrameBuffer(frame_buffer_name)
+    publisher = IPCEventPublisher(socket_path)
+    print(f"🔌 {kind} worker connected to {socket_path}, reading frames from '{frame_buffer_name}'")
+
+    frame_time = 1.0 / fps
+    last_seq = 0
+    has_target = False
+    try:
+        while True:
+            start_time = time.time()
+            seq, frame = frame_buffer.read_latest(last_seq)
+            if frame is not None:
+                last_seq = seq
+                has_target = _publish_box(publisher, kind, detect(frame), seq, has_target)
+            sleep_time = max(0, frame_time - (time.time() - start_time))
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+    except KeyboardInterrupt:
+        print(f"stopping {kind} worker...")
+    finally:
+        publisher.close()
+        frame_buffer.close()
+
+
+def run_pool_worker(kind, workers, socket_path=DEFAULT_SOCKET_PATH, frame_buffer_name=DEFAULT_FRAME_BUFFER_NAME, fps=30):
+    """Fan frames out to an InferencePool and publish its results in capture order"""
+    from inference_pool import InferencePool
+
+    frame_buffer = SharedFrameBuffer(frame_buffer_name)
+    pool = InferencePool(kind, workers=workers, frame_shape=frame_buffer.shape)
+    pool.start()
+    publisher = IPCEventPublisher(socket_path)
+    print(f"🔌 {kind} pool ({workers} workers) connected to {socket_path}, reading frames from '{frame_buffer_name}'")
+
+    frame_time = 1.0 / fps
+    last_seq = 0
+    capture_seqs = {}  # pool seq -> capture seq, so events reference the shared capture frame
+    has_target = False
+    try:
+        while True:
+            start_time = time.time()
+            seq, frame = frame_buffer.read_latest(last_seq)
+            if frame is not None:
+                last_seq = seq
+                pool_seq = pool.submit(frame)
+                if pool_seq is not None:
+                    capture_seqs[pool_seq] = seq
+            for pool_seq, box, _ in pool.results():
+                has_target = _publish_box(publisher, kind, box, capture_seqs.pop(pool_seq), has_target)
+            sleep_time = max(0, frame_time - (time.time() - start_time))
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+    except KeyboardInterrupt:
+        print(f"stopping {kind} pool...")
+    finally:
+        pool.stop()
+        publisher.close()
+        frame_buffer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a detector in its own process")
+    parser.add_argument("--kind", choices=["face", "hotdog"], required=True)
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="IPC event socket path")
+    parser.add_argument("--frames", default=DEFAULT_FRAME_BUFFER_NAME, help="Shared frame buffer name")
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=1, help="Detector processes; >1 enables the inference pool")
+    args = parser.parse_args()
+    if args.workers > 1:
+        run_pool_worker(args.kind, args.workers, args.socket, args.frames, args.fps)
+    else:
+        run_worker(args.kind, args.socket, args.frames, args.fps)
+
+
+if __name__ == "__main__":
+    main()
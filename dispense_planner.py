@@ -0,0 +1,95 @@
+"""
+Shot planning for multi-condiment orders.
+
+An order used to be dispensed one condiment at a time, each shot standing
+alone: acquire, dwell, fire, home, then sit out the turret's full fire
+cooldown before the next condiment could even lock. plan_shots() turns an
+order into a sequence of steps and Brain.dispense_sequence runs them as one
+burst (see FireControl.plan):
+
+- shots on the same target class are grouped, so the turret does not swing
+  face -> hotdog -> face;
+- a follow-up shot on the target that was just hit skips the dwell (the lock
+  was already confirmed) and waits only `shot_gap` after the previous pulse;
+- the turret stays on target between shots and homes once, after the last;
+- while a pulse runs, the next step's tracker is already started; when the
+  next step is on another target class the turret already aims at it
+  (FireControl.pre_aiming), and the lock is taken as soon as the valve closes;
+- every shot goes through the controller's one open solenoid connection.
+
+Each condiment can have its own pulse length (`pulse_seconds`); the rest use
+Brain's release time. With one valve per condiment (`valves` maps condiments
+to solenoid channels, see serial_controller.py), consecutive shots on the
+same target whose condiments sit on different channels merge into a single
+volley: the valves open together and the step takes as long as its longest
+pulse. Unmapped condiments use channel 0, so a single-valve rig plans
+exactly as before.
+"""
+
+DEFAULT_SETTINGS = {
+    "planned": True,  # False dispenses shot by shot like a standalone target (full cooldown, homing)
+    "shot_gap": 0.3,  # seconds after a pulse before the next planned shot
+    "group_targets": True,
+    "pulse_seconds": {},  # condiment -> pulse length in seconds
+    "valves": {},  # condiment -> solenoid channel; unmapped condiments use channel 0
+}
+
+
+def plan_shots(condiments, face_index=None, default_pulse=0.5, pulse_seconds=None, group_targets=True,
+               valves=None):
+    """Steps for an order: {"index", "condiment", "target", "pulse", "dwell", "valves", "shots"}.
+
+    `index` and `condiment` are the step's first shot; `shots` lists every
+    (index, condiment) the step dispenses and `valves` the matching
+    [channel, seconds] pulses. `pulse` is the longest of them. `dwell` is None
+    to use the target policy's dwell, or 0 for a follow-up shot on the same target.
+    """
+    pulse_seconds = pulse_seconds or {}
+    valves = valves or {}
+    shots = [{"index": index, "condiment": condiment, "target": 'face' if index == face_index else 'hotdog',
+              "pulse": pulse_seconds.get(condiment, default_pulse), "channel": valves.get(condiment, 0)}
+             for index, condiment in enumerate(condiments)]
+    if group_targets:
+        # Stable: target classes in order of first appearance, condiments in order within each
+        first_seen = {}
+        for shot in shots:
+            first_seen.setdefault(shot["target"], len(first_seen))
+        shots.sort(key=lambda shot: first_seen[shot["target"]])
+    steps = []
+    for shot in shots:
+        step = steps[-1] if steps else None
+        if (step is None or step["target"] != shot["target"]
+                or any(channel == shot["channel"] for channel, _ in step["valves"])):
+            step = {"index": shot["index"], "condiment": shot["condiment"], "target": shot["target"],
+                    "pulse": 0.0, "valves": [], "shots": []}
+            steps.append(step)
+        step["valves"].append([shot["channel"], shot["pulse"]])
+        step["shots"].append((shot["index"], shot["condiment"]))
+        step["pulse"] = max(step["pulse"], shot["pulse"])
+    previous = None
+    for step in steps:
+        step["dwell"] = 0.0 if previous is not None and previous["target"] == step["target"] else None
+        previous = step
+    return steps
+
+
+def check_settings(values, channels=1):
+    """Raise ValueError unless `values` are valid dispense settings for a rig with `channels` valves"""
+    for key in ("planned", "group_targets"):
+        if not isinstance(values[key], bool):
+            raise ValueError(f"{key} must be true or false")
+    gap = values["shot_gap"]
+    if isinstance(gap, bool) or not isinstance(gap, (int, float)) or not 0 <= gap <= 10:
+        raise ValueError("shot_gap must be a number of seconds between 0 and 10")
+    pulses = values["pulse_seconds"]
+    if not isinstance(pulses, dict):
+        raise ValueError("pulse_seconds must map condiment names to seconds")
+    for condiment, seconds in pulses.items():
+        if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) or not 0.05 <= seconds <= 10:
+            raise ValueError(f"pulse_seconds[{condiment}] must be between 0.05 and 10 seconds")
+    valves = values["valves"]
+    if not isinstance(valves, dict):
+        raise ValueError("valves must map condiment names to solenoid channels")
+    for condiment, channel in valves.items():
+        if isinstance(channel, bool) or not isinstance(channel, int) or not 0 <= channel < channels:
+            raise ValueError(f"valves[{condiment}] must be a channel between 0 and {channels - 1}")
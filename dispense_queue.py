@@ -0,0 +1,354 @@
+"""
+In-process scheduler for dispense (order) jobs.
+
+Orders from the kiosk are queued instead of racing each other over
+brain.fireable: highest priority first, FIFO within a priority, exactly one
+active job at a time. Every job moves through queued -> aiming -> firing ->
+done/failed (or cancelled), the queue is persisted to disk so a restart does
+not lose waiting orders, and service metrics (time-to-fire, jobs per hour)
+are kept for tuning throughput during rushes.
+"""
+
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from command_queue import TIMED_OUT, Job, JobCancelled
+from event_system import EventEmitter
+from face_identity import is_upload_ref
+from structured_logging import get_logger
+
+log = get_logger('dispense_queue')
+
+QUEUED = 'queued'
+AIMING = 'aiming'
+FIRING = 'firing'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+ACTIVE_STATES = (AIMING, FIRING)
+
+DEFAULT_STATE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dispense_jobs.json')
+CONDIMENTS = ('ketchup', 'mustard', 'relish', 'mayo')  # what the kiosk sells; DispenseScheduler(condiments=...) overrides
+MAX_CONDIMENTS = 10  # shots per order
+
+
+def check_priority(value):
+    """`value` as an int priority; ValueError for anything that is not a whole number"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"priority must be an integer, got {value!r}")
+    try:
+        priority = float(value)
+    except ValueError:
+        raise ValueError(f"priority must be an integer, got {value!r}") from None
+    if not priority.is_integer():
+        raise ValueError(f"priority must be an integer, got {value!r}")
+    return int(priority)
+
+
+def check_condiments(value, known=CONDIMENTS):
+    """`value` as a list of condiments; ValueError unless it is a non-empty list of at most MAX_CONDIMENTS known names"""
+    if not isinstance(value, list) or not value:
+        raise ValueError(f"condiments must be a non-empty list, got {value!r}")
+    if len(value) > MAX_CONDIMENTS:
+        raise ValueError(f"at most {MAX_CONDIMENTS} condiments per order, got {len(value)}")
+    for condiment in value:
+        if not isinstance(condiment, str) or condiment not in known:
+            raise ValueError(f"unknown condiment {condiment!r}; expected one of {', '.join(known)}")
+    return list(value)
+
+
+class DispenseJob(Job):
+    """One order: a list of condiments, dispensed as a single scheduled job"""
+
+    def __init__(self, job_id, condiments, face_index=None, priority=0, source=None, timeout=180.0, photo=None):
+        super().__init__(job_id, 'dispense', None, (), {}, timeout=timeout)
+        self.condiments = list(condiments)
+        self.face_index = face_index
+        self.priority = priority
+        self.source = source
+        self.photo = photo  # customer's kiosk upload; the face shot goes only at the matching face
+        self.first_fire_at = None
+        self.shots = 0
+        self.transitions = []  # (state, timestamp)
+
+    @property
+    def time_to_fire(self):
+        """Seconds from submission to the first shot"""
+        if self.first_fire_at is None:
+            return None
+        return self.first_fire_at - self.created_at
+
+    def to_dict(self):
+        data = super().to_dict()
+        data.update({
+            "condiments": self.condiments,
+            "face_index": self.face_index,
+            "priority": self.priority,
+            "source": self.source,
+            "photo": self.photo,
+            "shots": self.shots,
+            "first_fire_at": self.first_fire_at,
+            "time_to_fire": self.time_to_fire,
+            "transitions": self.transitions,
+        })
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data['job_id'], data['condiments'], data.get('face_index'), data.get('priority', 0), data.get('source'),
+                  photo=data.get('photo'))
+        for key in ('status', 'result', 'error', 'progress', 'created_at', 'started_at', 'finished_at',
+                    'first_fire_at', 'shots'):
+            if key in data:
+                setattr(job, key, data[key])
+        job.transitions = [tuple(t) for t in data.get('transitions', [])]
+        return job
+
+
+class DispenseScheduler(EventEmitter):
+    """Priority FIFO of DispenseJobs executed one at a time by Brain.dispense_sequence.
+
+    Emits 'job_updated' with the job dict on every transition.
+    """
+
+    def __init__(self, brain, state_file=DEFAULT_STATE_FILE, target_timeout=30.0, job_timeout=180.0,
+                 max_history=500, condiments=CONDIMENTS):
+        super().__init__()
+        self.brain = brain
+        self.condiments = tuple(condiments)
+        self.state_file = state_file
+        self.target_timeout = target_timeout
+        self.job_timeout = job_timeout
+        self.max_history = max_history
+        self.jobs = {}
+        self.active_job = None
+        self._heap = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._finished = deque(maxlen=max_history)  # (finished_at, status, time_to_fire, service_time)
+        self.running = False
+        self._worker = None
+        self.started_at = time.time()
+        self._ids = itertools.count(1)
+        self._load()
+
+    # --- persistence ---
+
+    def _load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file) as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Could not load dispense queue from {self.state_file}: {e}")
+            return
+        max_id = 0
+        for data in saved.get('jobs', []):
+            try:
+                check_condiments(data['condiments'], self.condiments)
+                job = DispenseJob.from_dict(data)
+                job.priority = check_priority(job.priority)
+                max_id = max(max_id, int(job.id))
+            except (KeyError, TypeError, ValueError) as e:
+                # One bad record must not keep the service from starting
+                log.warning('dispense_job_skipped', job_id=data.get('job_id') if isinstance(data, dict) else None,
+                            error=str(e))
+                continue
+            job._owner = self
+            if job.status in ACTIVE_STATES:
+                # Interrupted mid-dispense; re-running could double-squirt, so fail it
+                job.status = FAILED
+                job.error = "Interrupted by restart"
+                job.finished_at = time.time()
+            self.jobs[job.id] = job
+            if job.status == QUEUED:
+                heapq.heappush(self._heap, (-job.priority, next(self._order), job.id))
+            elif job.done:
+                self._finished.append((job.finished_at, job.status, job.time_to_fire, self._service_time(job)))
+        self._ids = itertools.count(max_id + 1)
+        print(f"📋 Restored {len(self._heap)} queued dispense jobs")
+
+    def _save(self):
+        if not self.state_file:
+            return
+        with self._lock:
+            jobs = sorted(self.jobs.values(), key=lambda j: int(j.id))
+            # Keep every unfinished job plus the most recent history
+            unfinished = [j for j in jobs if not j.done]
+            finished = [j for j in jobs if j.done][-self.max_history:]
+            payload = {"jobs": [j.to_dict() for j in finished + unfinished]}
+        tmp_path = self.state_file + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, self.state_file)
+        except OSError as e:
+            print(f"⚠️ Could not persist dispense queue: {e}")
+
+    # --- queue API ---
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._worker = threading.Thread(target=self._worker_loop, daemon=True)
+            self._worker.start()
+
+    def stop(self):
+        with self._lock:
+            self.running = False
+            self._wakeup.notify_all()
+            active = self.active_job
+        if active is not None:
+            active.cancel_event.set()
+        if self._worker:
+            self._worker.join(timeout=5)
+        self._save()
+
+    def submit(self, condiments, face_index=None, priority=0, source=None, photo=None) -> DispenseJob:
+        """Queue an order; ValueError if `condiments` are not known condiment names, `priority` is not an
+        integer or `photo` is not an /uploads/ URL"""
+        condiments = check_condiments(condiments, self.condiments)
+        priority = check_priority(priority)
+        if photo is not None and not is_upload_ref(photo):
+            raise ValueError(f"photo must be an /uploads/ URL, got {photo!r}")
+        job = DispenseJob(str(next(self._ids)), condiments, face_index, priority, source, timeout=self.job_timeout,
+                          photo=photo)
+        job._owner = self
+        job.transitions.append((QUEUED, job.created_at))
+        with self._lock:
+            heapq.heappush(self._heap, (-priority, next(self._order), job.id))
+            self.jobs[job.id] = job
+            self._wakeup.notify()
+        self._save()
+        self.emit('job_updated', job.to_dict())
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def queued_jobs(self):
+        with self._lock:
+            return [self.jobs[job_id].to_dict() for _, _, job_id in sorted(self._heap)
+                    if self.jobs[job_id].status == QUEUED]
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.done:
+            return job
+        if job.status == QUEUED:
+            # Lazily dropped from the heap when the worker reaches it
+            self._transition(job, CANCELLED, finished_at=time.time())
+        else:
+            job.cancel_event.set()
+        return job
+
+    # --- execution ---
+
+    def set_progress(self, job, progress):
+        job._update(progress=progress)
+        self.emit('job_updated', job.to_dict())
+
+    def _transition(self, job, status, **fields):
+        now = time.time()
+        job.transitions.append((status, now))
+        if status == FIRING:
+            job.shots += 1
+            if job.first_fire_at is None:
+                fields['first_fire_at'] = now
+        if status in (DONE, FAILED, CANCELLED):
+            # Record before waiters are woken so metrics never lag behind a finished job
+            first_fire_at = fields.get('first_fire_at', job.first_fire_at)
+            time_to_fire = first_fire_at - job.created_at if first_fire_at is not None else None
+            service_time = fields['finished_at'] - job.started_at if job.started_at is not None else None
+            self._finished.append((fields['finished_at'], status, time_to_fire, service_time))
+            if self.active_job is job:
+                self.active_job = None
+        job._update(status=status, **fields)
+        self._save()
+        self.emit('job_updated', job.to_dict())
+
+    def _next_job(self):
+        with self._lock:
+            while self.running:
+                while self._heap:
+                    _, _, job_id = heapq.heappop(self._heap)
+                    job = self.jobs[job_id]
+                    if job.status == QUEUED:
+                        self.active_job = job
+                        return job
+                self._wakeup.wait()
+        return None
+
+    def _worker_loop(self):
+        while self.running:
+            job = self._next_job()
+            if job is None:
+                break
+            self._run(job)
+
+    def _run(self, job):
+        job.started_at = time.time()
+
+        def on_state(state, index, condiment):
+            self._transition(job, state)
+
+        try:
+            result = self.brain.dispense_sequence(job, job.condiments, face_index=job.face_index,
+                                                  target_timeout=self.target_timeout, on_state=on_state,
+                                                  photo=job.photo)
+            self._transition(job, DONE, result=result, finished_at=time.time())
+        except JobCancelled as e:
+            if str(e) == TIMED_OUT:
+                self._transition(job, FAILED, error=f"Timed out after {job.timeout}s", finished_at=time.time())
+            else:
+                self._transition(job, CANCELLED, finished_at=time.time())
+        except Exception as e:
+            log.error('dispense_job_failed', job_id=job.id, error=str(e))
+            self._transition(job, FAILED, error=str(e), finished_at=time.time())
+
+    # --- metrics ---
+
+    @staticmethod
+    def _service_time(job):
+        if job.started_at is None or job.finished_at is None:
+            return None
+        return job.finished_at - job.started_at
+
+    @staticmethod
+    def _percentile(values, pct):
+        if not values:
+            return None
+        values = sorted(values)
+        index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+        return values[index]
+
+    def metrics(self):
+        now = time.time()
+        finished = list(self._finished)
+        done = [f for f in finished if f[1] == DONE]
+        last_hour = [f for f in done if f[0] is not None and now - f[0] <= 3600]
+        time_to_fire = [f[2] for f in done if f[2] is not None]
+        service = [f[3] for f in done if f[3] is not None]
+        uptime_hours = max((now - self.started_at) / 3600, 1e-9)
+        with self._lock:
+            queued = sum(1 for _, _, job_id in self._heap if self.jobs[job_id].status == QUEUED)
+        return {
+            "queued": queued,
+            "active_job": self.active_job.id if self.active_job else None,
+            "done": len(done),
+            "failed": sum(1 for f in finished if f[1] == FAILED),
+            "cancelled": sum(1 for f in finished if f[1] == CANCELLED),
+            "jobs_last_hour": len(last_hour),
+            "jobs_per_hour": len(last_hour) if uptime_hours >= 1 else len(last_hour) / uptime_hours,
+            "time_to_fire_p50": self._percentile(time_to_fire, 50),
+            "time_to_fire_p95": self._percentile(time_to_fire, 95),
+            "service_time_p50": self._percentile(service, 50),
+            "service_time_p95": self._percentile(service, 95),
+        }
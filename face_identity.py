@@ -0,0 +1,423 @@
+"""
+Face identity service: cached DeepFace embeddings and a vectorised gallery.
+
+DeepFace.verify re-detects and re-embeds both images on every call. Here
+every image is embedded once: embeddings are cached by the SHA-256 of the
+file contents and persisted to disk, so a kiosk upload is embedded the
+first time it is seen and never again (also across restarts). The gallery
+(default: robo-drink/public/uploads) is kept as one L2-normalised matrix, so
+matching a live face crop from FaceTracker against every customer photo is
+a single matrix-vector product instead of N verify calls.
+
+FaceTrackIdentities gives FaceTracker detections IoU-based track ids and
+embeds each track once, on a background thread, so gating the turret on the
+customer's identity costs a box-overlap check per frame.
+"""
+
+import hashlib
+import itertools
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+PUBLIC_DIR = os.path.join(REPO_DIR, 'robo-drink', 'public')
+DEFAULT_GALLERY_DIR = os.path.join(PUBLIC_DIR, 'uploads')
+DEFAULT_CACHE_FILE = os.path.join(REPO_DIR, 'face_embeddings.npz')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+DEFAULT_MODEL = 'VGG-Face'  # DeepFace.verify's default, so thresholds match the old CLI
+# DeepFace's cosine-distance thresholds for "same person"
+COSINE_THRESHOLDS = {
+    'VGG-Face': 0.68,
+    'Facenet': 0.40,
+    'Facenet512': 0.30,
+    'ArcFace': 0.68,
+    'SFace': 0.593,
+    'GhostFaceNet': 0.65,
+}
+
+
+def is_upload_ref(ref):
+    """Whether `ref` is a kiosk upload URL (/uploads/<file>), the only image reference HTTP clients may send"""
+    return isinstance(ref, str) and ref.startswith('/uploads/')
+
+
+def check_verify_pairs(pairs):
+    """ValueError unless `pairs` is a list of [a, b] pairs of upload URLs or embeddings (what HTTP clients may send)"""
+    if not isinstance(pairs, list):
+        raise ValueError("pairs must be a list of [a, b] pairs")
+    for pair in pairs:
+        if not isinstance(pair, list) or len(pair) != 2:
+            raise ValueError("pairs must be a list of [a, b] pairs")
+        for ref in pair:
+            if not is_upload_ref(ref) and not isinstance(ref, list):
+                raise ValueError(f"Only /uploads/ URLs or embeddings are accepted, got {ref!r}")
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def crop_face(frame, box, margin=0.2):
+    """Crop an [x, y, w, h] box out of a frame with some margin around it"""
+    x, y, w, h = box
+    dx, dy = int(w * margin), int(h * margin)
+    height, width = frame.shape[:2]
+    x0, y0 = max(0, x - dx), max(0, y - dy)
+    x1, y1 = min(width, x + w + dx), min(height, y + h + dy)
+    return frame[y0:y1, x0:x1]
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class FaceIdentityService:
+    def __init__(self, model_name=DEFAULT_MODEL, detector_backend='opencv', cache_file=DEFAULT_CACHE_FILE,
+                 gallery_dir=DEFAULT_GALLERY_DIR, threshold=None):
+        self.model_name = model_name
+        self.detector_backend = detector_backend
+        self.cache_file = cache_file
+        self.gallery_dir = gallery_dir
+        self.threshold = threshold if threshold is not None else COSINE_THRESHOLDS.get(model_name, 0.4)
+        self._cache = {}  # content hash -> normalised embedding
+        self._gallery_keys = []  # file names, row order of _gallery
+        self._gallery = None
+        self._gallery_hashes = {}  # file name -> (mtime, size, content hash)
+        self._lock = threading.RLock()
+        self._model_lock = threading.Lock()  # one inference at a time; DeepFace models are shared
+        self._dirty = False
+        self.warm = False
+        self._load_cache()
+
+    # --- persistence ---
+
+    def _load_cache(self):
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return
+        try:
+            with np.load(self.cache_file, allow_pickle=False) as data:
+                if str(data['model_name']) != self.model_name:
+                    print(f"⚠️ Ignoring face embedding cache built with {data['model_name']}")
+                    return
+                self._cache = dict(zip(data['hashes'].tolist(), data['embeddings']))
+            print(f"🧑 Loaded {len(self._cache)} cached face embeddings")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Could not load face embedding cache {self.cache_file}: {e}")
+
+    def save_cache(self):
+        with self._lock:
+            if not self.cache_file or not self._dirty:
+                return
+            hashes = list(self._cache)
+            embeddings = np.stack([self._cache[h] for h in hashes]) if hashes else np.zeros((0, 0), np.float32)
+            self._dirty = False
+        tmp_path = self.cache_file + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, model_name=np.array(self.model_name), hashes=np.array(hashes), embeddings=embeddings)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            print(f"⚠️ Could not persist face embedding cache: {e}")
+
+    # --- embeddings ---
+
+    def _represent(self, img, detector_backend):
+        """One normalised embedding for the most prominent face in `img` (path or BGR array), or None"""
+        from deepface import DeepFace
+
+        with self._model_lock:
+            faces = DeepFace.represent(img_path=img, model_name=self.model_name,
+                                       detector_backend=detector_backend, enforce_detection=False)
+        if not faces:
+            return None
+        # With several faces in a selfie, the biggest one is the customer
+        face = max(faces, key=lambda f: f.get('facial_area', {}).get('w', 0) * f.get('facial_area', {}).get('h', 0))
+        return _normalize(face['embedding'])
+
+    def embed_file(self, path, content_hash=None):
+        """Embedding for an image file, computed once per distinct file content"""
+        content_hash = content_hash or file_hash(path)
+        with self._lock:
+            embedding = self._cache.get(content_hash)
+        if embedding is not None:
+            return embedding
+        embedding = self._represent(path, self.detector_backend)
+        if embedding is not None:
+            with self._lock:
+                self._cache[content_hash] = embedding
+                self._dirty = True
+        return embedding
+
+    def warmup(self):
+        """Load the model weights and run one dummy embedding so the first real request is fast"""
+        if self.warm:
+            return
+        from deepface import DeepFace
+
+        start = time.perf_counter()
+        DeepFace.build_model(self.model_name)
+        self._represent(np.zeros((160, 160, 3), dtype=np.uint8), 'skip')
+        self.warm = True
+        print(f"🧑 Face model {self.model_name} warmed up in {time.perf_counter() - start:.1f}s")
+
+    def resolve_image(self, ref, allow_paths=True):
+        """Map a kiosk upload URL (/uploads/<file>) to its file; plain paths pass through only with `allow_paths`"""
+        if is_upload_ref(ref):
+            path = os.path.normpath(os.path.join(PUBLIC_DIR, ref.lstrip('/')))
+            if not path.startswith(DEFAULT_GALLERY_DIR + os.sep):
+                raise ValueError(f"Bad upload path: {ref}")
+            return path
+        if not allow_paths:
+            raise ValueError(f"Only /uploads/ URLs or embeddings are accepted, got {ref!r}")
+        return ref
+
+    def embed(self, item, allow_paths=True):
+        """Embedding for an image path, upload URL or an already computed embedding (list of floats).
+
+        Network clients go through with `allow_paths` False, so they cannot make
+        the service read arbitrary files; the CLI and the local socket server may.
+        """
+        if isinstance(item, str):
+            return self.embed_file(self.resolve_image(item, allow_paths))
+        return _normalize(item)
+
+    def embed_crop(self, crop):
+        """Embedding for a face crop from the live camera (already detected, so detection is skipped)"""
+        return self._represent(crop, 'skip')
+
+    # --- gallery ---
+
+    def refresh_gallery(self):
+        """Embed new uploads and rebuild the gallery matrix; returns the number of gallery faces"""
+        if not self.gallery_dir or not os.path.isdir(self.gallery_dir):
+            return 0
+        names = sorted(name for name in os.listdir(self.gallery_dir) if name.lower().endswith(IMAGE_EXTENSIONS))
+        keys, rows = [], []
+        for name in names:
+            path = os.path.join(self.gallery_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            known = self._gallery_hashes.get(name)
+            if known and known[:2] == (stat.st_mtime, stat.st_size):
+                content_hash = known[2]
+            else:
+                content_hash = file_hash(path)
+                self._gallery_hashes[name] = (stat.st_mtime, stat.st_size, content_hash)
+            embedding = self.embed_file(path, content_hash)
+            if embedding is not None:
+                keys.append(name)
+                rows.append(embedding)
+        with self._lock:
+            self._gallery_keys = keys
+            self._gallery = np.stack(rows) if rows else None
+        self.save_cache()
+        return len(keys)
+
+    def similarities(self, embedding):
+        """Cosine similarity of `embedding` to every gallery face, as (keys, scores)"""
+        with self._lock:
+            keys, gallery = self._gallery_keys, self._gallery
+        if gallery is None or embedding is None:
+            return [], np.zeros(0, dtype=np.float32)
+        return keys, gallery @ _normalize(embedding)
+
+    def match(self, embedding, top_k=1):
+        """Best gallery matches as [{"key", "similarity", "distance", "verified"}], best first"""
+        keys, scores = self.similarities(embedding)
+        if not keys:
+            return []
+        best = np.argsort(-scores)[:top_k]
+        return [{
+            "key": keys[i],
+            "similarity": float(scores[i]),
+            "distance": max(0.0, float(1.0 - scores[i])),
+            "verified": bool(1.0 - scores[i] <= self.threshold),
+        } for i in best]
+
+    def match_crop(self, frame, box):
+        """Match a FaceTracker detection (frame + [x, y, w, h] box) against the gallery"""
+        return self.match(self.embed_crop(crop_face(frame, box)))
+
+    def verify(self, embedding1, embedding2):
+        """DeepFace.verify-style result for two embeddings"""
+        start = time.perf_counter()
+        distance = max(0.0, float(1.0 - np.dot(_normalize(embedding1), _normalize(embedding2))))
+        return {
+            "verified": distance <= self.threshold,
+            "distance": distance,
+            "threshold": self.threshold,
+            "model": self.model_name,
+            "similarity_metric": "cosine",
+            "time": time.perf_counter() - start,
+        }
+
+    def verify_batch(self, pairs, allow_paths=True):
+        """Verify [(a, b), ...] where each side is a path, upload URL or embedding.
+
+        Each result carries its own latency_ms; an image appearing in several
+        pairs is embedded once.
+        """
+        results = []
+        for a, b in pairs:
+            start = time.perf_counter()
+            try:
+                embedding1, embedding2 = self.embed(a, allow_paths), self.embed(b, allow_paths)
+                if embedding1 is None or embedding2 is None:
+                    raise ValueError("No face found in one of the images")
+                result = self.verify(embedding1, embedding2)
+                del result['time']
+            except (OSError, ValueError) as e:
+                result = {"verified": False, "error": str(e)}
+            result["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+            results.append(result)
+        self.save_cache()
+        return results
+
+    def verify_files(self, img1, img2):
+        embedding1, embedding2 = self.embed_file(img1), self.embed_file(img2)
+        if embedding1 is None or embedding2 is None:
+            raise ValueError("No face found in one of the images")
+        return self.verify(embedding1, embedding2)
+
+
+def box_iou(a, b):
+    """Intersection over union of two [x, y, w, h] boxes"""
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    inter = max(0, x1 - x0) * max(0, y1 - y0)
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class FaceTrackIdentities:
+    """Track ids for face boxes across frames, with one embedding per track.
+
+    update() links boxes to existing tracks by IoU; a new track queues a crop
+    for embedding on a worker thread. With a target embedding set, each
+    embedded track is scored against it once, and target_track() returns the
+    visible track that matches.
+    """
+
+    def __init__(self, service, iou_threshold=0.3, max_missed=10, queue_size=4):
+        self.service = service
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed  # frames a track survives without a matching box
+        self.tracks = {}  # id -> {"box", "missed", "embedding", "distance", "verified", "pending"}
+        self.target = None
+        self.embeddings_computed = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._worker = threading.Thread(target=self._embed_loop, daemon=True)
+        self._worker.start()
+
+    def set_target(self, embedding):
+        """Match tracks against `embedding` from now on (None disables gating); cached tracks are re-scored"""
+        with self._lock:
+            self.target = _normalize(embedding) if embedding is not None else None
+            for track in self.tracks.values():
+                self._score(track)
+
+    def _score(self, track):
+        if self.target is None or track['embedding'] is None:
+            track['distance'] = None
+            track['verified'] = False
+            return
+        track['distance'] = max(0.0, float(1.0 - np.dot(track['embedding'], self.target)))
+        track['verified'] = track['distance'] <= self.service.threshold
+
+    def update(self, frame, boxes):
+        """Assign track ids to this frame's boxes; returns [(track_id, box)]"""
+        assigned = []
+        with self._lock:
+            unmatched = dict(self.tracks)
+            for box in sorted(boxes, key=lambda b: b[2] * b[3], reverse=True):
+                best_id, best_iou = None, self.iou_threshold
+                for track_id, track in unmatched.items():
+                    iou = box_iou(box, track['box'])
+                    if iou >= best_iou:
+                        best_id, best_iou = track_id, iou
+                if best_id is None:
+                    best_id = next(self._ids)
+                    self.tracks[best_id] = {"box": box, "missed": 0, "embedding": None, "distance": None,
+                                            "verified": False, "pending": False}
+                else:
+                    del unmatched[best_id]
+                track = self.tracks[best_id]
+                track['box'] = box
+                track['missed'] = 0
+                if track['embedding'] is None and not track['pending']:
+                    self._enqueue(best_id, track, frame)
+                assigned.append((best_id, box))
+            for track_id, track in unmatched.items():
+                track['missed'] += 1
+                if track['missed'] > self.max_missed:
+                    del self.tracks[track_id]
+        return assigned
+
+    def _enqueue(self, track_id, track, frame):
+        try:
+            self._queue.put_nowait((track_id, crop_face(frame, track['box']).copy()))
+            track['pending'] = True
+        except queue.Full:
+            pass  # retried on the track's next frame
+
+    def _embed_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            track_id, crop = item
+            try:
+                embedding = self.service.embed_crop(crop)
+            except Exception as e:
+                print(f"Face embedding failed for track {track_id}: {e}")
+                embedding = None
+            with self._lock:
+                track = self.tracks.get(track_id)
+                if track is None:
+                    continue
+                track['pending'] = False
+                if embedding is not None:
+                    track['embedding'] = embedding
+                    self.embeddings_computed += 1
+                    self._score(track)
+
+    def target_track(self):
+        """(track_id, box) of the visible track closest to the target, or None"""
+        with self._lock:
+            candidates = [(track['distance'], track_id, track['box']) for track_id, track in self.tracks.items()
+                          if track['verified'] and track['missed'] == 0]
+        if not candidates:
+            return None
+        _, track_id, box = min(candidates)
+        return track_id, box
+
+    def stats(self):
+        with self._lock:
+            return {
+                "target_set": self.target is not None,
+                "tracks": len(self.tracks),
+                "embedded": sum(1 for track in self.tracks.values() if track['embedding'] is not None),
+                "verified": [track_id for track_id, track in self.tracks.items() if track['verified']],
+                "embeddings_computed": self.embeddings_computed,
+            }
+
+    def stop(self):
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass  # daemon worker; it dies with the process
@@ -1,20 +1,42 @@
-import cv2
-from deepface import DeepFace
-import os
 import argparse
 
+from face_identity import FaceIdentityService
+from face_server import DEFAULT_FACE_SOCKET_PATH, FaceVerificationClient
+
+_service = None
+
+
+def get_identity_service():
+    """Shared FaceIdentityService, so model weights and the embedding cache load once per process"""
+    global _service
+    if _service is None:
+        _service = FaceIdentityService()
+    return _service
+
+
 def compare_faces(img1, img2):
-    return DeepFace.verify(img1_path=img1, img2_path=img2)
+    """DeepFace.verify-style result, using cached embeddings for both images"""
+    service = get_identity_service()
+    result = service.verify_files(img1, img2)
+    service.save_cache()
+    return result
 
 def main():
     parser = argparse.ArgumentParser()
     parser.add_argument("--img1", type=str, required=True, help="Path to the first image")
     parser.add_argument("--img2", type=str, required=True, help="Path to the second image")
+    parser.add_argument("--socket", type=str, default=DEFAULT_FACE_SOCKET_PATH,
+                        help="Face server socket; used when a server is running (see face_server.py)")
     args = parser.parse_args()
-    result = compare_faces(args.img1, args.img2)
+    try:
+        client = FaceVerificationClient(args.socket)
+    except OSError:
+        # No warm server: load the model in this process
+        result = compare_faces(args.img1, args.img2)
+    else:
+        result = client.verify([(args.img1, args.img2)])["results"][0]
+        client.close()
     print(result)
 
 if __name__ == "__main__":
     main()
-    
-    
\ No newline at end of file
@@ -0,0 +1,193 @@
+"""
+Long-lived face verification service.
+
+Importing DeepFace and building a model takes seconds, which the old
+face_recognizer CLI paid on every comparison. FaceVerificationServer keeps
+one warmed FaceIdentityService (and its embedding cache) in memory and
+answers requests on a Unix domain socket, framed like the event transport
+in ipc_transport (length-prefixed JSON):
+
+    {"op": "verify", "pairs": [["/uploads/a.jpg", "/tmp/b.jpg"], [[0.1, ...], [0.3, ...]]]}
+    {"op": "embed", "images": ["/uploads/a.jpg"]}
+    {"op": "match", "image": "/tmp/live.jpg", "top_k": 3}
+    {"op": "ping"}
+
+Every response carries the server-side latency_ms; verify results carry one
+per pair. Run with `python face_server.py`, talk to it with
+FaceVerificationClient.
+"""
+
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+
+from face_identity import DEFAULT_MODEL, FaceIdentityService
+from ipc_transport import _MESSAGE_HEADER, _recv_exact
+
+DEFAULT_FACE_SOCKET_PATH = "/tmp/ketchup_bot_faces.sock"
+
+
+def _send_message(conn, message):
+    payload = json.dumps(message).encode('utf-8')
+    conn.sendall(_MESSAGE_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_message(conn):
+    header = _recv_exact(conn, _MESSAGE_HEADER.size)
+    if header is None:
+        return None
+    (length,) = _MESSAGE_HEADER.unpack(header)
+    payload = _recv_exact(conn, length)
+    if payload is None:
+        return None
+    return json.loads(payload)
+
+
+class FaceVerificationServer:
+    def __init__(self, service=None, socket_path=DEFAULT_FACE_SOCKET_PATH):
+        self.service = service or FaceIdentityService()
+        self.socket_path = socket_path
+        self.running = False
+        self.requests = 0
+        self._server = None
+        self._accept_thread = None
+
+    def start(self, warmup=True):
+        if self.running:
+            return
+        if warmup:
+            self.service.warmup()
+            self.service.refresh_gallery()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        self._server.listen()
+        self.running = True
+        self._accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._accept_thread.start()
+        print(f"🧑 Face verification server listening on {self.socket_path}")
+
+    def warmup_async(self):
+        """Warm the model and gallery on a background thread, for apps that call handle() in-process"""
+        def warm():
+            try:
+                self.service.warmup()
+                self.service.refresh_gallery()
+            except ImportError as e:
+                print(f"⚠️ Face verification unavailable: {e}")
+
+        threading.Thread(target=warm, daemon=True).start()
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._connection_loop, args=(conn,), daemon=True).start()
+
+    def _connection_loop(self, conn):
+        with conn:
+            while self.running:
+                try:
+                    request = _recv_message(conn)
+                except ValueError as e:
+                    _send_message(conn, {"error": f"Malformed request: {e}"})
+                    continue
+                if request is None:
+                    break
+                _send_message(conn, self.handle(request))
+
+    def handle(self, request, allow_paths=True):
+        """Answer one request dict; also usable in-process without the socket.
+
+        HTTP callers pass `allow_paths` False: images must then be /uploads/ URLs or embeddings.
+        """
+        start = time.perf_counter()
+        self.requests += 1
+        op = request.get('op')
+        try:
+            if op == 'verify':
+                response = {"results": self.service.verify_batch(request.get('pairs', []), allow_paths)}
+            elif op == 'embed':
+                embeddings = [self.service.embed(image, allow_paths) for image in request.get('images', [])]
+                self.service.save_cache()
+                response = {"embeddings": [e.tolist() if e is not None else None for e in embeddings]}
+            elif op == 'match':
+                response = {"matches": self.service.match(self.service.embed(request['image'], allow_paths),
+                                                          request.get('top_k', 1))}
+            elif op == 'refresh':
+                response = {"gallery": self.service.refresh_gallery()}
+            elif op == 'ping':
+                response = {"model": self.service.model_name, "warm": self.service.warm, "requests": self.requests}
+            else:
+                response = {"error": f"Unknown op: {op}"}
+        except (KeyError, OSError, ValueError) as e:
+            response = {"error": str(e)}
+        response["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return response
+
+    def stop(self):
+        self.running = False
+        if self._server:
+            self._server.close()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.service.save_cache()
+
+
+class FaceVerificationClient:
+    """Blocking client for FaceVerificationServer; one request in flight per client"""
+
+    def __init__(self, socket_path=DEFAULT_FACE_SOCKET_PATH, timeout=30.0):
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        self._sock.connect(socket_path)
+        self._lock = threading.Lock()
+
+    def request(self, message):
+        with self._lock:
+            _send_message(self._sock, message)
+            response = _recv_message(self._sock)
+        if response is None:
+            raise ConnectionError("Face verification server closed the connection")
+        return response
+
+    def verify(self, pairs):
+        """Verify a batch of (a, b) pairs of paths, upload URLs or embeddings"""
+        return self.request({"op": "verify", "pairs": [list(pair) for pair in pairs]})
+
+    def embed(self, images):
+        return self.request({"op": "embed", "images": list(images)})
+
+    def match(self, image, top_k=1):
+        return self.request({"op": "match", "image": image, "top_k": top_k})
+
+    def close(self):
+        self._sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm DeepFace verification server")
+    parser.add_argument("--socket", default=DEFAULT_FACE_SOCKET_PATH, help="Unix socket path")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="DeepFace model name")
+    args = parser.parse_args()
+
+    server = FaceVerificationServer(FaceIdentityService(model_name=args.model), args.socket)
+    server.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("\n🛑 Stopping face verification server")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import cv2
 from ultralytics import YOLO
 from event_system import EventEmitter
+from frame_pacer import FramePacer
+from motion_gate import MotionGate
 import threading
 import time
 import math
@@ -8,10 +10,19 @@ import math
 FACE_CLASS_ID = 0  # Assuming class ID for face is 0
 
 class FaceTracker(EventEmitter):
-    def __init__(self, cv2_cap: cv2.VideoCapture, fps=30, threshold_distance=30):
+    def __init__(self, cv2_cap: cv2.VideoCapture, fps=30, threshold_distance=30, detection_store=None, perf=None,
+                 motion_gating=True, identities=None, confidence=0.6):
         super().__init__()
         self.cap = cv2_cap
+        self.detection_store = detection_store
+        self.perf = perf  # PerfRecorder for per-stage latency
+        self.pacer = FramePacer(fps)  # full rate with a target or while armed, idle rate otherwise
+        self.motion_gate = MotionGate() if motion_gating else None  # skips inference on static scenes
+        # FaceTrackIdentities; with a target set, only the matching track is reported
+        self.identities = identities
+        self.last_track_id = None
         self.fps = fps
+        self.confidence = confidence  # minimum detection confidence
         self.model = YOLO('yolov11n-face.pt')
         self.running = False
         self.thread = None
@@ -20,67 +31,108 @@ class FaceTracker(EventEmitter):
     
     def start_tracking(self):
         if not self.running:
+            # A loop stopped from its own thread (after firing) may still be finishing
+            if self.thread and self.thread is not threading.current_thread():
+                self.thread.join()
             self.running = True
+            self.last_face = None  # a face from the previous run must not be reported lost in this one
             self.thread = threading.Thread(target=self._tracking_loop)
             self.thread.start()
     
     def stop_tracking(self):
         self.running = False
-        if self.thread:
+        # Brain's fire handler stops tracking from inside the loop; that thread exits on its own
+        if self.thread and self.thread is not threading.current_thread():
             self.thread.join()
     
     def _tracking_loop(self):
-        frame_time = 1 / self.fps
-
         while self.running:
             start_time = time.time()
+            trace = self.perf.trace() if self.perf is not None else None
+            face = None
             try:
                 ret, frame = self.cap.read()
+                if trace is not None:
+                    trace.mark('capture')
                 # print(f"{frame.shape[1]}x{frame.shape[0]}")
                 if not ret:
                     self.emit('error', 'Failed to read frame')
                     break
-                face = self.get_biggest_face_coordinates(frame)
+                self.last_track_id = None
+                if self.motion_gate is None:
+                    face, _ = self._detect(frame, trace)
+                else:
+                    infer = self.motion_gate.should_infer(frame)
+                    if trace is not None:
+                        trace.mark('motion_gate')
+                    if infer:
+                        infer_start = time.perf_counter()
+                        face, seen = self._detect(frame, trace)
+                        self.motion_gate.record_inference(time.perf_counter() - infer_start, seen)
+                if self.detection_store is not None:
+                    if face is not None:
+                        self.detection_store.update('face', face, self.get_centroid(face))
+                    else:
+                        self.detection_store.clear('face')
                 if face is not None:
                     x_center, y_center = map(int, self.get_centroid(face))
                     self.emit('face_detected', {
                         'coordinates': (x_center, y_center),
                         'box': face,
-                        'frame': frame
+                        'frame': frame,
+                        'track_id': self.last_track_id,
+                        'trace': trace
                     })
+                    self.last_face = face
                 elif self.last_face is not None:
                     self.emit('face_lost', None)
                     self.last_face = None
+                self.emit('frame_ready', {'frame': frame, 'box': face})
+                if trace is not None:
+                    trace.finish()
             except Exception as e:
                 self.emit('error', f'Error in tracking loop: {e}')
             finally:
                 elapsed_time = time.time() - start_time
-                sleep_time = max(0, frame_time - elapsed_time)
-                if sleep_time > 0:
-                    time.sleep(sleep_time)
+                self.pacer.wait(self.pacer.frame_done(elapsed_time, face is not None))
+
+    def _detect(self, frame, trace):
+        """(face to aim at, whether any face was seen)"""
+        if self.identities is None or self.identities.target is None:
+            face = self.get_biggest_face_coordinates(frame, trace=trace)
+            return face, face is not None
+        # Identity mode: every face gets a track, only the target's track is aimed at
+        faces = self.find_faces(frame, trace=trace)
+        self.identities.update(frame, faces)
+        match = self.identities.target_track()
+        if match is None:
+            return None, bool(faces)
+        self.last_track_id, face = match
+        return face, True
 
     def get_centroid(self, box):
         return (box[0] + box[2] / 2, box[1] + box[3] / 2)
 
-    def find_faces(self, frame):
+    def find_faces(self, frame, trace=None):
         """Find faces in frame, returns bounding box in [x, y, w, h] format or None"""
         results = self.model(frame, verbose=False)
+        if trace is not None:
+            trace.mark_model(results)
         res = []
         for result in results:
             boxes = result.boxes
             for box in boxes:
-                # print(box.conf > 0.6)
-                if int(box.cls) == FACE_CLASS_ID and box.conf > 0.6:  # Confidence threshold
+                if int(box.cls) == FACE_CLASS_ID and box.conf > self.confidence:
                     # Convert from [x1, y1, x2, y2] to [x, y, w, h]
                     x1, y1, x2, y2 = map(int, box.xyxy[0])
                     res.append([x1, y1, x2 - x1, y2 - y1])  # [x, y, width, height]
         return res
 
-    def get_biggest_face_coordinates(self, frame, min_size=(30, 30)):
+    def get_biggest_face_coordinates(self, frame, min_size=(30, 30), trace=None):
         '''
         Returns the coordinates of the biggest face in the frame, or None if no face is found
         '''
-        faces = self.find_faces(frame)  # Assuming class 0 is face
+        faces = self.find_faces(frame, trace=trace)  # Assuming class 0 is face
         if len(faces) == 0:
             return None
         return max(faces, key=lambda x: x[2] * x[3])
@@ -88,6 +140,8 @@ class FaceTracker(EventEmitter):
 
     def destroy(self):
         self.stop_tracking()
+        if self.identities is not None:
+            self.identities.stop()
 
 
 if __name__ == "__main__":
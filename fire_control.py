@@ -0,0 +1,296 @@
+"""
+Fire control: when to shoot, as an explicit state machine.
+
+    searching  no target
+    tracking   a target is seen, but not in the fire zone (or we are not armed)
+    locked     armed with the target in the fire zone; the shot is scheduled
+               at the dwell deadline
+    firing     solenoid pulse in progress (release_time); the turret holds
+               still, unless the burst's next shot is on another target class
+    homing     turret going home, after a shot or when a target with
+               home_on_lost disappears
+    cooldown   no new lock until `cooldown` seconds after the last shot
+
+Detections only report what the camera saw (observe/lose/arm). Deadlines
+(dwell, end of the pulse, end of cooldown, and lock staleness) are kept on
+the monotonic clock by a scheduler thread, so a shot goes off at its dwell
+deadline instead of on the first frame after it, and firing latency does not
+depend on the detection frame rate. A lock is dropped when no in-zone
+detection arrived for `max_detection_age` seconds, so the target is still
+confirmed in the zone when the deadline fires.
+
+During a multi-shot order (see dispense_planner.py) Brain sets a plan for
+each shot: its target class, pulse length, the valves to open, dwell
+override and the gap after the pulse that replaces the cooldown. Planned shots do not home in between;
+clear_plan() ends the burst, restores the normal cooldown and homes. Once
+the plan for the next shot is set during a pulse, pre_aiming() lets Brain
+aim at that shot's target if it is another class, and the lock on it is
+taken as soon as the pulse ends.
+
+Emits 'transition' for every state change (also logged), 'fire' when a shot
+is due and 'home' when the turret should go home; Brain acts on those and
+calls homing_finished() when the homing motion ends.
+"""
+
+import threading
+import time
+from collections import deque
+
+from event_system import EventEmitter
+from structured_logging import get_logger
+
+log = get_logger('fire_control')
+
+SEARCHING = 'searching'
+TRACKING = 'tracking'
+LOCKED = 'locked'
+FIRING = 'firing'
+HOMING = 'homing'
+COOLDOWN = 'cooldown'
+
+
+class FireControl(EventEmitter):
+    def __init__(self, cooldown=5.0, release_time=0.5, max_detection_age=0.5, home_after_shot=True, history=50,
+                 clock=time.monotonic):
+        super().__init__()
+        self.clock = clock  # a test clock drives the deadlines through tick() instead of start()
+        self.cooldown = cooldown  # seconds from one shot to the next possible lock
+        self.release_time = release_time  # solenoid pulse length
+        self.max_detection_age = max_detection_age
+        self.home_after_shot = home_after_shot
+        self.state = SEARCHING
+        self.kind = None
+        self.armed = False
+        self.last_detection = None  # {"kind", "at", "error", "in_zone", "dwell"}
+        self.last_shot = None
+        self.shots = 0
+        self.transitions = deque(maxlen=history)
+        self.plan = None  # {"target", "pulse", "dwell", "gap", "valves"} for the next shot of a multi-shot order
+        self.running = False
+        self._deadlines = {}  # name -> monotonic time: 'dwell', 'stale', 'release', 'cooldown'
+        self._cooldown_until = 0.0
+        self._last_shot_at = None
+        self._pending = []  # (event, data) to emit once the condition is released
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+
+    # Inputs
+
+    def arm(self, armed):
+        with self._cond:
+            self.armed = armed
+            now = self.clock()
+            if not armed and self.state == LOCKED:
+                self._transition(TRACKING, 'disarmed')
+            elif armed and self.state == TRACKING and self._fresh_in_zone(now):
+                self._lock_on(now)
+            self._cond.notify()
+        self._flush()
+
+    def observe(self, kind, error, in_zone, dwell=0.0):
+        """A detection of `kind` at pixel `error` from center; returns the state after it"""
+        with self._cond:
+            now = self.clock()
+            self.kind = kind
+            self.last_detection = {"kind": kind, "at": now, "error": error, "in_zone": in_zone, "dwell": dwell}
+            if self.state in (SEARCHING, HOMING):
+                # Aiming at the new target pre-empts any homing motion; a recent shot still cools down
+                self._settle(now, 'target_acquired')
+            if self.state == TRACKING and in_zone and self.armed:
+                self._lock_on(now)
+            elif self.state == LOCKED:
+                if in_zone:
+                    self._deadlines['stale'] = now + self.max_detection_age
+                else:
+                    self._transition(TRACKING, 'left_fire_zone')
+            self._cond.notify()
+            state = self.state
+        self._flush()
+        return state
+
+    def lose(self, kind, home=False):
+        """The target of `kind` disappeared; with `home`, send the turret home"""
+        with self._cond:
+            self.last_detection = None
+            if self.state in (TRACKING, LOCKED) or (self.state == SEARCHING and home):
+                if home:
+                    self._transition(HOMING, 'target_lost')
+                    self._pending.append(('home', {"kind": kind, "reason": 'target_lost'}))
+                else:
+                    self._transition(SEARCHING, 'target_lost')
+            self._cond.notify()
+        self._flush()
+
+    def set_plan(self, target, pulse, dwell=None, gap=0.3, valves=None):
+        """Make the next shot part of a planned burst; `dwell` None keeps the target policy's dwell.
+
+        `valves` ([channel, seconds] pairs) is passed on with the 'fire' event.
+
+        The gap only applies after shots of the same burst; a cooldown left by
+        an earlier shot still runs out in full.
+        """
+        with self._cond:
+            self.plan = {"target": target, "pulse": pulse, "dwell": dwell, "gap": gap, "valves": valves}
+            if self.last_detection is not None and self.last_detection["kind"] != target:
+                # A detection of the previous step's target must not lock this one
+                self.last_detection = None
+            self._cond.notify()
+        self._flush()
+
+    def clear_plan(self, home=True):
+        """End a planned burst: the normal cooldown applies from the last shot, and the turret goes home"""
+        with self._cond:
+            if self.plan is not None:
+                self.plan = None
+                if self._last_shot_at is not None:
+                    self._cooldown_until = max(self._cooldown_until, self._last_shot_at + self.cooldown)
+                    if self.state == COOLDOWN:
+                        self._deadlines['cooldown'] = self._cooldown_until
+                # A shot still firing homes when its pulse ends
+                if home and self.state in (SEARCHING, TRACKING, LOCKED, COOLDOWN):
+                    previous = self.state
+                    self._transition(HOMING, 'order_done')
+                    self._pending.append(('home', {"kind": self.kind, "reason": 'order_done'}))
+                    if previous == COOLDOWN:
+                        self._deadlines.pop('cooldown', None)
+            self._cond.notify()
+        self._flush()
+
+    def pre_aiming(self, kind):
+        """Whether `kind` may be aimed at during the pulse: the planned next shot is on it, not on the target being fired at"""
+        with self._cond:
+            return (self.state == FIRING and self.plan is not None and self.plan["target"] == kind
+                    and self.last_shot is not None and self.last_shot["kind"] != kind)
+
+    def homing_finished(self, result=None):
+        with self._cond:
+            if self.state == HOMING:
+                self._settle(self.clock(), 'homed')
+            self._cond.notify()
+        self._flush()
+
+    # Scheduler
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self.running:
+                    return
+                now = self.clock()
+                if not self._expire_due(now):
+                    timeout = min(self._deadlines.values()) - now if self._deadlines else None
+                    self._cond.wait(timeout)
+            self._flush()
+
+    def tick(self):
+        """Expire every deadline that is due now, as the scheduler thread would"""
+        with self._cond:
+            while self._expire_due(self.clock()):
+                pass
+        self._flush()
+
+    def _expire_due(self, now):
+        due = sorted((at, name) for name, at in self._deadlines.items() if at <= now)
+        for at, name in due:
+            # An earlier expiry may already have cancelled this one
+            if self._deadlines.get(name) == at:
+                del self._deadlines[name]
+                self._expire(name, at, now)
+        return bool(due)
+
+    def _expire(self, name, deadline, now):
+        if name == 'stale' and self.state == LOCKED:
+            self._transition(TRACKING, 'lock_stale')
+        elif name == 'dwell' and self.state == LOCKED:
+            self._deadlines.pop('stale', None)
+            self._transition(FIRING, 'dwell_elapsed')
+            plan = self.plan
+            pulse = plan["pulse"] if plan else self.release_time
+            self.shots += 1
+            self._last_shot_at = now
+            self._cooldown_until = now + (pulse + plan["gap"] if plan else self.cooldown)
+            self._deadlines['release'] = now + pulse
+            self.last_shot = {"kind": self.kind, "at": time.time(), "late_ms": round((now - deadline) * 1000, 3),
+                              "error": self.last_detection["error"] if self.last_detection else None,
+                              "pulse": pulse, "planned": plan is not None, "valves": plan["valves"] if plan else None}
+            self._pending.append(('fire', dict(self.last_shot, late_ns=int((now - deadline) * 1e9))))
+        elif name == 'release' and self.state == FIRING:
+            if self.home_after_shot and self.plan is None:
+                self._transition(HOMING, 'shot_done')
+                self._pending.append(('home', {"kind": self.kind, "reason": 'shot_done'}))
+            else:
+                self._settle(now, 'shot_done')
+        elif name == 'cooldown' and self.state == COOLDOWN:
+            self._settle(now, 'cooldown_elapsed')
+
+    # Helpers; all called with the condition held
+
+    def _fresh_in_zone(self, now):
+        detection = self.last_detection
+        return detection is not None and detection["in_zone"] and now - detection["at"] <= self.max_detection_age
+
+    def _lock_on(self, now):
+        plan = self.plan
+        if plan is not None and plan["target"] != self.last_detection["kind"]:
+            return  # the planned shot is for another target class
+        self._transition(LOCKED, 'in_fire_zone')
+        dwell = plan["dwell"] if plan is not None and plan["dwell"] is not None else self.last_detection["dwell"]
+        self._deadlines['dwell'] = now + dwell
+        self._deadlines['stale'] = now + self.max_detection_age
+
+    def _settle(self, now, reason):
+        """Leave firing/homing: cool down if the last shot was recent, else back to tracking or searching"""
+        if now < self._cooldown_until:
+            self._transition(COOLDOWN, reason)
+            self._deadlines['cooldown'] = self._cooldown_until
+        elif self.last_detection is not None and now - self.last_detection["at"] <= self.max_detection_age:
+            self._transition(TRACKING, reason)
+            if self.armed and self._fresh_in_zone(now):
+                self._lock_on(now)
+        else:
+            self._transition(SEARCHING, reason)
+
+    def _transition(self, state, reason):
+        if state == self.state:
+            return
+        previous, self.state = self.state, state
+        if previous == LOCKED:
+            self._deadlines.pop('dwell', None)
+            self._deadlines.pop('stale', None)
+        transition = {"at": time.time(), "from": previous, "to": state, "reason": reason, "target": self.kind}
+        self.transitions.append(transition)
+        log.info('fire_control_transition', from_state=previous, to_state=state, reason=reason, target=self.kind)
+        self._pending.append(('transition', transition))
+
+    def _flush(self):
+        with self._cond:
+            pending, self._pending = self._pending, []
+        for event, data in pending:
+            self.emit(event, data)
+
+    def status(self):
+        with self._cond:
+            now = self.clock()
+            return {
+                "state": self.state,
+                "target": self.kind,
+                "armed": self.armed,
+                "shots": self.shots,
+                "plan": self.plan,
+                "last_shot": self.last_shot,
+                "deadlines_in_ms": {name: round((at - now) * 1000, 1) for name, at in self._deadlines.items()},
+                "transitions": list(self.transitions)[-10:],
+            }
@@ -0,0 +1,103 @@
+"""
+Adaptive frame pacing for the capture/tracking loops.
+
+Instead of a fixed fps, a loop asks its FramePacer how long to wait after
+each frame:
+
+- idle rate (a couple of fps) while nothing has been seen for `idle_after`
+  seconds, so an empty counter costs almost no CPU;
+- full rate as soon as a target is seen or the pacer is boosted (Brain
+  boosts while `fireable` is set); boosting also cuts a pending idle wait
+  short;
+- below full rate when the loop's own work does not fit the frame budget
+  (rate capped so busy time stays under `busy_fraction` of each frame) or
+  the machine's load average per CPU is above `max_load`.
+"""
+
+import os
+import threading
+import time
+
+
+class FramePacer:
+    def __init__(self, full_fps, idle_fps=2.0, idle_after=3.0, busy_fraction=0.8, max_load=0.9, adaptive=True):
+        self.full_fps = full_fps
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after  # seconds without a target before dropping to idle
+        self.busy_fraction = busy_fraction
+        self.max_load = max_load
+        self.adaptive = adaptive  # False paces at full_fps like the old fixed loops
+        self.busy_ewma = None
+        self.last_target_at = None
+        self.boosted = False
+        self.current_fps = full_fps
+        self.state = 'active'
+        self._load_factor = 1.0
+        self._load_checked_at = 0.0
+        self._wakeup = threading.Event()
+
+    def boost(self, on=True):
+        """Hold full rate regardless of targets (e.g. while armed)"""
+        self.boosted = on
+        if on:
+            self._wakeup.set()
+
+    def note_target(self):
+        """Record a target sighting reported from outside the loop (e.g. remote detections)"""
+        was_idle = self.state == 'idle'
+        self.last_target_at = time.monotonic()
+        if was_idle:
+            self._wakeup.set()
+
+    def _cpu_load_factor(self, now):
+        # Load average moves slowly; look at it once a second
+        if now - self._load_checked_at >= 1.0:
+            self._load_checked_at = now
+            try:
+                load = os.getloadavg()[0] / (os.cpu_count() or 1)
+            except (OSError, AttributeError):
+                load = 0.0
+            self._load_factor = min(1.0, self.max_load / load) if load > self.max_load else 1.0
+        return self._load_factor
+
+    def frame_done(self, busy_seconds, target_present=None):
+        """Report one loop iteration; returns how many seconds to wait before the next frame"""
+        now = time.monotonic()
+        if target_present:
+            self.last_target_at = now
+        if not self.adaptive:
+            self.current_fps = self.full_fps
+            return max(0.0, 1.0 / self.full_fps - busy_seconds)
+
+        self.busy_ewma = busy_seconds if self.busy_ewma is None else 0.8 * self.busy_ewma + 0.2 * busy_seconds
+        recently_seen = self.last_target_at is not None and now - self.last_target_at < self.idle_after
+        if self.boosted or recently_seen:
+            self.state = 'active'
+            fps = self.full_fps
+            # Back off when the work no longer fits the frame budget
+            if self.busy_ewma > 0:
+                fps = min(fps, self.busy_fraction / self.busy_ewma)
+            fps *= self._cpu_load_factor(now)
+            fps = max(fps, self.idle_fps)
+        else:
+            self.state = 'idle'
+            fps = self.idle_fps
+        self.current_fps = fps
+        return max(0.0, 1.0 / fps - busy_seconds)
+
+    def wait(self, seconds):
+        """Sleep until the next frame is due, waking early on boost or a new target while idle"""
+        if seconds > 0:
+            self._wakeup.wait(seconds)
+        self._wakeup.clear()
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "fps": round(self.current_fps, 2),
+            "full_fps": self.full_fps,
+            "idle_fps": self.idle_fps,
+            "boosted": self.boosted,
+            "busy_ms": round(self.busy_ewma * 1000, 2) if self.busy_ewma is not None else None,
+            "load_factor": round(self._load_factor, 2),
+        }
@@ -3,15 +3,26 @@ import cv2
 import threading
 import time
 from event_system import EventEmitter
+from frame_pacer import FramePacer
+from motion_gate import MotionGate
+from structured_logging import get_logger
 
 HOTDOG_CLASS_ID = 52
 
+log = get_logger('hotdog_recognizer')
+
 class HotdogRecognizer(EventEmitter):
-    def __init__(self, cv2_cap, fps=10, threshold_distance=35):  # Lower FPS for YOLO processing
+    def __init__(self, cv2_cap, fps=10, threshold_distance=35, detection_store=None, perf=None,
+                 motion_gating=True, confidence=0.0):  # Lower FPS for YOLO processing
         super().__init__()
         self.cap = cv2_cap
+        self.detection_store = detection_store
+        self.perf = perf  # PerfRecorder for per-stage latency
+        self.pacer = FramePacer(fps)  # full rate with a target or while armed, idle rate otherwise
+        self.motion_gate = MotionGate() if motion_gating else None  # skips inference on static scenes
         self.model = YOLO('yolov8n.pt')
         self.fps = fps
+        self.confidence = confidence  # minimum detection confidence; the model's own cutoff applies first
         self.running = False
         self.thread = None
         self.last_hotdog = None
@@ -20,6 +31,9 @@ class HotdogRecognizer(EventEmitter):
     def start_tracking(self):
         """Start hotdog tracking in a separate thread"""
         if not self.running:
+            # A loop stopped from its own thread (after firing) may still be finishing
+            if self.thread and self.thread is not threading.current_thread():
+                self.thread.join()
             self.running = True
             self.thread = threading.Thread(target=self._tracking_loop, daemon=True)
             self.thread.start()
@@ -27,69 +41,90 @@ class HotdogRecognizer(EventEmitter):
     def stop_tracking(self):
         """Stop hotdog tracking"""
         self.running = False
-        if self.thread:
+        # Brain's fire handler stops tracking from inside the loop; that thread exits on its own
+        if self.thread and self.thread is not threading.current_thread():
             self.thread.join()
     
     def _tracking_loop(self):
         """Main tracking loop that runs in separate thread"""
-        frame_time = 1.0 / self.fps
-        
         while self.running:
             start_time = time.time()
+            trace = self.perf.trace() if self.perf is not None else None
+            hotdog_box = None
             
             try:
                 success, frame = self.cap.read()
+                if trace is not None:
+                    trace.mark('capture')
                 # print(f"{frame.shape[1]}x{frame.shape[0]}")
                 if not success:
                     self.emit('camera_error', 'Failed to read frame')
                     break
                 
-                hotdog_box = self.find_biggest_hotdog(frame)
+                if self.motion_gate is None:
+                    hotdog_box = self.find_biggest_hotdog(frame, trace=trace)
+                else:
+                    infer = self.motion_gate.should_infer(frame)
+                    if trace is not None:
+                        trace.mark('motion_gate')
+                    if infer:
+                        infer_start = time.perf_counter()
+                        hotdog_box = self.find_biggest_hotdog(frame, trace=trace)
+                        self.motion_gate.record_inference(time.perf_counter() - infer_start, hotdog_box is not None)
                 
                 if hotdog_box is not None:
                     # Now hotdog_box is [x, y, w, h] format
                     x_center = hotdog_box[0] + hotdog_box[2] / 2
                     y_center = hotdog_box[1] + hotdog_box[3] / 2
+                    if self.detection_store is not None:
+                        self.detection_store.update('hotdog', hotdog_box, (x_center, y_center))
                     
                     # Check if hotdog moved significantly
                     self.emit('hotdog_detected', {
                         'coordinates': (x_center, y_center),
                         'box': hotdog_box,
-                        'frame': frame
+                        'frame': frame,
+                        'trace': trace
                     })
                     self.last_hotdog = (x_center, y_center)
                 
-                elif self.last_hotdog is not None:
-                    self.emit('hotdog_lost', None)
-                    self.last_hotdog = None
+                else:
+                    if self.detection_store is not None:
+                        self.detection_store.clear('hotdog')
+                    if self.last_hotdog is not None:
+                        self.emit('hotdog_lost', None)
+                        self.last_hotdog = None
+                self.emit('frame_ready', {'frame': frame, 'box': hotdog_box})
+                if trace is not None:
+                    trace.finish()
                 
                     
             except Exception as e:
                 self.emit('tracking_error', f"Error in tracking loop: {e}")
-                print(f"Hotdog tracking error: {e}")
+                log.error('tracking_error', error=str(e))
             
             # Control frame rate
             elapsed = time.time() - start_time
-            sleep_time = max(0, frame_time - elapsed)
-            if sleep_time > 0:
-                time.sleep(sleep_time)
+            self.pacer.wait(self.pacer.frame_done(elapsed, hotdog_box is not None))
 
     
-    def find_hotdogs(self, frame):
+    def find_hotdogs(self, frame, trace=None):
         """Find hotdog in frame, returns bounding box in [x, y, w, h] format or None"""
         results = self.model(frame, verbose=False)
+        if trace is not None:
+            trace.mark_model(results)
         res = []
         for result in results:
             boxes = result.boxes
             for box in boxes:
-                if int(box.cls) == HOTDOG_CLASS_ID:
+                if int(box.cls) == HOTDOG_CLASS_ID and box.conf > self.confidence:
                     # Convert from [x1, y1, x2, y2] to [x, y, w, h]
                     x1, y1, x2, y2 = map(int, box.xyxy[0])
                     res.append([x1, y1, x2 - x1, y2 - y1])  # [x, y, width, height]
         return res
     
-    def find_biggest_hotdog(self, frame):
-        hotdogs = self.find_hotdogs(frame)
+    def find_biggest_hotdog(self, frame, trace=None):
+        hotdogs = self.find_hotdogs(frame, trace=trace)
         if len(hotdogs) == 0:
             return None
         return max(hotdogs, key=lambda x: x[2] * x[3])
@@ -0,0 +1,161 @@
+"""
+Process-pool inference with shared-memory frame handoff.
+
+The capture side copies each frame into a free slot of a SharedFrameBuffer and
+queues only (seq, slot). N worker processes run the detector on that slot and
+send back (seq, box). Results can arrive out of order; results() hands them
+back in sequence order.
+"""
+
+import multiprocessing as mp
+import os
+import queue
+import time
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from ipc_transport import SharedFrameBuffer
+
+
+def _worker_main(kind, buffer_name, task_queue, result_queue, detector_loader):
+    """Worker process: attach to the frame buffer, run the detector on queued slots"""
+    detect = detector_loader(kind)
+    frame_buffer = SharedFrameBuffer(buffer_name, shared_tracker=True)
+    worker_id = os.getpid()
+    result_queue.put(('ready', worker_id))
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            seq, slot = task
+            read_seq, _, frame = frame_buffer.read_slot(slot)
+            if read_seq != seq or frame is None:
+                result_queue.put(('result', seq, None, worker_id, 0.0))
+                continue
+            start_time = time.perf_counter()
+            box = detect(frame)
+            infer_ms = (time.perf_counter() - start_time) * 1000
+            result_queue.put(('result', seq, box, worker_id, infer_ms))
+    finally:
+        frame_buffer.close()
+
+
+def _default_detector_loader(kind):
+    from detector_worker import load_detector
+    return load_detector(kind)
+
+
+class InferencePool:
+    """Pool of detector processes fed through shared-memory frame slots"""
+
+    def __init__(self, kind, workers=2, frame_shape=(1080, 1920, 3), slots=None,
+                 detector_loader: Callable = _default_detector_loader, buffer_name=None):
+        self.kind = kind
+        self.workers = workers
+        self.slots = slots or workers * 2
+        self.buffer_name = buffer_name or f"ketchup_pool_{kind}_{os.getpid()}"
+        self.frame_buffer = SharedFrameBuffer(self.buffer_name, create=True, shape=frame_shape, slots=self.slots)
+
+        # spawn keeps each worker's model/torch state independent of the parent
+        ctx = mp.get_context('spawn')
+        self._task_queue = ctx.Queue()
+        self._result_queue = ctx.Queue()
+        self._processes = [
+            ctx.Process(target=_worker_main,
+                        args=(kind, self.buffer_name, self._task_queue, self._result_queue, detector_loader),
+                        daemon=True)
+            for _ in range(workers)
+        ]
+        self._free_slots = list(range(self.slots))
+        self._slot_for_seq: Dict[int, int] = {}
+        self._pending: Dict[int, Tuple[Optional[list], int, float]] = {}
+        self._next_result_seq = None
+        self.submitted = 0
+        self.dropped = 0
+        self.started = False
+
+    def start(self, timeout=120.0):
+        """Start the workers and wait until every model is loaded"""
+        for process in self._processes:
+            process.start()
+        ready = 0
+        deadline = time.monotonic() + timeout
+        while ready < self.workers:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Only {ready}/{self.workers} inference workers became ready")
+            message = self._result_queue.get(timeout=remaining)
+            if message[0] == 'ready':
+                ready += 1
+        self.started = True
+        print(f"✅ {self.workers} {self.kind} inference workers ready")
+
+    @property
+    def in_flight(self) -> int:
+        return self.slots - len(self._free_slots)
+
+    def submit(self, frame, block=False, timeout=None) -> Optional[int]:
+        """Queue a frame for inference and return its sequence number.
+
+        With no free slot the frame is dropped (None is returned) unless `block`
+        is set, in which case finished results are drained until a slot frees up.
+        """
+        if not self._free_slots:
+            if not block:
+                self.dropped += 1
+                return None
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while not self._free_slots:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not self._collect(timeout=remaining):
+                    self.dropped += 1
+                    return None
+        slot = self._free_slots.pop()
+        seq = self.frame_buffer.write(frame, slot=slot)
+        if self._next_result_seq is None:
+            self._next_result_seq = seq
+        self._slot_for_seq[seq] = slot
+        self._task_queue.put((seq, slot))
+        self.submitted += 1
+        return seq
+
+    def _collect(self, timeout=None) -> bool:
+        """Receive one worker result and release its slot; False on timeout"""
+        try:
+            message = self._result_queue.get(timeout=timeout)
+        except queue.Empty:
+            return False
+        if message[0] != 'result':
+            return True
+        _, seq, box, worker_id, infer_ms = message
+        self._free_slots.append(self._slot_for_seq.pop(seq))
+        self._pending[seq] = (box, worker_id, infer_ms)
+        return True
+
+    def results(self, timeout=0.0) -> Iterator[Tuple[int, Optional[list], float]]:
+        """Yield (seq, box, infer_ms) in sequence order for every result that is ready"""
+        while self._collect(timeout=timeout):
+            timeout = 0.0
+        while self._next_result_seq in self._pending:
+            box, _, infer_ms = self._pending.pop(self._next_result_seq)
+            yield self._next_result_seq, box, infer_ms
+            self._next_result_seq += 1
+
+    def drain(self, timeout=30.0) -> Iterator[Tuple[int, Optional[list], float]]:
+        """Wait for every submitted frame and yield the remaining results in order"""
+        deadline = time.monotonic() + timeout
+        while self._slot_for_seq or self._pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            yield from self.results(timeout=min(remaining, 0.1))
+
+    def stop(self):
+        for _ in self._processes:
+            self._task_queue.put(None)
+        for process in self._processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.frame_buffer.close()
+        self.started = False
@@ -0,0 +1,303 @@
+"""
+Cross-process transport for the event system.
+
+Frames travel through a shared-memory ring (no pickling), events travel as
+small length-prefixed JSON messages over a Unix domain socket. A detector
+worker publishes with IPCEventPublisher.emit(), and the brain/API process
+listens on an IPCEventServer exactly like any other EventEmitter.
+"""
+
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+from event_system import EventEmitter
+from frame_pacer import FramePacer
+
+DEFAULT_SOCKET_PATH = "/tmp/ketchup_bot_events.sock"
+DEFAULT_FRAME_BUFFER_NAME = "ketchup_bot_frames"
+
+# Buffer header: magic, slot count, frame height, width, channels
+_BUFFER_HEADER = struct.Struct("<4sIIII")
+_BUFFER_MAGIC = b"KBFR"
+# Per-slot header: sequence number (0 = empty / being written), capture time in ns
+_SLOT_HEADER = struct.Struct("<QQ")
+# Event messages are prefixed with their length
+_MESSAGE_HEADER = struct.Struct("<I")
+
+
+class SharedFrameBuffer:
+    """Ring of fixed-size uint8 frame slots living in shared memory.
+
+    There is a single writer (the capture side). Each slot carries a sequence
+    number that is zeroed while the slot is being written, so readers can tell
+    a torn read from a good one without any locking.
+    """
+
+    def __init__(self, name=DEFAULT_FRAME_BUFFER_NAME, create=False, shape=(1080, 1920, 3), slots=4,
+                 shared_tracker=False):
+        self.name = name
+        self._owner = create
+        if create:
+            height, width, channels = shape
+            self.frame_bytes = height * width * channels
+            size = _BUFFER_HEADER.size + slots * (_SLOT_HEADER.size + self.frame_bytes)
+            try:
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            except FileExistsError:
+                # Stale segment left behind by a crashed process
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+                self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            _BUFFER_HEADER.pack_into(self._shm.buf, 0, _BUFFER_MAGIC, slots, height, width, channels)
+            for slot in range(slots):
+                _SLOT_HEADER.pack_into(self._shm.buf, self._slot_offset_for(slot, self.frame_bytes), 0, 0)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # Attaching registers the segment with this process's resource tracker,
+            # which would unlink it when a worker exits; only the creator owns it.
+            # Children started by multiprocessing share the creator's tracker instead.
+            if not shared_tracker:
+                try:
+                    resource_tracker.unregister(self._shm._name, "shared_memory")
+                except Exception:
+                    pass
+            magic, slots, height, width, channels = _BUFFER_HEADER.unpack_from(self._shm.buf, 0)
+            if magic != _BUFFER_MAGIC:
+                raise ValueError(f"Shared memory '{name}' is not a frame buffer")
+            self.frame_bytes = height * width * channels
+
+        self.slots = slots
+        self.shape = (height, width, channels)
+        self._next_seq = 1
+
+    @staticmethod
+    def _slot_offset_for(slot, frame_bytes):
+        return _BUFFER_HEADER.size + slot * (_SLOT_HEADER.size + frame_bytes)
+
+    def _slot_view(self, slot):
+        offset = self._slot_offset_for(slot, self.frame_bytes) + _SLOT_HEADER.size
+        return np.ndarray(self.shape, dtype=np.uint8, buffer=self._shm.buf, offset=offset)
+
+    def _slot_header(self, slot) -> Tuple[int, int]:
+        return _SLOT_HEADER.unpack_from(self._shm.buf, self._slot_offset_for(slot, self.frame_bytes))
+
+    def write(self, frame, slot=None) -> int:
+        """Copy a frame into the ring and return its sequence number"""
+        if frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match buffer shape {self.shape}")
+        seq = self._next_seq
+        self._next_seq += 1
+        if slot is None:
+            slot = seq % self.slots
+        header_offset = self._slot_offset_for(slot, self.frame_bytes)
+        _SLOT_HEADER.pack_into(self._shm.buf, header_offset, 0, 0)
+        np.copyto(self._slot_view(slot), frame)
+        _SLOT_HEADER.pack_into(self._shm.buf, header_offset, seq, time.time_ns())
+        return seq
+
+    def read_slot(self, slot) -> Tuple[int, int, Optional[np.ndarray]]:
+        """Return (seq, timestamp_ns, frame copy) for a slot, frame is None if the read was torn"""
+        seq, timestamp_ns = self._slot_header(slot)
+        if seq == 0:
+            return 0, 0, None
+        frame = self._slot_view(slot).copy()
+        if self._slot_header(slot)[0] != seq:
+            return 0, 0, None
+        return seq, timestamp_ns, frame
+
+    def read(self, seq) -> Optional[np.ndarray]:
+        """Return a copy of frame `seq`, or None if it was already overwritten"""
+        read_seq, _, frame = self.read_slot(seq % self.slots)
+        return frame if read_seq == seq else None
+
+    def latest_seq(self) -> int:
+        return max(self._slot_header(slot)[0] for slot in range(self.slots))
+
+    def read_latest(self, after_seq=0) -> Tuple[int, Optional[np.ndarray]]:
+        """Return the newest (seq, frame) strictly after `after_seq`, or (after_seq, None)"""
+        seq = self.latest_seq()
+        if seq <= after_seq:
+            return after_seq, None
+        frame = self.read(seq)
+        if frame is None:
+            return after_seq, None
+        return seq, frame
+
+    def close(self):
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _to_wire(data: Any) -> Any:
+    """Make event payloads JSON friendly; frames are replaced by their sequence number"""
+    if isinstance(data, dict):
+        return {key: _to_wire(value) for key, value in data.items() if key != 'frame'}
+    if isinstance(data, (list, tuple)):
+        return [_to_wire(value) for value in data]
+    if isinstance(data, np.generic):
+        return data.item()
+    return data
+
+
+def _recv_exact(conn, size) -> Optional[bytes]:
+    chunks = bytearray()
+    while len(chunks) < size:
+        chunk = conn.recv(size - len(chunks))
+        if not chunk:
+            return None
+        chunks.extend(chunk)
+    return bytes(chunks)
+
+
+class IPCEventPublisher:
+    """Worker side of the transport; emit() mirrors EventEmitter.emit()"""
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, connect_timeout=10.0):
+        self.socket_path = socket_path
+        self._lock = threading.Lock()
+        self._sock = None
+        self._connect(connect_timeout)
+
+    def _connect(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.connect(self.socket_path)
+                self._sock = sock
+                return
+            except (FileNotFoundError, ConnectionRefusedError):
+                sock.close()
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+
+    def emit(self, event_name: str, data: Any):
+        payload = json.dumps({'event': event_name, 'data': _to_wire(data)}).encode('utf-8')
+        with self._lock:
+            self._sock.sendall(_MESSAGE_HEADER.pack(len(payload)) + payload)
+
+    def close(self):
+        with self._lock:
+            if self._sock:
+                self._sock.close()
+                self._sock = None
+
+
+class IPCEventServer(EventEmitter):
+    """Brain/API side of the transport.
+
+    Accepts any number of publishers and re-emits their events locally. When a
+    frame buffer is attached, payloads carrying a 'frame_seq' get their 'frame'
+    restored from shared memory so existing handlers keep working unchanged.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET_PATH, frame_buffer: Optional[SharedFrameBuffer] = None, loop=None):
+        super().__init__(loop)
+        self.socket_path = socket_path
+        self.frame_buffer = frame_buffer
+        self.running = False
+        self._server = None
+        self._accept_thread = None
+
+    def start(self):
+        if self.running:
+            return
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        self._server.listen()
+        self.running = True
+        self._accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._accept_thread.start()
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._connection_loop, args=(conn,), daemon=True).start()
+
+    def _connection_loop(self, conn):
+        with conn:
+            while self.running:
+                header = _recv_exact(conn, _MESSAGE_HEADER.size)
+                if header is None:
+                    break
+                (length,) = _MESSAGE_HEADER.unpack(header)
+                payload = _recv_exact(conn, length)
+                if payload is None:
+                    break
+                try:
+                    message = json.loads(payload)
+                except ValueError as e:
+                    print(f"Dropping malformed IPC event: {e}")
+                    continue
+                data = message.get('data')
+                if self.frame_buffer is not None and isinstance(data, dict) and 'frame_seq' in data:
+                    data['frame'] = self.frame_buffer.read(data['frame_seq'])
+                self.emit(message['event'], data)
+
+    def stop(self):
+        self.running = False
+        if self._server:
+            self._server.close()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def destroy(self):
+        self.stop()
+        super().destroy()
+
+
+class CapturePublisher(EventEmitter):
+    """Reads a cv2 capture in a thread and writes every frame into a SharedFrameBuffer"""
+
+    def __init__(self, cv2_cap, frame_buffer: SharedFrameBuffer, fps=30):
+        super().__init__()
+        self.cap = cv2_cap
+        self.frame_buffer = frame_buffer
+        self.fps = fps
+        # Detections arrive over IPC, so Brain reports targets via pacer.note_target()
+        self.pacer = FramePacer(fps)
+        self.running = False
+        self.thread = None
+        self.last_seq = 0
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._capture_loop, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join()
+
+    def _capture_loop(self):
+        while self.running:
+            start_time = time.time()
+            ret, frame = self.cap.read()
+            if ret and frame.shape == self.frame_buffer.shape:
+                self.last_seq = self.frame_buffer.write(frame)
+                self.emit('frame_ready', {'frame': frame, 'frame_seq': self.last_seq})
+            elif ret:
+                print(f"Capture frame {frame.shape} does not fit shared buffer {self.frame_buffer.shape}")
+            self.pacer.wait(self.pacer.frame_done(time.time() - start_time))
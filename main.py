@@ -5,8 +5,8 @@ A lightweight server using FastAPI and Uvicorn to handle HTTP requests on port 8
 """
 
 import random
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Request, HTTPException, WebSocket
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import socket
@@ -15,15 +15,35 @@ import os
 import json
 from typing import Dict, Any
 from brain import Brain
+from state_stream import StateBroadcaster
+from overlay import render_overlay
+from command_queue import CommandQueue, job_response, job_event_stream
+from dispense_queue import DispenseScheduler, check_condiments
+from face_identity import check_verify_pairs
+from face_server import FaceVerificationServer
+from structured_logging import setup_logging, shutdown_logging
 from threaded_brain_with_display import ThreadedBrainWithDisplay
 import threading
 import cv2
 import time
+from contextlib import asynccontextmanager
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start pushing brain state to WebSocket clients once the event loop is running"""
+    state_broadcaster.start()
+    yield
+    await state_broadcaster.stop()
+    commands.stop()
+    dispenser.stop()
+    face_verifier.service.save_cache()
+    shutdown_logging()
 
 app = FastAPI(
     title="HTTP Request Test Server",
     description="A FastAPI server for testing HTTP requests on port 80",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware to handle frontend requests
@@ -35,11 +55,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Tracking/turret events are logged through a queue so they never block the hot path
+setup_logging()
+
 # Initialize brain and display system
 try:
     print("🧠 Initializing brain for FastAPI server...")
-    brain = Brain()
+    # KETCHUP_REMOTE_DETECTION=1 runs inference in detector_worker.py processes instead
+    brain = Brain(remote_detection=os.environ.get('KETCHUP_REMOTE_DETECTION') == '1')
     print("✅ Brain initialized successfully")
+    state_broadcaster = StateBroadcaster(brain)
+    # Control endpoints enqueue onto this instead of driving the hardware from request handlers
+    commands = CommandQueue()
+    commands.start()
+    # Kiosk orders run one at a time from a persistent priority queue
+    dispenser = DispenseScheduler(brain)
+    dispenser.start()
+    # Face model stays loaded for /faces/verify; warming runs in the background
+    face_verifier = FaceVerificationServer()
+    brain.face_identity = face_verifier.service  # identity-gated aiming shares the warm model
+    face_verifier.warmup_async()
     
     # Start brain in background thread
     brain_thread = threading.Thread(target=brain.run, daemon=True)
@@ -81,64 +116,9 @@ try:
                     # Read from camera
                     ret, frame = brain.cap.read()
                     if ret:
-                        # Draw crosshair at center
-                        cv2.line(frame, (brain.center_x - 50, brain.center_y), 
-                               (brain.center_x + 50, brain.center_y), (255, 255, 255), 2)
-                        cv2.line(frame, (brain.center_x, brain.center_y - 50), 
-                               (brain.center_x, brain.center_y + 50), (255, 255, 255), 2)
-                        
-                        # Draw dead zone
-                        if brain.current_mode == 'face':
-                            dead_zone_size = brain.face_threshold_distance
-                            cv2.rectangle(frame, 
-                                        (brain.center_x - dead_zone_size, brain.center_y - dead_zone_size),
-                                        (brain.center_x + dead_zone_size, brain.center_y + dead_zone_size),
-                                        (0, 255, 255), 2)  # Yellow for face dead zone
-                        elif brain.current_mode == 'hotdog':
-                            dead_zone_size = brain.glizzy_threshold_distance
-                            cv2.rectangle(frame, 
-                                        (brain.center_x - dead_zone_size, brain.center_y - dead_zone_size),
-                                        (brain.center_x + dead_zone_size, brain.center_y + dead_zone_size),
-                                        (0, 165, 255), 2)  # Orange for hotdog dead zone
-                        
-                        # Perform face detection and draw boxes
-                        if brain.current_mode == 'face':
-                            try:
-                                face_detection = brain.face_tracker.get_biggest_face_coordinates(frame)
-                                if face_detection is not None:
-                                    x, y, w, h = face_detection
-                                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 3)
-                                    cv2.putText(frame, "FACE", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                                    center_x = x + w // 2
-                                    center_y = y + h // 2
-                                    cv2.circle(frame, (center_x, center_y), 5, (0, 255, 0), -1)
-                                    cv2.putText(frame, f"({center_x}, {center_y})", (center_x + 10, center_y), 
-                                              cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-                            except:
-                                pass
-                        
-                        elif brain.current_mode == 'hotdog':
-                            try:
-                                hotdog_detection = brain.hotdog_recognizer.find_biggest_hotdog(frame)
-                                if hotdog_detection is not None:
-                                    x, y, w, h = hotdog_detection
-                                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 0, 255), 3)
-                                    cv2.putText(frame, "HOTDOG", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                                    center_x = x + w // 2
-                                    center_y = y + h // 2
-                                    cv2.circle(frame, (center_x, center_y), 5, (0, 0, 255), -1)
-                                    cv2.putText(frame, f"({center_x}, {center_y})", (center_x + 10, center_y), 
-                                              cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
-                            except:
-                                pass
-                        
-                        # Show status
-                        mode_text = f"Mode: {brain.current_mode or 'IDLE'}"
-                        fire_text = f"Fireable: {'YES' if brain.fireable else 'NO'}"
-                        server_text = "FastAPI Server Running"
-                        cv2.putText(frame, mode_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                        cv2.putText(frame, fire_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                        cv2.putText(frame, server_text, (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+                        # Crosshair, dead zone, tracked box and status come from the
+                        # trackers' detection store; no inference on display frames
+                        render_overlay(frame, brain, [("FastAPI Server Running", (0, 255, 255), 0.7)])
                         
                         cv2.imshow("Ketchup Bot API Server", frame)
                     
@@ -233,63 +213,197 @@ def get_all_status():
     return {
         "fireable": brain.fireable,
         "tracking_mode": brain.current_mode,
+        "release_time": brain.release_time,
         "timestamp": datetime.datetime.now().isoformat()
     }
 
-@app.get("/tipped_zero")
-def tip_zero(body: dict):
-    face_index = random.randint(0, len(body['condiments']) - 1)
-    for condiment, index in enumerate(body['condiments']):
-        while(brain.fireable == True):
-            if index == face_index:
-                brain.start_tracking_faces()
-            else:
-                brain.start_tracking_hotdogs()
+@app.get("/status/perf")
+def get_perf_status():
+    """Per-stage pipeline latency (count, mean and percentiles in ms), frame rates and motion gating"""
+    if not brain:
+        return {"error": "Brain not initialized"}
+    return {**brain.perf.snapshot(), "pacing": brain.pacing_stats(), "motion_gate": brain.motion_gate_stats(),
+            "identity": brain.identity_stats(), "motor_telemetry": brain.controller.telemetry.stats()}
+
+@app.get("/metrics")
+def metrics():
+    """Pipeline latency histograms in Prometheus text format"""
+    if not brain:
+        return PlainTextResponse("", status_code=503)
+    return PlainTextResponse(brain.perf.prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/stream.mjpg")
+async def video_stream():
+    """Annotated camera feed from the tracking pipeline as multipart MJPEG"""
+    return StreamingResponse(brain.video_streamer.stream(), media_type=brain.video_streamer.media_type)
 
-    return {}
+@app.websocket("/ws/state")
+async def state_stream(websocket: WebSocket):
+    """Push mode, fireable, release time, detection and motor state on change"""
+    await state_broadcaster.serve(websocket)
+
+def _pick_face_index(condiments):
+    return random.randint(0, len(condiments) - 1) if condiments else None
+
+@app.get("/tipped_zero")
+async def tip_zero(body: dict, wait: bool = False, timeout: float = None):
+    """Queue the order's condiments; one of them goes at a face (the one matching body["photo"], if given)"""
+    try:
+        condiments = check_condiments(body.get('condiments'), dispenser.condiments)
+        job = dispenser.submit(condiments, face_index=_pick_face_index(condiments),
+                               priority=body.get('priority', 0), source='tipped_zero', photo=body.get('photo'))
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return await job_response(job, wait, timeout)
 
 @app.get("/tipped_nonzero")
-def tip_nonzero(body: dict):
-    for condiment, index in enumerate(body['condiments']):
-        while(brain.fireable == True):
-            brain.start_tracking_hotdogs()
+async def tip_nonzero(body: dict, wait: bool = False, timeout: float = None):
+    """Queue the order's condiments onto hotdogs"""
+    try:
+        job = dispenser.submit(body.get('condiments'), priority=body.get('priority', 0), source='tipped_nonzero')
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return await job_response(job, wait, timeout)
+
+@app.get("/dispense/jobs")
+def dispense_jobs():
+    """Queued orders in the order they will run, plus the active one"""
+    active = dispenser.active_job
+    return {"active": active.to_dict() if active else None, "queued": dispenser.queued_jobs()}
+
+@app.get("/dispense/jobs/{job_id}")
+async def dispense_job(job_id: str, wait: bool = False, timeout: float = None):
+    job = dispenser.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown dispense job"}, status_code=404)
+    return await job_response(job, wait, timeout)
+
+@app.post("/dispense/jobs/{job_id}/cancel")
+def cancel_dispense_job(job_id: str):
+    job = dispenser.cancel(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown dispense job"}, status_code=404)
+    return job.to_dict()
+
+@app.get("/dispense/metrics")
+def dispense_metrics():
+    """Time-to-fire and jobs-per-hour for the order queue"""
+    return dispenser.metrics()
+
+@app.post("/faces/verify")
+def verify_faces(body: dict):
+    """Verify {"pairs": [[a, b], ...]} of /uploads/ URLs or embeddings; latency per pair"""
+    pairs = body.get('pairs', [])
+    try:
+        # Over HTTP only kiosk uploads and embeddings; file paths are for the CLI and the local socket
+        check_verify_pairs(pairs)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return face_verifier.handle({"op": "verify", "pairs": pairs}, allow_paths=False)
+
+@app.post("/target_identity")
+def target_identity(body: dict):
+    """Aim only at the face matching {"photo": "/uploads/..."}; {"photo": null} aims at any face again"""
+    try:
+        return {"identity": brain.set_target_identity(body.get('photo'))}
+    except (OSError, ValueError) as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+@app.get("/config")
+def get_config():
+    """All runtime tunables (targeting, trackers, turret) plus where they were loaded from"""
+    return {"config": brain.config.get(), **brain.config.status()}
+
+@app.patch("/config")
+def patch_config(body: dict):
+    """Change some tunables, e.g. {"trackers": {"face": {"fps": 15}}}; applied all-or-nothing and saved"""
+    try:
+        changed = brain.config.update(body)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    return {"changed": changed, "config": brain.config.get()}
+
+@app.post("/config/reload")
+def reload_config():
+    """Re-read the config file now instead of waiting for the file watcher"""
+    changed = brain.config.reload()
+    return {"changed": changed, **brain.config.status()}
+
+@app.get("/targeting")
+def get_targeting():
+    """Dead zone, dwell and power/step curves of every target class"""
+    return {kind: policy.to_dict() for kind, policy in brain.policies.items()}
+
+@app.post("/targeting/{kind}")
+def update_targeting(kind: str, body: dict):
+    """Change some of a target class's tunables, e.g. {"dead_zone": 120, "pan_step": [1, 15]}"""
+    try:
+        return brain.update_policy(kind, **body)
+    except KeyError as e:
+        return JSONResponse({"error": str(e)}, status_code=404)
+    except (TypeError, ValueError) as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
 
 @app.post("/toggle_fireable")
-def toggle_fireable(mode: str):
-    if mode == "on":
-        brain.fireable = True
-    elif mode == "off":
-        brain.fireable = False
-    else:
+async def toggle_fireable(mode: str, wait: bool = False, timeout: float = None):
+    if mode not in ("on", "off"):
         return {"error": "Invalid mode"}
-    return {}
+    job = commands.submit(f'toggle_fireable:{mode}', setattr, brain, 'fireable', mode == "on")
+    return await job_response(job, wait, timeout)
 
 @app.post("/track_mode")
-def track_mode(mode: str):
-    if mode == "face":
-        brain.start_tracking_faces()
-    elif mode == "hotdog":
-        brain.start_tracking_hotdogs()
-    elif mode == "off":
-        brain.stop()
-    else:
+async def track_mode(mode: str, wait: bool = False, timeout: float = None):
+    actions = {"face": brain.start_tracking_faces, "hotdog": brain.start_tracking_hotdogs, "off": brain.stop}
+    if mode not in actions:
         return {"error": "Invalid mode"}
-    return {}
+    job = commands.submit(f'track_mode:{mode}', actions[mode])
+    return await job_response(job, wait, timeout)
 
 @app.post("/solenoid")
-def solenoid(mode: str):
-    if mode == "on":
-        brain.controller.solenoid_controller.solenoid_on()
-    elif mode == "off":
-        brain.controller.solenoid_controller.solenoid_off()
-    else:
+async def solenoid(mode: str, wait: bool = False, timeout: float = None):
+    solenoid_controller = brain.controller.solenoid_controller
+    actions = {"on": solenoid_controller.solenoid_on, "off": solenoid_controller.solenoid_off}
+    if mode not in actions:
         return {"error": "Invalid mode"}
-    return {}
+    job = commands.submit(f'solenoid:{mode}', actions[mode])
+    return await job_response(job, wait, timeout)
 
 @app.get("/reset")
-def reset():
-    brain.reset_to_home()
-    return {}
+async def reset(wait: bool = False, timeout: float = None):
+    job = commands.submit('reset', brain.reset_to_home)
+    return await job_response(job, wait, timeout)
+
+@app.post("/reset/cancel")
+def cancel_reset():
+    """Stop a homing motion where it is"""
+    return brain.cancel_homing()
+
+@app.get("/fire_control")
+def fire_control_status():
+    """Fire-control state, pending deadlines, last shot and recent transitions"""
+    if not brain:
+        return {"error": "Brain not initialized"}
+    return brain.fire_control.status()
+
+@app.get("/valves")
+def valve_status():
+    """Solenoid channels currently open and frame/acknowledgement counts"""
+    if not brain:
+        return {"error": "Brain not initialized"}
+    return brain.controller.valve_stats()
+
+@app.get("/telemetry/recorder")
+def telemetry_recorder_status():
+    if not brain:
+        return {"error": "Brain not initialized"}
+    return brain.telemetry_recorder.stats()
+
+@app.post("/telemetry/dump")
+def telemetry_dump():
+    """Write the motor telemetry ring to telemetry/<time>.ktl (replay with telemetry_recorder.py)"""
+    if not brain:
+        return {"error": "Brain not initialized"}
+    return brain.telemetry_recorder.dump()
 
 @app.post("/set_release_time")
 def set_release_time(release_time: float):
@@ -299,6 +413,9 @@ def set_release_time(release_time: float):
         if release_time < 0.1 or release_time > 10.0:
             return {"error": "Release time must be between 0.1 and 10.0 seconds"}
         
+        # Brain.release_time is what fire() uses and what /ws/state pushes
+        brain.release_time = release_time
+
         # Set the release time on the brain's solenoid controller
         if hasattr(brain, 'controller') and hasattr(brain.controller, 'solenoid_controller'):
             brain.controller.solenoid_controller.release_time = release_time
@@ -308,6 +425,29 @@ def set_release_time(release_time: float):
     except Exception as e:
         return {"error": f"Failed to set release time: {e}"}
 
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: bool = False, timeout: float = None):
+    """Job status; with wait=true, return once it has finished (or timeout seconds passed)"""
+    job = commands.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    return await job_response(job, wait, timeout)
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent events for every update of a job until it finishes"""
+    job = commands.get(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    return StreamingResponse(job_event_stream(job), media_type="text/event-stream")
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job = commands.cancel(job_id)
+    if job is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+    return job.to_dict()
+
 @app.post("/display")
 def toggle_display(mode: str):
     """Control the camera display window"""
@@ -356,6 +496,8 @@ if __name__ == "__main__":
     print("   POST /toggle_fireable?mode=on  - Enable firing")
     print("   POST /display?mode=on          - Start camera display")
     print("   POST /display?mode=off         - Stop camera display")
+    print("   GET  /stream.mjpg              - Annotated camera stream (MJPEG)")
+    print("   WS   /ws/state                 - Live robot state")
     print("-" * 60)
     
     uvicorn.run(
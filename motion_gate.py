@@ -0,0 +1,108 @@
+"""
+Motion gate in front of the detectors.
+
+Most of the day the camera looks at an empty counter, and running YOLO on
+every one of those frames is wasted CPU. The gate compares a tiny grayscale
+copy of each frame against a slowly updated background and only lets the
+frame through to inference when:
+
+- enough of the scene changed,
+- the last inference found a target (a track is active), or
+- `refresh_interval` seconds passed since the last inference, so a target
+  that walked in and then stood perfectly still is still picked up.
+
+A skipped frame means "no target", the same result the previous inference
+gave. Counters and timing estimates are exposed through stats() and as
+Prometheus gauges (see Brain).
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    def __init__(self, width=64, pixel_threshold=12, min_changed=0.005, alpha=0.05, refresh_interval=1.0):
+        self.width = width  # downscaled frame width; height follows the aspect ratio
+        self.pixel_threshold = pixel_threshold  # grey-level difference that counts as change
+        self.min_changed = min_changed  # fraction of changed pixels that counts as motion
+        self.alpha = alpha  # background update rate
+        self.refresh_interval = refresh_interval
+        self.background = None
+        self.track_active = False
+        self.last_inference_at = None
+        self.changed_fraction = 0.0
+        self.frames = 0
+        self.skipped = 0
+        self.infer_seconds_ewma = None
+        self.gate_seconds_ewma = None
+
+    def _small_gray(self, frame):
+        height, width = frame.shape[:2]
+        # Subsample first so the resize touches a few thousand pixels, not millions
+        stride = max(1, width // (self.width * 4))
+        small = frame[::stride, ::stride]
+        size = (self.width, max(1, round(self.width * height / width)))
+        small = cv2.resize(small, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def should_infer(self, frame):
+        """True when `frame` needs to go through the detector"""
+        start = time.perf_counter()
+        gray = self._small_gray(frame)
+        if self.background is None or self.background.shape != gray.shape:
+            self.background = gray.astype(np.float32)
+            self.changed_fraction = 1.0
+        else:
+            diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+            self.changed_fraction = np.count_nonzero(diff > self.pixel_threshold) / diff.size
+            cv2.accumulateWeighted(gray, self.background, self.alpha)
+
+        now = time.monotonic()
+        infer = (
+            self.track_active
+            or self.changed_fraction >= self.min_changed
+            or self.last_inference_at is None
+            or now - self.last_inference_at >= self.refresh_interval
+        )
+        self.frames += 1
+        if not infer:
+            self.skipped += 1
+        gate_seconds = time.perf_counter() - start
+        self.gate_seconds_ewma = gate_seconds if self.gate_seconds_ewma is None else \
+            0.9 * self.gate_seconds_ewma + 0.1 * gate_seconds
+        return infer
+
+    def record_inference(self, seconds, found):
+        """Report an inference the gate let through: how long it took and whether it found a target"""
+        self.last_inference_at = time.monotonic()
+        self.track_active = found
+        self.infer_seconds_ewma = seconds if self.infer_seconds_ewma is None else \
+            0.9 * self.infer_seconds_ewma + 0.1 * seconds
+
+    @property
+    def skip_ratio(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    @property
+    def cpu_saved_seconds(self):
+        """Estimated inference time avoided: skipped frames times the average inference, minus gate cost"""
+        if self.infer_seconds_ewma is None:
+            return 0.0
+        gate_cost = (self.gate_seconds_ewma or 0.0) * self.frames
+        return max(0.0, self.skipped * self.infer_seconds_ewma - gate_cost)
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skip_ratio, 4),
+            "cpu_saved_seconds": round(self.cpu_saved_seconds, 3),
+            "changed_fraction": round(float(self.changed_fraction), 4),
+            "track_active": self.track_active,
+            "infer_ms": round(self.infer_seconds_ewma * 1000, 2) if self.infer_seconds_ewma is not None else None,
+            "gate_ms": round(self.gate_seconds_ewma * 1000, 3) if self.gate_seconds_ewma is not None else None,
+        }
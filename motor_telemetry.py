@@ -0,0 +1,151 @@
+"""
+Motor telemetry: one poller thread owns every pan/tilt state read.
+
+Every get_tacho() and MotCont.is_ready() used to be its own USB transaction,
+and is_ready() also sleeps ~25 ms on the brick's message mailbox, so a
+rotate_both that had to wait polled the brick as fast as it could. Now a
+single thread reads each motor's output state (tacho count, power, run
+state) once per tick and publishes a timestamped snapshot:
+
+    {"seq": 812, "timestamp": <monotonic>, "read_ms": 3.1, "ready": True,
+     "pan": {"tacho": 120, "power": 0, "running": False, "settled": True},
+     "tilt": {...}}
+
+Callers (rotate_both's readiness wait, homing, Brain's state) read the
+snapshot instead of talking to the brick, so USB traffic is a fixed
+`len(axes)` reads per tick however many threads ask, and a readiness wait
+wakes on the next tick instead of spinning. A motor is settled when it is
+not running and its tacho did not change since the previous tick.
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+
+from event_system import EventEmitter
+
+
+class MotorTelemetry(EventEmitter):
+    def __init__(self, read_state, interval=0.02, settle_ticks=2):
+        """`read_state()` returns {axis: (tacho, power, running)} with one read per motor"""
+        super().__init__()
+        self.read_state = read_state
+        self.interval = interval  # seconds between ticks
+        self.settle_ticks = settle_ticks  # ticks after a command before a motor can count as ready
+        self.snapshot = None
+        self.running = False
+        self.reads = 0
+        self.read_seconds_total = 0.0
+        self.read_seconds_max = 0.0
+        self.errors = 0
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._thread = threading.Thread(target=self._poll_loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+
+    def _poll_loop(self):
+        next_tick = time.monotonic()
+        while self.running:
+            try:
+                self._tick()
+            except Exception as e:
+                # Keep polling; a transient USB error must not leave readiness waits stuck
+                self.errors += 1
+                self.emit('error', f'Motor telemetry read failed: {e}')
+            # Fixed rate: a slow read shortens the next wait rather than shifting every later tick
+            next_tick += self.interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_tick = time.monotonic()
+
+    def _tick(self):
+        start = time.perf_counter()
+        state = self.read_state()
+        read_seconds = time.perf_counter() - start
+        previous = self.snapshot
+        snapshot = {"seq": previous["seq"] + 1 if previous else 1, "timestamp": time.monotonic(),
+                    "read_ms": round(read_seconds * 1000, 2)}
+        ready = True
+        for axis, (tacho, power, running) in state.items():
+            last = previous[axis]["tacho"] if previous else None
+            settled = not running and tacho == last
+            snapshot[axis] = {"tacho": tacho, "power": power, "running": running, "settled": settled}
+            ready = ready and settled
+        snapshot["ready"] = ready
+        self.reads += 1
+        self.read_seconds_total += read_seconds
+        self.read_seconds_max = max(self.read_seconds_max, read_seconds)
+        with self._cond:
+            self.snapshot = snapshot
+            self._cond.notify_all()
+        self.emit('snapshot', snapshot)
+
+    def latest(self):
+        return self.snapshot
+
+    def next_snapshot(self, timeout=None):
+        """Block until the next tick's snapshot (or `timeout`, default a few ticks) and return the latest"""
+        with self._cond:
+            seq = self.snapshot["seq"] if self.snapshot else 0
+            self._cond.wait_for(lambda: not self.running or (self.snapshot and self.snapshot["seq"] > seq),
+                                timeout if timeout is not None else 4 * self.interval)
+            return self.snapshot
+
+    def is_ready(self, snapshot, since=0.0):
+        """Whether `snapshot` shows both motors settled, sampled long enough after a command issued at `since`"""
+        return (snapshot is not None and snapshot["ready"]
+                and snapshot["timestamp"] >= since + self.settle_ticks * self.interval)
+
+    def tachos(self, *axes):
+        snapshot = self.snapshot
+        return tuple(snapshot[axis]["tacho"] for axis in axes)
+
+    def stats(self):
+        snapshot = self.snapshot
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "ticks": self.reads,
+            "errors": self.errors,
+            "read_ms_mean": round(self.read_seconds_total / self.reads * 1000, 2) if self.reads else None,
+            "read_ms_max": round(self.read_seconds_max * 1000, 2),
+            "age_ms": round((time.monotonic() - snapshot["timestamp"]) * 1000, 1) if snapshot else None,
+        }
+
+
+class CommandLog:
+    """Every motor command a controller issues (stops included), for TelemetryRecorder.
+
+    Entries are (seq, pan_power, pan_angle, tilt_power, tilt_angle, monotonic
+    time). Appending is a deque append, so issuing a command never waits on
+    the recorder; the recorder reads what arrived since the last seq it saw.
+    """
+
+    def __init__(self, size=256):
+        self.entries = deque(maxlen=size)
+        self._seq = itertools.count(1)
+
+    def append(self, pan_power, pan_angle, tilt_power, tilt_angle, at):
+        self.entries.append((next(self._seq), pan_power, pan_angle, tilt_power, tilt_angle, at))
+
+    def last_seq(self):
+        entries = self.entries
+        return entries[-1][0] if entries else 0
+
+    def since(self, seq):
+        """Entries after `seq`, oldest first"""
+        return [entry for entry in list(self.entries) if entry[0] > seq]
@@ -0,0 +1,62 @@
+"""
+Overlay renderer shared by the OpenCV display loops and the MJPEG stream.
+
+Everything drawn comes from Brain state and its DetectionStore; no model is
+run here.
+"""
+
+import cv2
+
+KIND_COLORS = {
+    'face': (0, 255, 0),     # Green for faces
+    'hotdog': (0, 0, 255),   # Red for hotdogs
+}
+DEAD_ZONE_COLORS = {
+    'face': (0, 255, 255),   # Yellow for face dead zone
+    'hotdog': (0, 165, 255), # Orange for hotdog dead zone
+}
+
+
+def _dead_zone_size(brain, mode):
+    policy = brain.policies.get(mode) if mode else None
+    return policy.dead_zone if policy is not None else None
+
+
+def render_overlay(frame, brain, extra_lines=()):
+    """Draw crosshair, dead zone, tracked box and status onto `frame` in place.
+
+    `extra_lines` are (text, color, scale) tuples drawn under the status lines.
+    """
+    cx, cy = brain.center_x, brain.center_y
+    mode = brain.current_mode
+
+    # Crosshair at center
+    cv2.line(frame, (cx - 50, cy), (cx + 50, cy), (255, 255, 255), 2)
+    cv2.line(frame, (cx, cy - 50), (cx, cy + 50), (255, 255, 255), 2)
+
+    dead_zone_size = _dead_zone_size(brain, mode)
+    if dead_zone_size is not None:
+        cv2.rectangle(frame, (cx - dead_zone_size, cy - dead_zone_size),
+                      (cx + dead_zone_size, cy + dead_zone_size), DEAD_ZONE_COLORS.get(mode, (255, 255, 255)), 2)
+
+    detection = brain.detections.latest(mode) if mode else None
+    if detection is not None:
+        color = KIND_COLORS.get(mode, (255, 255, 255))
+        x, y, w, h = detection['box']
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 3)
+        cv2.putText(frame, mode.upper(), (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        center_x = x + w // 2
+        center_y = y + h // 2
+        cv2.circle(frame, (center_x, center_y), 5, color, -1)
+        cv2.putText(frame, f"({center_x}, {center_y})", (center_x + 10, center_y),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+    # Status
+    cv2.putText(frame, f"Mode: {mode or 'IDLE'}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    cv2.putText(frame, f"Fireable: {'YES' if brain.fireable else 'NO'} ({brain.fire_control.state})", (10, 60),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    y = 90
+    for text, color, scale in extra_lines:
+        cv2.putText(frame, text, (10, y), cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2)
+        y += 30
+    return frame
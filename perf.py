@@ -0,0 +1,207 @@
+"""
+Per-stage latency instrumentation for the tracking pipeline.
+
+Each frame carries a FrameTrace from capture to motor command; every mark()
+records the time since the previous mark into that stage's histogram.
+Histograms are HDR-style (log-linear buckets over microseconds, ~3% relative
+error) with a fixed bucket array, so recording is a few integer operations
+under a lock and cheap enough to leave on in production. Aggregates are
+served as Prometheus text (/metrics) and JSON (/status/perf).
+"""
+
+import threading
+import time
+
+# Stages in pipeline order; 'frame' is capture-to-finish, 'motor_ready'
+# is command issue until the turret reports the motors ready again and
+# 'fire' is how late a shot went off after its dwell deadline.
+STAGES = ('capture', 'motion_gate', 'preprocess', 'inference', 'postprocess', 'dispatch', 'aim',
+          'motor_command', 'motor_ready', 'frame', 'fire')
+
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_VALUE_US = 60_000_000  # anything slower than a minute lands in the last bucket
+PROMETHEUS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                      0.1, 0.25, 0.5, 1.0, 2.5, 5.0)  # seconds
+METRIC_NAME = 'ketchup_bot_stage_latency_seconds'
+
+
+def _bucket_index(us):
+    if us < SUB_BUCKETS:
+        return us
+    shift = us.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (us >> shift) - SUB_BUCKETS
+
+
+def _bucket_bounds(index):
+    """(lower, upper) microsecond bounds of a bucket"""
+    if index < SUB_BUCKETS:
+        return index, index + 1
+    shift = index // SUB_BUCKETS - 1
+    lower = (index % SUB_BUCKETS + SUB_BUCKETS) << shift
+    return lower, lower + (1 << shift)
+
+
+class LatencyHistogram:
+    def __init__(self, max_value_us=MAX_VALUE_US):
+        self.max_index = _bucket_index(max_value_us)
+        self.counts = [0] * (self.max_index + 1)
+        self.count = 0
+        self.total_us = 0
+        self.min_us = None
+        self.max_us = 0
+        self._lock = threading.Lock()
+
+    def record(self, duration_ns):
+        us = max(0, duration_ns // 1000)
+        index = min(_bucket_index(us), self.max_index)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_us += us
+            if self.min_us is None or us < self.min_us:
+                self.min_us = us
+            if us > self.max_us:
+                self.max_us = us
+
+    def percentile(self, pct):
+        """Value (microseconds) at percentile `pct`, or None when empty"""
+        with self._lock:
+            counts = list(self.counts)
+            count, min_us, max_us = self.count, self.min_us, self.max_us
+        if not count:
+            return None
+        rank = max(1, int(round(pct / 100 * count)))
+        seen = 0
+        for index, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                lower, upper = _bucket_bounds(index)
+                return min(max((lower + upper) / 2, min_us), max_us)
+        return max_us
+
+    def cumulative(self, bounds_us):
+        """Counts of values <= each bound, for Prometheus buckets"""
+        with self._lock:
+            counts = list(self.counts)
+        result = []
+        index = 0
+        seen = 0
+        for bound in bounds_us:
+            while index < len(counts) and _bucket_bounds(index)[1] <= bound + 1:
+                seen += counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+    def summary(self):
+        """Count, mean and percentiles in milliseconds"""
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": self.total_us / self.count / 1000,
+            "p50_ms": self.percentile(50) / 1000,
+            "p90_ms": self.percentile(90) / 1000,
+            "p99_ms": self.percentile(99) / 1000,
+            "min_ms": self.min_us / 1000,
+            "max_ms": self.max_us / 1000,
+        }
+
+
+class FrameTrace:
+    """Timestamps of one frame on its way through the pipeline"""
+    __slots__ = ('recorder', 'start_ns', 'last_ns')
+
+    def __init__(self, recorder, start_ns=None):
+        self.recorder = recorder
+        self.start_ns = start_ns if start_ns is not None else time.perf_counter_ns()
+        self.last_ns = self.start_ns
+
+    def mark(self, stage):
+        """Close `stage`: record the time since the previous mark"""
+        now = time.perf_counter_ns()
+        self.recorder.record(stage, now - self.last_ns)
+        self.last_ns = now
+
+    def mark_model(self, results):
+        """Close the model call, split into pre/inference/post with Ultralytics' own timings"""
+        now = time.perf_counter_ns()
+        speed = getattr(results[0], 'speed', None) if results else None
+        if speed:
+            for stage in ('preprocess', 'inference', 'postprocess'):
+                if speed.get(stage) is not None:
+                    self.recorder.record(stage, int(speed[stage] * 1_000_000))
+        else:
+            self.recorder.record('inference', now - self.last_ns)
+        self.last_ns = now
+
+    def finish(self):
+        self.recorder.record('frame', time.perf_counter_ns() - self.start_ns)
+
+
+class PerfRecorder:
+    """Histograms per stage; shared by the trackers, Brain and the turret"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+        self.started_at = time.time()
+        self.gauges = []  # (name, help, type, labels, fn) sampled at scrape time
+        self._lock = threading.Lock()
+
+    def trace(self, start_ns=None):
+        """New FrameTrace, or None when instrumentation is disabled"""
+        if not self.enabled:
+            return None
+        return FrameTrace(self, start_ns)
+
+    def record(self, stage, duration_ns):
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, LatencyHistogram())
+        histogram.record(duration_ns)
+
+    def gauge(self, name, help_text, fn, metric_type='gauge', **labels):
+        """Expose `fn()` as a Prometheus metric, read on every /metrics scrape"""
+        with self._lock:
+            self.gauges.append((name, help_text, metric_type, labels, fn))
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+            self.started_at = time.time()
+
+    def snapshot(self):
+        return {
+            "enabled": self.enabled,
+            "since": self.started_at,
+            "stages": {stage: histogram.summary() for stage, histogram in self.histograms.items()},
+        }
+
+    def prometheus(self):
+        """Prometheus text exposition of every stage histogram and registered gauge"""
+        bounds_us = [int(bound * 1_000_000) for bound in PROMETHEUS_BUCKETS]
+        lines = [
+            f"# HELP {METRIC_NAME} Time spent in each tracking pipeline stage",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        for stage, histogram in self.histograms.items():
+            for bound, count in zip(PROMETHEUS_BUCKETS, histogram.cumulative(bounds_us)):
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {histogram.total_us / 1_000_000}')
+            lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {histogram.count}')
+        described = set()
+        # Samples of one metric must be contiguous
+        for name, help_text, metric_type, labels, fn in sorted(self.gauges, key=lambda gauge: gauge[0]):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+            label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+            lines.append(f"{name}{{{label_text}}} {fn()}" if label_text else f"{name} {fn()}")
+        return "\n".join(lines) + "\n"
@@ -1,23 +1,121 @@
-// Arduino sketch (save as arduino/solenoid_control.ino)
-const int SOLENOID_PIN = 2;  // Pin 2 for power
+// Multi-valve solenoid controller (one valve per condiment)
+//
+// Binary command frame from the host, 6 bytes:
+//   0xA5, seq, channel, pulse ms (uint16 little endian), checksum
+// checksum = seq ^ channel ^ ms low byte ^ ms high byte. A pulse of 0 ms
+// closes the valve now. The board times every pulse itself with millis(),
+// so pulses on different channels overlap freely and serial latency does
+// not change how long a valve stays open.
+//
+// Reply frame, 5 bytes: 0x5A, seq, channel, status, seq ^ channel ^ status
+//   status 1 = opened, 2 = closed (pulse over), 3 = bad channel, 4 = bad checksum
+//
+// The old single-valve text commands still work: '1' opens and '0' closes
+// channel 0 (the valve on pin 2).
+
+const int VALVE_PINS[] = {2, 3, 4, 5};
+const int NUM_CHANNELS = sizeof(VALVE_PINS) / sizeof(VALVE_PINS[0]);
+const unsigned int MAX_PULSE_MS = 10000;  // a lost host never leaves a valve open longer
+const unsigned long FRAME_TIMEOUT_MS = 50;  // drop a partial frame and resynchronize
+
+const byte FRAME_SYNC = 0xA5;
+const byte REPLY_SYNC = 0x5A;
+const byte OPENED = 1;
+const byte CLOSED = 2;
+const byte BAD_CHANNEL = 3;
+const byte BAD_CHECKSUM = 4;
+
+bool valveOpen[NUM_CHANNELS];
+unsigned long closeAt[NUM_CHANNELS];
+byte closeSeq[NUM_CHANNELS];
+
+byte frame[6];
+int frameLength = 0;
+unsigned long frameStartedAt = 0;
 
 void setup() {
   Serial.begin(9600);
-  pinMode(SOLENOID_PIN, OUTPUT);
-  digitalWrite(SOLENOID_PIN, LOW);  // Start with solenoid off
+  for (int i = 0; i < NUM_CHANNELS; i++) {
+    pinMode(VALVE_PINS[i], OUTPUT);
+    digitalWrite(VALVE_PINS[i], LOW);  // Start with every valve closed
+    valveOpen[i] = false;
+  }
 }
 
-void loop() {
-  if (Serial.available() > 0) {
-    char command = Serial.read();
-    
-    if (command == '1') {
-      digitalWrite(SOLENOID_PIN, HIGH);  // Turn on pin 2
-      Serial.println("Solenoid ON");
+void reply(byte seq, byte channel, byte status) {
+  byte data[5] = {REPLY_SYNC, seq, channel, status, (byte)(seq ^ channel ^ status)};
+  Serial.write(data, 5);
+}
+
+void closeValve(int channel) {
+  digitalWrite(VALVE_PINS[channel], LOW);
+  if (valveOpen[channel]) {
+    valveOpen[channel] = false;
+    reply(closeSeq[channel], channel, CLOSED);
+  }
+}
+
+void handleFrame() {
+  byte seq = frame[1];
+  byte channel = frame[2];
+  unsigned int pulseMs = frame[3] | (frame[4] << 8);
+  if ((byte)(seq ^ channel ^ frame[3] ^ frame[4]) != frame[5]) {
+    reply(seq, channel, BAD_CHECKSUM);
+    return;
+  }
+  if (channel >= NUM_CHANNELS) {
+    reply(seq, channel, BAD_CHANNEL);
+    return;
+  }
+  if (pulseMs == 0) {
+    closeValve(channel);
+    return;
+  }
+  if (pulseMs > MAX_PULSE_MS) {
+    pulseMs = MAX_PULSE_MS;
+  }
+  digitalWrite(VALVE_PINS[channel], HIGH);
+  valveOpen[channel] = true;
+  closeAt[channel] = millis() + pulseMs;
+  closeSeq[channel] = seq;
+  reply(seq, channel, OPENED);
+}
+
+void readSerial() {
+  while (Serial.available() > 0) {
+    byte b = Serial.read();
+    if (frameLength == 0) {
+      if (b == FRAME_SYNC) {
+        frame[frameLength++] = b;
+        frameStartedAt = millis();
+      } else if (b == '1') {
+        digitalWrite(VALVE_PINS[0], HIGH);  // Legacy: open channel 0 until '0'
+        Serial.println("Solenoid ON");
+      } else if (b == '0') {
+        digitalWrite(VALVE_PINS[0], LOW);
+        valveOpen[0] = false;
+        Serial.println("Solenoid OFF");
+      }
+      continue;
+    }
+    frame[frameLength++] = b;
+    if (frameLength == sizeof(frame)) {
+      handleFrame();
+      frameLength = 0;
     }
-    else if (command == '0') {
-      digitalWrite(SOLENOID_PIN, LOW);   // Turn off pin 2
-      Serial.println("Solenoid OFF");
+  }
+  if (frameLength > 0 && millis() - frameStartedAt > FRAME_TIMEOUT_MS) {
+    frameLength = 0;
+  }
+}
+
+void loop() {
+  readSerial();
+  unsigned long now = millis();
+  for (int i = 0; i < NUM_CHANNELS; i++) {
+    // Wrap-safe comparison against the channel's deadline
+    if (valveOpen[i] && (long)(now - closeAt[i]) >= 0) {
+      closeValve(i);
     }
   }
-}
\ No newline at end of file
+}
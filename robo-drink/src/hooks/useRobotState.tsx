@@ -1,6 +1,6 @@
 "use client";
 
-import { useState, useEffect, useCallback } from "react";
+import { useState, useEffect, useCallback, useRef } from "react";
 
 export interface RobotState {
   fireableState: boolean | null;
@@ -25,6 +25,9 @@ export function useRobotState(): [RobotState, RobotActions] {
   const [solenoidState, setSolenoidState] = useState<boolean | null>(null);
   const [releaseTime, setReleaseTime] = useState<number>(0.5);
 
+  const [streamConnected, setStreamConnected] = useState<boolean>(false);
+  const streamConnectedRef = useRef<boolean>(false);
+
   const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || "http://localhost:8080";
 
   const fetchCurrentState = useCallback(async () => {
@@ -65,8 +68,10 @@ export function useRobotState(): [RobotState, RobotActions] {
         throw new Error(result.error || "API call failed");
       }
       
-      // Fetch updated state after successful API call
-      await fetchCurrentState();
+      // State arrives over /ws/state; only refetch when the stream is down
+      if (!streamConnectedRef.current) {
+        await fetchCurrentState();
+      }
       
       return result;
     } catch (error) {
@@ -112,8 +117,10 @@ export function useRobotState(): [RobotState, RobotActions] {
         throw new Error(result.error || "Failed to set release time");
       }
       
-      // Fetch updated state after successful API call
-      await fetchCurrentState();
+      // State arrives over /ws/state; only refetch when the stream is down
+      if (!streamConnectedRef.current) {
+        await fetchCurrentState();
+      }
       
     } catch (error) {
       console.error(`Failed to set release time:`, error);
@@ -126,9 +133,53 @@ export function useRobotState(): [RobotState, RobotActions] {
     }
   };
 
-  // Initial state fetch and persistent polling
+  // Server-push state stream, reconnecting with backoff
   useEffect(() => {
-    // Fetch initial state
+    let socket: WebSocket | null = null;
+    let retryTimer: ReturnType<typeof setTimeout> | null = null;
+    let retryDelay = 500;
+    let closed = false;
+
+    const setConnected = (connected: boolean) => {
+      streamConnectedRef.current = connected;
+      setStreamConnected(connected);
+    };
+
+    const connect = () => {
+      socket = new WebSocket(`${API_BASE_URL.replace(/^http/, "ws")}/ws/state`);
+      socket.onopen = () => {
+        retryDelay = 500;
+        setConnected(true);
+      };
+      socket.onmessage = (message) => {
+        const status = JSON.parse(message.data);
+        setFireableState(status.fireable);
+        setTrackingMode(status.tracking_mode || "off");
+        setReleaseTime(status.release_time || 0.5);
+      };
+      socket.onclose = () => {
+        setConnected(false);
+        if (!closed) {
+          retryTimer = setTimeout(connect, retryDelay);
+          retryDelay = Math.min(retryDelay * 2, 10000);
+        }
+      };
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      if (retryTimer) clearTimeout(retryTimer);
+      socket?.close();
+    };
+  }, [API_BASE_URL]);
+
+  // Polling is only a fallback while the stream is down (it sends a snapshot on connect)
+  useEffect(() => {
+    if (streamConnected) {
+      return;
+    }
     fetchCurrentState();
 
     // Set up polling interval (every 3 seconds, slightly slower to reduce load)
@@ -139,7 +190,7 @@ export function useRobotState(): [RobotState, RobotActions] {
     }, 3000);
 
     return () => clearInterval(interval);
-  }, [fetchCurrentState, isLoading]);
+  }, [fetchCurrentState, isLoading, streamConnected]);
 
   const state: RobotState = {
     fireableState,
@@ -2,18 +2,66 @@
 """
 Simple Solenoid Control Script
 Turns the solenoid on and off with basic commands
+
+Valves are pulsed with binary frames (see robo-drink/arduino/arudino.ino):
+
+    host -> board  0xA5, seq, channel, pulse ms (uint16 LE), checksum
+    board -> host  0x5A, seq, channel, status, checksum
+
+The board times each pulse, so pulse() returns as soon as the frame is
+written, and valves on different channels can be open at the same time.
+A channel that is still open holds a new pulse on that channel back until
+it closes; other channels are not affected.
 """
 
 import os
 import sys
 import time
 import argparse
+import struct
+import threading
 import serial
 from serial.tools import list_ports
 
+FRAME_SYNC = 0xA5
+REPLY_SYNC = 0x5A
+FRAME = struct.Struct('<BBBHB')  # sync, seq, channel, pulse ms, checksum
+REPLY = struct.Struct('<BBBBB')  # sync, seq, channel, status, checksum
+OPENED, CLOSED, BAD_CHANNEL, BAD_CHECKSUM = 1, 2, 3, 4
+STATUS_NAMES = {OPENED: 'opened', CLOSED: 'closed', BAD_CHANNEL: 'bad_channel', BAD_CHECKSUM: 'bad_checksum'}
+MAX_PULSE_MS = 10000  # the sketch clamps longer pulses
+DEFAULT_CHANNELS = 4  # VALVE_PINS in the sketch
+
+
+def encode_pulse(seq, channel, pulse_ms):
+    """Command frame opening `channel` for `pulse_ms` (0 closes it)"""
+    pulse_ms = max(0, min(MAX_PULSE_MS, int(pulse_ms)))
+    checksum = seq ^ channel ^ (pulse_ms & 0xFF) ^ (pulse_ms >> 8)
+    return FRAME.pack(FRAME_SYNC, seq, channel, pulse_ms, checksum)
+
+
+def decode_reply(data):
+    """(seq, channel, status) of a reply frame, or None if the checksum does not match"""
+    sync, seq, channel, status, checksum = REPLY.unpack(data)
+    if sync != REPLY_SYNC or seq ^ channel ^ status != checksum:
+        return None
+    return seq, channel, status
+
+
 class SolenoidController:
-    def __init__(self, baudrate=9600):
+    def __init__(self, baudrate=9600, channels=DEFAULT_CHANNELS):
         self.ser = self.connect_to_arduino()
+        self.channels = channels
+        self._lock = threading.Lock()  # one writer on the wire at a time
+        self._seq = 0
+        self._busy_until = [0.0] * channels  # monotonic time each valve closes
+        self._channel_seq = [None] * channels  # seq of each channel's latest pulse
+        self._sent_at = {}  # seq -> monotonic send time, until the board acknowledges
+        self.counts = {"sent": 0, "opened": 0, "closed": 0, "bad_channel": 0, "bad_checksum": 0, "lost": 0}
+        self.last_ack_ms = None
+        self.running = True
+        self._reader = threading.Thread(target=self._read_replies, daemon=True)
+        self._reader.start()
 
         
     def list_available_ports(self) -> list[str]:
@@ -79,6 +127,92 @@ class SolenoidController:
         self.ser.write(b"0")
         print("Solenoid: OFF")
 
+    def pulse(self, seconds, channel=0):
+        """Open one valve for `seconds`; the board closes it"""
+        self.volley([(channel, seconds)])
+
+    def volley(self, valves):
+        """Open several valves at once, [(channel, seconds), ...], in a single write.
+
+        Waits only while one of the requested channels is still open from an
+        earlier pulse.
+        """
+        for channel, _ in valves:
+            if not 0 <= channel < self.channels:
+                raise ValueError(f"Valve channel {channel} out of range 0-{self.channels - 1}")
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(self._busy_until[channel] for channel, _ in valves) - now
+                if wait <= 0:
+                    frames = []
+                    for channel, seconds in valves:
+                        self._seq = (self._seq + 1) & 0xFF
+                        self._sent_at[self._seq] = now
+                        frames.append(encode_pulse(self._seq, channel, seconds * 1000))
+                        self._busy_until[channel] = now + seconds
+                        self._channel_seq[channel] = self._seq
+                    self.ser.write(b"".join(frames))
+                    self.ser.flush()
+                    self.counts["sent"] += len(frames)
+                    return
+            time.sleep(wait)
+
+    def _read_replies(self):
+        buffer = b""
+        while self.running:
+            try:
+                buffer += self.ser.read(max(1, self.ser.in_waiting))
+            except (serial.SerialException, OSError, TypeError):
+                if not self.running:
+                    return
+                time.sleep(0.5)
+                continue
+            # Skip anything that is not a reply frame (e.g. the legacy text replies)
+            while len(buffer) >= REPLY.size:
+                start = buffer.find(bytes([REPLY_SYNC]))
+                if start < 0:
+                    buffer = b""
+                    break
+                if len(buffer) - start < REPLY.size:
+                    buffer = buffer[start:]
+                    break
+                reply = decode_reply(buffer[start:start + REPLY.size])
+                if reply is None:
+                    buffer = buffer[start + 1:]
+                    continue
+                buffer = buffer[start + REPLY.size:]
+                self._on_reply(*reply)
+
+    def _on_reply(self, seq, channel, status):
+        with self._lock:
+            self.counts[STATUS_NAMES.get(status, 'lost')] += 1
+            sent_at = self._sent_at.pop(seq, None)
+            if status != OPENED and 0 <= channel < self.channels and self._channel_seq[channel] == seq:
+                # The latest pulse closed or was rejected: the channel is free again
+                self._busy_until[channel] = min(self._busy_until[channel], time.monotonic())
+            # Frames the board never answered (e.g. corrupted on the wire)
+            stale = [s for s, at in self._sent_at.items() if time.monotonic() - at > 1.0]
+            for s in stale:
+                del self._sent_at[s]
+            self.counts["lost"] += len(stale)
+        if status == OPENED and sent_at is not None:
+            self.last_ack_ms = round((time.monotonic() - sent_at) * 1000, 2)
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "channels": self.channels,
+                "open": [channel for channel in range(self.channels) if self._busy_until[channel] > now],
+                "last_ack_ms": self.last_ack_ms,
+                **self.counts,
+            }
+
+    def close(self):
+        self.running = False
+        self.ser.close()
+
 
 def main():
     serial_controller = SolenoidController()
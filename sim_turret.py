@@ -0,0 +1,196 @@
+"""
+Simulated pan/tilt turret for running Brain without an NXT brick or Arduino.
+
+Drop-in for PanTiltTurretController as far as Brain uses it: motor tachos,
+rotate_both/rotate_pan/rotate_tilt, fire, move_through, the background,
+interruptible reset (the same HomingMotion the real controller uses) and
+MotorTelemetry snapshots of the interpolated motor positions. Motors
+travel on the same MotorModel speed profile the real controller's
+MotionPlanner assumes, rotate_both synchronizes the axes and waits for both
+like the real controller does, so actuation latency shows up in benchmarks.
+Every command is logged with a timestamp.
+"""
+
+import math
+import threading
+import time
+
+from motor_telemetry import CommandLog, MotorTelemetry
+from turret import HomingMotion, MotionPlanner, MotorModel
+
+
+class SimulatedTacho:
+    def __init__(self, tacho_count=0):
+        self.tacho_count = tacho_count
+
+
+class SimulatedMotor:
+    def __init__(self, name, max_speed=900.0, accel=6000.0, clock=time.monotonic):
+        self.name = name
+        self.model = MotorModel(max_speed, accel)
+        self.clock = clock  # replay (telemetry_recorder.py) drives a virtual clock
+        self.position = 0
+        self.busy_until = 0.0
+        self.started_at = 0.0
+        self.start_position = 0
+        self.power = 0
+        self.time_scale = 1.0
+
+    def get_tacho(self):
+        return SimulatedTacho(self.position)
+
+    def is_ready(self):
+        return self.clock() >= self.busy_until
+
+    def move(self, power, angle, time_scale):
+        """Start a move of `angle` degrees; sign of `power` gives the direction"""
+        if not angle or not power:
+            return
+        self.start_position = self.position
+        self.power = power
+        self.time_scale = time_scale
+        self.position += angle if power > 0 else -angle
+        self.started_at = self.clock()
+        self.busy_until = self.started_at + self.model.move_time(angle, power) * time_scale
+
+    def tacho_at(self, now):
+        """Position at `now` along the move's speed profile"""
+        if now >= self.busy_until:
+            return self.position
+        angle = self.position - self.start_position
+        covered = self.model.position_at(abs(angle), self.power, (now - self.started_at) / self.time_scale)
+        return self.start_position + int(math.copysign(covered, angle))
+
+    def state(self):
+        """(tacho, power, running), as MotorTelemetry reads a real motor"""
+        now = self.clock()
+        running = now < self.busy_until
+        return self.tacho_at(now), self.power if running else 0, running
+
+    def brake(self):
+        """Stop mid-move where the motor is now"""
+        now = self.clock()
+        if now < self.busy_until:
+            self.position = self.tacho_at(now)
+            self.busy_until = now
+
+
+class SimulatedTurretController:
+    def __init__(self, max_speed=900.0, time_scale=1.0, cooldown=5.0, valve_channels=4):
+        self.pan_motor = SimulatedMotor('pan', max_speed)
+        self.tilt_motor = SimulatedMotor('tilt', max_speed)
+        self.time_scale = time_scale  # 0 makes every move instantaneous
+        self.fire_cooldown = cooldown
+        self.valve_channels = valve_channels
+        self.valve_busy_until = [0.0] * valve_channels
+        self.planner = MotionPlanner(self.pan_motor.model, self.tilt_motor.model)
+        self.sync_axes = True
+        self.last_fire = None
+        self.perf = None  # PerfRecorder, set by Brain
+        self.commands = []  # dicts with 'type', 'timestamp' and the command arguments
+        self.command_log = CommandLog()  # as the real controller keeps it
+        self._lock = threading.Lock()
+        self._motion_lock = threading.RLock()
+        self.homing = HomingMotion(self)
+        self.telemetry = MotorTelemetry(lambda: {'pan': self.pan_motor.state(), 'tilt': self.tilt_motor.state()})
+        self.telemetry.start()
+
+    def _log(self, kind, **fields):
+        fields.update({'type': kind, 'timestamp': time.monotonic()})
+        with self._lock:
+            self.commands.append(fields)
+
+    def _wait_ready(self, *motors, cancel=None):
+        """False if `cancel` was set before the motors were idle"""
+        busy_until = max(motor.busy_until for motor in motors)
+        wait = busy_until - time.monotonic()
+        if wait > 0:
+            if cancel is None:
+                time.sleep(wait)
+            elif cancel.wait(wait):
+                return False
+            if self.perf is not None:
+                # Same issue-to-ready sample the real controller records when it has to wait
+                started = max(motor.started_at for motor in motors)
+                self.perf.record('motor_ready', int((busy_until - started) * 1e9))
+        return True
+
+    def positions(self):
+        return self.pan_motor.position, self.tilt_motor.position
+
+    def wait_ready(self, cancel=None):
+        return self._wait_ready(self.pan_motor, self.tilt_motor, cancel=cancel)
+
+    def stop_motion(self):
+        with self._motion_lock:
+            self.pan_motor.brake()
+            self.tilt_motor.brake()
+            self.command_log.append(0, 0, 0, 0, time.monotonic())
+        self._log('stop', pan=self.pan_motor.position, tilt=self.tilt_motor.position)
+
+    def rotate_pan(self, power, angle):
+        self._wait_ready(self.pan_motor)
+        self.pan_motor.move(power, angle, self.time_scale)
+        self.command_log.append(power, angle, 0, 0, time.monotonic())
+        self._log('rotate', pan_power=power, pan_angle=angle, tilt_power=0, tilt_angle=0)
+        return True
+
+    def rotate_tilt(self, power, angle):
+        self._wait_ready(self.tilt_motor)
+        self.tilt_motor.move(power, angle, self.time_scale)
+        self.command_log.append(0, 0, power, angle, time.monotonic())
+        self._log('rotate', pan_power=0, pan_angle=0, tilt_power=power, tilt_angle=angle)
+        return True
+
+    def rotate_both(self, pan_power, pan_angle, tilt_power, tilt_angle, preemptible=False):
+        if not preemptible and self.homing.active:
+            self.homing.cancel()
+        with self._motion_lock:
+            cancel = self.homing.cancel_event if preemptible else None
+            if not self._wait_ready(self.pan_motor, self.tilt_motor, cancel=cancel):
+                return False
+            if preemptible and self.homing.cancelled:
+                return False
+            if self.sync_axes:
+                pan_power, tilt_power, _ = self.planner.synchronize(pan_power, pan_angle, tilt_power, tilt_angle)
+            self.pan_motor.move(pan_power, pan_angle, self.time_scale)
+            self.tilt_motor.move(tilt_power, tilt_angle, self.time_scale)
+            self.command_log.append(pan_power, pan_angle, tilt_power, tilt_angle, time.monotonic())
+        self._log('rotate', pan_power=pan_power, pan_angle=pan_angle, tilt_power=tilt_power, tilt_angle=tilt_angle)
+        return True
+
+    def fire(self, release_time=0.5, cooldown=None, valves=None):
+        """Log a shot; like the real solenoid, shots inside the cooldown are swallowed"""
+        now = time.monotonic()
+        cooldown = self.fire_cooldown if cooldown is None else cooldown
+        valves = valves or [(0, release_time)]
+        suppressed = self.last_fire is not None and now - self.last_fire < cooldown * self.time_scale
+        if not suppressed:
+            self.last_fire = now
+            for channel, seconds in valves:
+                self.valve_busy_until[channel] = now + seconds
+        self._log('fire', release_time=release_time, valves=[list(valve) for valve in valves], suppressed=suppressed)
+
+    def valve_stats(self):
+        now = time.monotonic()
+        return {"channels": self.valve_channels,
+                "open": [channel for channel, until in enumerate(self.valve_busy_until) if until > now],
+                "sent": sum(len(c['valves']) for c in self.commands if c['type'] == 'fire' and not c['suppressed'])}
+
+    def move_through(self, waypoints, power=50, start=None):
+        if start is None:
+            start = (self.pan_motor.position, self.tilt_motor.position)
+        moves = self.planner.segments(start, waypoints, power)
+        for move in moves:
+            self.rotate_both(*move)
+        return len(moves)
+
+    def reset(self, target_pan=0, target_tilt=0, via=(), wait=False):
+        self.homing.start(list(via) + [(target_pan, target_tilt)])
+        if wait:
+            self.homing.wait()
+        return self.homing.state
+
+    def destroy(self):
+        self.homing.cancel(wait=True)
+        self.telemetry.stop()
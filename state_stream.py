@@ -0,0 +1,81 @@
+"""
+Server-push robot state for the kiosk.
+
+Brain emits 'state_changed' from whatever thread changed something (API
+handlers, tracker threads). StateBroadcaster coalesces those notifications and
+pushes the latest Brain.get_state() snapshot to every connected WebSocket at
+most `max_rate` times per second.
+"""
+
+import asyncio
+from typing import Optional, Set
+
+from fastapi import WebSocket, WebSocketDisconnect
+
+
+class StateBroadcaster:
+    def __init__(self, brain, max_rate=20):
+        self.brain = brain
+        self.min_interval = 1.0 / max_rate
+        self._clients: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dirty: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the push loop; must be called from the server's event loop"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._dirty = asyncio.Event()
+        self._task = self._loop.create_task(self._push_loop())
+        self.brain.on('state_changed', self._on_state_changed)
+
+    async def stop(self):
+        self.brain.off('state_changed', self._on_state_changed)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _on_state_changed(self, _event):
+        # Called from brain/tracker threads; only flag the change, never block them
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._dirty.set)
+
+    async def _push_loop(self):
+        while True:
+            await self._dirty.wait()
+            self._dirty.clear()
+            state = self.brain.get_state()
+            for client in list(self._clients):
+                # Each client only ever holds the newest snapshot
+                if client.full():
+                    client.get_nowait()
+                client.put_nowait(state)
+            await asyncio.sleep(self.min_interval)
+
+    async def serve(self, websocket: WebSocket):
+        """Run one WebSocket connection until the client goes away"""
+        await websocket.accept()
+        client: asyncio.Queue = asyncio.Queue(maxsize=1)
+        client.put_nowait(self.brain.get_state())
+        self._clients.add(client)
+
+        async def send_updates():
+            while True:
+                await websocket.send_json(await client.get())
+
+        sender = asyncio.create_task(send_updates())
+        try:
+            # The kiosk never sends anything; receiving is how a disconnect is noticed
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+        finally:
+            sender.cancel()
+            self._clients.discard(client)
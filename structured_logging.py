@@ -0,0 +1,216 @@
+"""
+Structured, rate-limited logging for the tracking hot path.
+
+Brain's detection handlers and the turret used to print several lines per
+frame; at 30 fps that console I/O shows up in the aim latency and blocks
+whenever stdout is a slow terminal or pipe. Hot-path code logs events here
+instead:
+
+    log = get_logger('brain')
+    log.debug('aim', target='face', axis='pan', direction='left', power=pan_power)
+
+Events are filtered (level, per-event rate limit and sampling) in the
+calling thread, then handed to a bounded queue; a QueueListener thread does
+the formatting and writing. A full queue drops records rather than blocking
+the caller. Output is one JSON object per line, or key=value text.
+
+Configure once at startup with setup_logging(); KETCHUP_LOG_LEVEL and
+KETCHUP_LOG_FORMAT (json|text) override the defaults.
+"""
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+ROOT_LOGGER = 'ketchup_bot'
+
+# Events per second allowed through per (logger, event); the rest are counted and dropped
+DEFAULT_RATE_LIMIT = 10.0
+RATE_LIMITS = {
+    'face_detected': 2.0,
+    'hotdog_detected': 2.0,
+    'aim': 5.0,
+    'motor_command': 5.0,
+}
+# Keep 1 in N of these before rate limiting
+SAMPLE_EVERY = {}
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Token bucket per (logger, event), with optional 1-in-N sampling.
+
+    Checked before a LogRecord is even built, so a suppressed event costs
+    a dict lookup and a little arithmetic.
+    """
+
+    def __init__(self, rate_limits=None, default_rate=DEFAULT_RATE_LIMIT, sample_every=None):
+        self.configure(rate_limits, default_rate, sample_every)
+        self._lock = threading.Lock()
+
+    def configure(self, rate_limits=None, default_rate=DEFAULT_RATE_LIMIT, sample_every=None):
+        self.rate_limits = dict(RATE_LIMITS if rate_limits is None else rate_limits)
+        self.default_rate = default_rate
+        self.sample_every = dict(SAMPLE_EVERY if sample_every is None else sample_every)
+        self._buckets = {}  # key -> [tokens, last_refill, suppressed, seen]
+
+    def allow(self, name, event):
+        """None to drop the record, otherwise how many were dropped since the last one let through"""
+        rate = self.rate_limits.get(event, self.default_rate)
+        sample = self.sample_every.get(event, 1)
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get((name, event))
+            if bucket is None:
+                bucket = self._buckets[(name, event)] = [rate, now, 0, 0]
+            bucket[3] += 1
+            if sample > 1 and bucket[3] % sample:
+                bucket[2] += 1
+                return None
+            if rate:
+                bucket[0] = min(rate, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+                if bucket[0] < 1:
+                    bucket[2] += 1
+                    return None
+                bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+        return suppressed
+
+
+_limiter = RateLimiter()
+
+
+class EventLogger:
+    """Thin wrapper that logs an event name plus keyword fields.
+
+    Below WARNING, events go through the rate limiter; warnings and errors
+    always get through.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+
+    def _log(self, level, event, fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        suppressed = 0
+        if level < logging.WARNING:
+            suppressed = _limiter.allow(self.logger.name, event)
+            if suppressed is None:
+                return
+        self.logger.log(level, event, extra={'event': event, 'fields': fields, 'suppressed': suppressed})
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, **fields):
+        self._log(logging.ERROR, event, fields)
+
+
+def get_logger(name) -> EventLogger:
+    return EventLogger(logging.getLogger(f'{ROOT_LOGGER}.{name}'))
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: records are dropped (and counted) when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Formatting happens on the listener thread; only make args safe to hand over
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _record_fields(record):
+    data = {
+        'ts': round(record.created, 6),
+        'level': record.levelname.lower(),
+        'logger': record.name[len(ROOT_LOGGER) + 1:] if record.name.startswith(ROOT_LOGGER + '.') else record.name,
+        'event': getattr(record, 'event', None) or record.msg,
+    }
+    data.update(getattr(record, 'fields', None) or {})
+    suppressed = getattr(record, 'suppressed', 0)
+    if suppressed:
+        data['suppressed'] = suppressed
+    return data
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = _record_fields(record)
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        data = _record_fields(record)
+        timestamp = time.strftime('%H:%M:%S', time.localtime(data.pop('ts')))
+        head = f"{timestamp} {data.pop('level'):<7} {data.pop('logger')} {data.pop('event')}"
+        line = ' '.join([head] + [f"{key}={value}" for key, value in data.items()])
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+def setup_logging(level=None, fmt=None, stream=None, queue_size=10000, rate_limits=None,
+                  default_rate=DEFAULT_RATE_LIMIT, sample_every=None):
+    """Install the queue handler and start the writer thread; safe to call more than once"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return _listener
+        level = level or os.environ.get('KETCHUP_LOG_LEVEL', 'INFO')
+        fmt = fmt or os.environ.get('KETCHUP_LOG_FORMAT', 'json')
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(TextFormatter() if fmt == 'text' else JsonFormatter())
+
+        _limiter.configure(rate_limits, default_rate, sample_every)
+        handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(level.upper() if isinstance(level, str) else level)
+        root.addHandler(handler)
+        root.propagate = False
+
+        _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        _listener = None
+        root = logging.getLogger(ROOT_LOGGER)
+        for handler in list(root.handlers):
+            if isinstance(handler, DroppingQueueHandler):
+                root.removeHandler(handler)
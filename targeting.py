@@ -0,0 +1,171 @@
+"""
+Targeting policies: how Brain aims at and fires on each kind of target.
+
+A target class (face, hotdog, ...) is a TargetPolicy holding its dead zone,
+fire zone, dwell time before firing, power/step curves and aim offset. Brain
+has one detection handler that looks up the policy for the event's kind, so
+adding a target class is a new default_policies() entry rather than another copy
+of the handler.
+
+The error-to-command curves are linear from the edge of the dead zone
+(minimum power/step) to the edge of the frame (maximum), clamped, with the
+same arithmetic the old per-handler map_range closures used. bind() compiles
+each axis into an integer lookup table indexed by signed pixel error, so an
+aim command is two list lookups; the tables are only rebuilt when a policy's
+tunables change (TargetPolicy.updated). bench_aim.py measures the difference.
+"""
+
+import math
+
+# Sign of the motor power for a positive pixel error: target right of center
+# pans with negative power, target below center tilts with positive power.
+PAN_SIGN = -1
+TILT_SIGN = 1
+
+
+def _is_number(value):
+    return not isinstance(value, bool) and isinstance(value, (int, float)) and math.isfinite(value)
+
+
+class AxisCurve:
+    """Pixel error on one axis -> (signed power, step in degrees), via a table built once"""
+
+    def __init__(self, dead_zone, max_error, power_range, step_range, sign):
+        self.dead_zone = dead_zone
+        self.max_error = max(max_error, 1)
+        self.min_power, self.max_power = power_range
+        self.min_step, self.max_step = step_range
+        self.sign = sign
+        # Hoisted out of the per-event path
+        self._span = self.max_error - dead_zone
+        self._power_span = self.max_power - self.min_power
+        self._step_span = self.max_step - self.min_step
+        # Entry i is the command for error i - extent; past the frame edge and the dead zone the curve is flat
+        self._extent = max(self.max_error, dead_zone + 1)
+        self._table = [self.compute(error) for error in range(-self._extent, self._extent + 1)]
+        self._last = len(self._table) - 1
+
+    def command(self, error):
+        """(power, step) for `error`; (0, 0) inside the dead zone"""
+        if error.__class__ is not int:
+            return self.compute(error)
+        index = error + self._extent
+        if index < 0:
+            return self._table[0]
+        if index > self._last:
+            return self._table[self._last]
+        return self._table[index]
+
+    def compute(self, error):
+        """The curve evaluated in floating point; what the table is built from"""
+        mag = abs(error)
+        if mag <= self.dead_zone:
+            return 0, 0
+        if self._span <= 0:
+            power, step = self.min_power, self.min_step
+        else:
+            t = max(0.0, min(1.0, (mag - self.dead_zone) / self._span))
+            power = self.min_power + t * self._power_span
+            step = self.min_step + t * self._step_span
+        power = int(round(power))
+        return (power if (error > 0) == (self.sign > 0) else -power), int(round(step))
+
+
+class TargetPolicy:
+    TUNABLES = ('dead_zone', 'fire_zone', 'dwell', 'hold_while_dwelling', 'home_on_lost', 'offset',
+                'pan_power', 'pan_step', 'tilt_power', 'tilt_step')
+
+    def __init__(self, name, dead_zone, fire_zone=None, dwell=0.0, hold_while_dwelling=False, home_on_lost=False,
+                 offset=(0, 0), pan_power=(18, 100), pan_step=(1, 20), tilt_power=(18, 100), tilt_step=(1, 10)):
+        self.name = name
+        self.dead_zone = dead_zone  # pixels around center where the turret does not move
+        self.fire_zone = fire_zone if fire_zone is not None else dead_zone  # pixels within which a shot is allowed
+        self.dwell = dwell  # seconds the target must stay in the fire zone before firing
+        self.hold_while_dwelling = hold_while_dwelling  # stop aiming once the dwell has started
+        self.home_on_lost = home_on_lost  # send the turret home when the target disappears
+        self.offset = offset  # (x, y) pixels added to the detection before computing the error
+        self.pan_power = pan_power  # (min, max) motor power
+        self.pan_step = pan_step  # (min, max) degrees per command
+        self.tilt_power = tilt_power
+        self.tilt_step = tilt_step
+        self.pan = None
+        self.tilt = None
+        self.center = None
+
+    def bind(self, center_x, center_y):
+        """Build the per-axis curves for a frame centered on (center_x, center_y)"""
+        self.center = (center_x, center_y)
+        self.pan = AxisCurve(self.dead_zone, center_x, self.pan_power, self.pan_step, PAN_SIGN)
+        self.tilt = AxisCurve(self.dead_zone, center_y, self.tilt_power, self.tilt_step, TILT_SIGN)
+        return self
+
+    def updated(self, **tunables):
+        """A validated copy with `tunables` changed and its lookup tables rebuilt.
+
+        Returning a new policy lets Brain swap it in with one assignment while
+        detection handlers keep using the old one.
+        """
+        unknown = set(tunables) - set(self.TUNABLES)
+        if unknown:
+            raise ValueError(f"Unknown {self.name} tunables: {', '.join(sorted(unknown))}")
+        values = self.to_dict()
+        values.update(tunables)
+        for key in ('dead_zone', 'fire_zone'):
+            if isinstance(values[key], bool) or not isinstance(values[key], int) or values[key] < 0:
+                raise ValueError(f"{key} must be a non-negative integer (pixels)")
+        if not _is_number(values['dwell']) or values['dwell'] < 0:
+            raise ValueError("dwell must be a number of seconds >= 0")
+        for key in ('hold_while_dwelling', 'home_on_lost'):
+            if not isinstance(values[key], bool):
+                raise ValueError(f"{key} must be true or false")
+        for key in ('offset', 'pan_power', 'pan_step', 'tilt_power', 'tilt_step'):
+            if not isinstance(values[key], (list, tuple)) or len(values[key]) != 2 \
+                    or not all(_is_number(v) for v in values[key]):
+                raise ValueError(f"{key} must be a pair of numbers")
+        for key in ('pan_power', 'pan_step', 'tilt_power', 'tilt_step'):
+            if values[key][0] > values[key][1]:
+                raise ValueError(f"{key} must be ordered (min, max)")
+        for key in ('pan_step', 'tilt_step'):
+            if values[key][0] < 0:
+                raise ValueError(f"{key} values must be >= 0 degrees")
+        for key in ('pan_power', 'tilt_power'):
+            if not all(0 <= abs(v) <= 100 for v in values[key]):
+                raise ValueError(f"{key} values must be within motor power range 0-100")
+
+        policy = TargetPolicy(self.name, **{key: tuple(value) if isinstance(value, list) else value
+                                            for key, value in values.items()})
+        return policy.bind(*self.center) if self.center is not None else policy
+
+    def error(self, x, y):
+        return x + self.offset[0] - self.center[0], y + self.offset[1] - self.center[1]
+
+    def in_fire_zone(self, dx, dy):
+        return abs(dx) < self.fire_zone and abs(dy) < self.fire_zone
+
+    def aim(self, dx, dy):
+        """(pan_power, pan_angle, tilt_power, tilt_angle) that move toward the target"""
+        return self.pan.command(dx) + self.tilt.command(dy)
+
+    def to_dict(self):
+        return {
+            "dead_zone": self.dead_zone,
+            "fire_zone": self.fire_zone,
+            "dwell": self.dwell,
+            "hold_while_dwelling": self.hold_while_dwelling,
+            "home_on_lost": self.home_on_lost,
+            "offset": list(self.offset),
+            "pan_power": list(self.pan_power),
+            "pan_step": list(self.pan_step),
+            "tilt_power": list(self.tilt_power),
+            "tilt_step": list(self.tilt_step),
+        }
+
+
+def default_policies(face_dead_zone=150, hotdog_dead_zone=100):
+    """Face and hotdog defaults"""
+    return {
+        # A short dwell confirms the face is really centered rather than passing through
+        'face': TargetPolicy('face', face_dead_zone, dwell=0.25, home_on_lost=True),
+        # A hotdog has to sit in the fire zone for a second; the turret holds still meanwhile
+        'hotdog': TargetPolicy('hotdog', hotdog_dead_zone, dwell=1.0, hold_while_dwelling=True),
+    }
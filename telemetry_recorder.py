@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Motor telemetry recorder and trajectory replay.
+
+TelemetryRecorder listens to the controller's MotorTelemetry snapshots (one
+per tick, so a fixed sample rate) and packs them into fixed-size binary
+records in a preallocated ring buffer:
+
+    timestamp, pan/tilt tacho, pan/tilt power and angle of a command,
+    ms between that command and the sample, target pixel error, flags
+
+A tick with no new command is one record. Otherwise every command issued
+since the previous tick (from the controller's CommandLog, stops included)
+gets its own record with that tick's tachos, so a brake and the aim that
+pre-empted it in the same tick are both replayed.
+
+Recording is a struct.pack_into into memory on the telemetry thread; no file
+I/O happens there. dump() copies the ring out and writes it from the caller's
+thread (Brain does this from the API, on a worker thread).
+
+replay() feeds a recording's commands into simulated motors on a virtual
+clock and compares the simulated tachos with the recorded ones, so motor
+model parameters can be fitted offline against real recorded dynamics:
+
+    python telemetry_recorder.py replay telemetry/20261019-120000.ktl
+    python telemetry_recorder.py replay telemetry/20261019-120000.ktl --fit
+"""
+
+import argparse
+import json
+import math
+import os
+import struct
+import threading
+import time
+
+from sim_turret import SimulatedMotor
+
+TELEMETRY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'telemetry')
+
+MAGIC = b'KBTL'
+VERSION = 1
+HEADER = struct.Struct('<4sHHI')  # magic, version, record size, record count
+# t, pan tacho, tilt tacho, pan power, tilt power, pan angle, tilt angle, command age ms, error x, error y, flags
+RECORD = struct.Struct('<diibbhhHhhB')
+FIELDS = ('t', 'pan_tacho', 'tilt_tacho', 'pan_power', 'tilt_power', 'pan_angle', 'tilt_angle',
+          'command_age_ms', 'error_x', 'error_y', 'flags')
+FLAG_COMMAND = 0x01  # a command was issued since the previous sample
+FLAG_TARGET = 0x02  # error_x/error_y hold a target's pixel error
+INT8_MAX = 127
+INT16_MAX = 32767
+INT32_MAX = 2147483647
+
+
+def _clamp(value, limit):
+    """`value` as an int within the signed field range; struct.pack would raise on anything outside it"""
+    return max(-limit, min(limit, int(value)))
+
+
+class TelemetryRecorder:
+    def __init__(self, controller, capacity=30000):
+        """`capacity` samples (10 minutes at the default 50 Hz telemetry tick, ~0.8 MB)"""
+        self.controller = controller
+        self.capacity = capacity
+        self.buffer = bytearray(RECORD.size * capacity)
+        self.count = 0  # samples written since start; the ring holds the last `capacity`
+        self.recording = False
+        self.started_at = None
+        self._error = None  # (dx, dy) of the current target
+        self._last_seq = 0  # last CommandLog entry recorded
+        self._lock = threading.Lock()  # guards the ring between the telemetry thread and snapshot_bytes()
+
+    def start(self):
+        if not self.recording:
+            self.recording = True
+            self.started_at = time.time()
+            self._last_seq = self.controller.command_log.last_seq()
+            self.controller.telemetry.on('snapshot', self._on_snapshot)
+
+    def stop(self):
+        self.recording = False
+
+    def note_error(self, error):
+        """Current target pixel error (dx, dy), or None when there is no target"""
+        self._error = error
+
+    def _on_snapshot(self, snapshot):
+        if not self.recording:
+            return
+        timestamp = snapshot['timestamp']
+        commands = self.controller.command_log.since(self._last_seq)
+        if commands:
+            self._last_seq = commands[-1][0]
+        flags = 0
+        error = self._error
+        error_x = error_y = 0
+        if error is not None:
+            error_x, error_y = _clamp(error[0], INT16_MAX), _clamp(error[1], INT16_MAX)
+            flags |= FLAG_TARGET
+        records = [(0, 0, 0, 0, 0, flags)]
+        if commands:
+            records = [(_clamp(pan_power, INT8_MAX), _clamp(tilt_power, INT8_MAX), _clamp(pan_angle, INT16_MAX),
+                        _clamp(tilt_angle, INT16_MAX), min(65535, max(0, int((timestamp - commanded_at) * 1000))),
+                        flags | FLAG_COMMAND)
+                       for _, pan_power, pan_angle, tilt_power, tilt_angle, commanded_at in commands]
+        pan_tacho = _clamp(snapshot['pan']['tacho'], INT32_MAX)
+        tilt_tacho = _clamp(snapshot['tilt']['tacho'], INT32_MAX)
+        with self._lock:
+            for pan_power, tilt_power, pan_angle, tilt_angle, age_ms, record_flags in records:
+                RECORD.pack_into(self.buffer, (self.count % self.capacity) * RECORD.size, timestamp, pan_tacho,
+                                 tilt_tacho, pan_power, tilt_power, pan_angle, tilt_angle, age_ms, error_x, error_y,
+                                 record_flags)
+                self.count += 1
+
+    def snapshot_bytes(self):
+        """The recorded samples, oldest first"""
+        with self._lock:
+            if self.count <= self.capacity:
+                return bytes(self.buffer[:self.count * RECORD.size])
+            split = (self.count % self.capacity) * RECORD.size
+            return bytes(self.buffer[split:] + self.buffer[:split])
+
+    def dump(self, path=None):
+        """Write the ring to `path` (default telemetry/<time>.ktl); returns the path and sample count"""
+        data = self.snapshot_bytes()
+        if path is None:
+            os.makedirs(TELEMETRY_DIR, exist_ok=True)
+            path = os.path.join(TELEMETRY_DIR, time.strftime('%Y%m%d-%H%M%S') + '.ktl')
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, len(data) // RECORD.size))
+            f.write(data)
+        os.replace(tmp_path, path)
+        return {"path": path, "samples": len(data) // RECORD.size}
+
+    def stats(self):
+        return {
+            "recording": self.recording,
+            "samples": min(self.count, self.capacity),
+            "written": self.count,
+            "capacity": self.capacity,
+            "bytes_per_sample": RECORD.size,
+        }
+
+
+def load(path):
+    """A dumped recording as a list of sample dicts"""
+    with open(path, 'rb') as f:
+        magic, version, record_size, count = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError(f"{path} is not a version {VERSION} telemetry recording")
+        data = f.read(record_size * count)
+    return [dict(zip(FIELDS, values)) for values in RECORD.iter_unpack(data)]
+
+
+def replay(samples, max_speed=900.0, accel=6000.0):
+    """Re-run the recorded commands on simulated motors; tacho error between simulation and recording"""
+    if not samples:
+        return {"samples": 0}
+    now = [samples[0]['t']]
+    clock = lambda: now[0]
+    motors = {axis: SimulatedMotor(axis, max_speed, accel, clock=clock) for axis in ('pan', 'tilt')}
+    squared = {'pan': 0.0, 'tilt': 0.0}
+    worst = {'pan': 0, 'tilt': 0}
+    scored = 0
+    commanded = False
+    for i, sample in enumerate(samples):
+        if not commanded and not sample['flags'] & FLAG_COMMAND:
+            # A wrapped ring can start mid-move; follow the recording until its first command
+            for axis, motor in motors.items():
+                motor.position = sample[f'{axis}_tacho']
+            continue
+        if sample['flags'] & FLAG_COMMAND:
+            commanded = True
+            # Issue at the command's own time, not the sample's
+            now[0] = sample['t'] - sample['command_age_ms'] / 1000
+            stop = not any(sample[field] for field in ('pan_power', 'pan_angle', 'tilt_power', 'tilt_angle'))
+            for axis, motor in motors.items():
+                angle = sample[f'{axis}_angle']
+                if stop:
+                    motor.brake()  # stop_motion
+                elif angle:
+                    motor.move(sample[f'{axis}_power'], angle, 1.0)
+        if i + 1 < len(samples) and samples[i + 1]['t'] == sample['t']:
+            continue  # more commands from the same tick; compare once they are all issued
+        now[0] = sample['t']
+        for axis, motor in motors.items():
+            error = motor.tacho_at(now[0]) - sample[f'{axis}_tacho']
+            squared[axis] += error * error
+            worst[axis] = max(worst[axis], abs(error))
+        scored += 1
+    n = max(scored, 1)
+    return {
+        "samples": scored,
+        "seconds": round(samples[-1]['t'] - samples[0]['t'], 2),
+        "max_speed": max_speed,
+        "accel": accel,
+        "rms_error_deg": {axis: round(math.sqrt(total / n), 2) for axis, total in squared.items()},
+        "max_error_deg": worst,
+    }
+
+
+def fit(samples, speeds=range(300, 1501, 50), accels=range(1000, 20001, 1000)):
+    """Grid search for the motor model that best reproduces the recording"""
+    def score(result):
+        return sum(result["rms_error_deg"].values())
+    return min((replay(samples, speed, accel) for speed in speeds for accel in accels), key=score)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a motor telemetry recording in the simulator")
+    sub = parser.add_subparsers(dest='command', required=True)
+    run = sub.add_parser('replay', help="Compare a recording with the simulated motor model")
+    run.add_argument('path')
+    run.add_argument('--max-speed', type=float, default=900.0, help="Degrees per second at power 100")
+    run.add_argument('--accel', type=float, default=6000.0, help="Degrees per second squared")
+    run.add_argument('--fit', action='store_true', help="Search for the best max speed and acceleration")
+    args = parser.parse_args()
+
+    samples = load(args.path)
+    result = fit(samples) if args.fit else replay(samples, args.max_speed, args.accel)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
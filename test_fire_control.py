@@ -0,0 +1,88 @@
+"""
+FireControl running a planned multi-target burst (dispense_planner.plan_shots)
+on a fake clock: shot order, pulse spacing, and the switch to the next
+target when the valve closes.
+
+    python -m pytest test_fire_control.py
+"""
+
+import pytest
+
+from dispense_planner import plan_shots
+from fire_control import COOLDOWN, FIRING, LOCKED, FireControl
+
+DWELL = 0.4  # the target policies' dwell
+PULSE = 0.5
+GAP = 0.3
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def burst():
+    clock = FakeClock()
+    fire_control = FireControl(cooldown=5.0, release_time=PULSE, clock=clock)
+    shots = []
+    fire_control.on('fire', lambda shot: shots.append((clock.now, shot)))
+    fire_control.arm(True)
+    return clock, fire_control, shots
+
+
+def advance(clock, fire_control, seconds):
+    clock.now += seconds
+    fire_control.tick()
+
+
+def test_plan_groups_targets_and_skips_dwell_on_follow_up_shots():
+    steps = plan_shots(['ketchup', 'mustard', 'relish'], face_index=1, default_pulse=PULSE)
+    assert [(step['condiment'], step['target'], step['dwell']) for step in steps] == [
+        ('ketchup', 'hotdog', None), ('relish', 'hotdog', 0.0), ('mustard', 'face', None)]
+
+
+def test_burst_fires_in_plan_order_spaced_by_pulse_and_gap():
+    clock, fire_control, shots = burst()
+    steps = plan_shots(['ketchup', 'mustard', 'relish'], face_index=1, default_pulse=PULSE)
+
+    # First shot: lock on the hotdog, fire at the dwell deadline
+    fire_control.set_plan(steps[0]['target'], steps[0]['pulse'], steps[0]['dwell'], GAP, steps[0]['valves'])
+    assert fire_control.observe('hotdog', (0, 0), True, DWELL) == LOCKED
+    advance(clock, fire_control, DWELL)
+    assert fire_control.state == FIRING
+    assert len(shots) == 1
+
+    # Follow-up on the same hotdog: no dwell, only the gap after the pulse
+    fire_control.set_plan(steps[1]['target'], steps[1]['pulse'], steps[1]['dwell'], GAP, steps[1]['valves'])
+    advance(clock, fire_control, PULSE)
+    assert fire_control.state == COOLDOWN
+    fire_control.observe('hotdog', (0, 0), True, DWELL)
+    advance(clock, fire_control, GAP)  # the lock's zero dwell expires in the same tick
+    assert len(shots) == 2
+    assert shots[1][0] - shots[0][0] == pytest.approx(PULSE + GAP)
+
+    # The face shot is planned while the hotdog pulse still runs
+    fire_control.set_plan(steps[2]['target'], steps[2]['pulse'], steps[2]['dwell'], GAP, steps[2]['valves'])
+    assert fire_control.pre_aiming('face')
+    assert not fire_control.pre_aiming('hotdog')
+    assert fire_control.observe('face', (0, 0), True, DWELL) == FIRING
+    advance(clock, fire_control, PULSE)
+    fire_control.observe('face', (0, 0), True, DWELL)
+    advance(clock, fire_control, GAP)
+    assert fire_control.state == LOCKED and fire_control.kind == 'face'
+    advance(clock, fire_control, DWELL)
+
+    assert [shot['kind'] for _, shot in shots] == ['hotdog', 'hotdog', 'face']
+    assert all(shot['planned'] and shot['pulse'] == PULSE for _, shot in shots)
+    assert shots[2][0] - shots[1][0] == pytest.approx(PULSE + GAP + DWELL)
+
+
+def test_planned_shot_ignores_the_other_target_class():
+    clock, fire_control, shots = burst()
+    fire_control.set_plan('face', PULSE, None, GAP)
+    assert fire_control.observe('hotdog', (0, 0), True, DWELL) != LOCKED
+    advance(clock, fire_control, DWELL)
+    assert shots == []
@@ -7,6 +7,7 @@ import threading
 import time
 import cv2
 from brain import Brain
+from overlay import render_overlay
 
 class ThreadedBrainWithDisplay:
     def __init__(self):
@@ -81,70 +82,9 @@ class ThreadedBrainWithDisplay:
                     display_frame = None
                 
                 if display_frame is not None:
-                    # Draw crosshair at center
-                    cv2.line(display_frame, (self.brain.center_x - 50, self.brain.center_y), 
-                            (self.brain.center_x + 50, self.brain.center_y), (255, 255, 255), 2)
-                    cv2.line(display_frame, (self.brain.center_x, self.brain.center_y - 50), 
-                            (self.brain.center_x, self.brain.center_y + 50), (255, 255, 255), 2)
-                    
-                    # Draw dead zone
-                    if self.brain.current_mode == 'face':
-                        dead_zone_size = self.brain.face_threshold_distance
-                        cv2.rectangle(display_frame, 
-                                    (self.brain.center_x - dead_zone_size, self.brain.center_y - dead_zone_size),
-                                    (self.brain.center_x + dead_zone_size, self.brain.center_y + dead_zone_size),
-                                    (0, 255, 255), 2)  # Yellow for face dead zone
-                    
-                    # Perform face detection on display frame and draw bounding boxes
-                    if self.brain.current_mode == 'face' and hasattr(self.brain, 'face_tracker'):
-                        try:
-                            # Get face detections from the frame
-                            face_detection = self.brain.face_tracker.get_biggest_face_coordinates(display_frame)
-                            if face_detection is not None:
-                                x, y, w, h = face_detection
-                                # Draw face bounding box
-                                cv2.rectangle(display_frame, (x, y), (x + w, y + h), (0, 255, 0), 3)  # Green for faces
-                                cv2.putText(display_frame, "FACE", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                                
-                                # Draw center point
-                                center_x = x + w // 2
-                                center_y = y + h // 2
-                                cv2.circle(display_frame, (center_x, center_y), 5, (0, 255, 0), -1)
-                                
-                                # Show coordinates
-                                cv2.putText(display_frame, f"({center_x}, {center_y})", (center_x + 10, center_y), 
-                                          cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-                        except Exception as e:
-                            # Don't let detection errors crash the display
-                            pass
-                    
-                    elif self.brain.current_mode == 'hotdog' and hasattr(self.brain, 'hotdog_recognizer'):
-                        try:
-                            # Get hotdog detections from the frame  
-                            hotdog_detection = self.brain.hotdog_recognizer.get_biggest_hotdog_coordinates(display_frame)
-                            if hotdog_detection is not None:
-                                x, y, w, h = hotdog_detection
-                                # Draw hotdog bounding box
-                                cv2.rectangle(display_frame, (x, y), (x + w, y + h), (0, 0, 255), 3)  # Red for hotdogs
-                                cv2.putText(display_frame, "HOTDOG", (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                                
-                                # Draw center point
-                                center_x = x + w // 2
-                                center_y = y + h // 2
-                                cv2.circle(display_frame, (center_x, center_y), 5, (0, 0, 255), -1)
-                                
-                                # Show coordinates
-                                cv2.putText(display_frame, f"({center_x}, {center_y})", (center_x + 10, center_y), 
-                                          cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
-                        except Exception as e:
-                            # Don't let detection errors crash the display
-                            pass
-                    
-                    # Show status
-                    mode_text = f"Mode: {self.brain.current_mode or 'IDLE'}"
-                    fire_text = f"Fireable: {'YES' if self.brain.fireable else 'NO'}"
-                    cv2.putText(display_frame, mode_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                    cv2.putText(display_frame, fire_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+                    # Crosshair, dead zone, tracked box and status come from the
+                    # trackers' detection store; no inference on display frames
+                    render_overlay(display_frame, self.brain)
                     
                     cv2.imshow("Threaded Ketchup Bot", display_frame)
                 
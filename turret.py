@@ -1,12 +1,207 @@
-import asyncio
 import nxt.locator
 import nxt.motor
 from nxt.motcont import MotCont
+from nxt.motor import RunState
+from event_system import EventEmitter
+from motor_telemetry import CommandLog, MotorTelemetry
 from serial_controller import SolenoidController
+from structured_logging import get_logger
 
+import math
 import time
 import threading
 
+log = get_logger('turret')
+
+# Start polling readiness this long before a move's predicted end
+READY_POLL_MARGIN = 0.02
+
+
+class MotorModel:
+    """Trapezoidal speed profile of one NXT motor: speed proportional to power, limited acceleration"""
+
+    def __init__(self, max_speed=900.0, accel=6000.0, min_power=18, max_power=100):
+        self.max_speed = max_speed  # degrees per second at power 100
+        self.accel = accel  # degrees per second squared
+        self.min_power = min_power  # below this the motor stalls on friction
+        self.max_power = max_power
+
+    def speed(self, power):
+        return self.max_speed * min(abs(power), 100) / 100
+
+    def move_time(self, angle, power):
+        """Seconds to travel `angle` degrees at `power`, accelerating and decelerating at the ends"""
+        if not angle:
+            return 0.0
+        speed = self.speed(power)
+        if speed <= 0:
+            return math.inf
+        if angle >= speed * speed / self.accel:
+            return angle / speed + speed / self.accel
+        return 2 * math.sqrt(angle / self.accel)  # never reaches full speed
+
+    def position_at(self, angle, power, elapsed):
+        """Degrees covered `elapsed` seconds into a move of `angle` degrees, on the same profile as move_time"""
+        total = self.move_time(angle, power)
+        if elapsed >= total:
+            return angle
+        if elapsed <= 0:
+            return 0.0
+        speed = self.speed(power)
+        ramp = speed / self.accel
+        if angle < speed * ramp:
+            ramp = total / 2  # triangular profile
+        if elapsed < ramp:
+            return 0.5 * self.accel * elapsed * elapsed
+        if elapsed > total - ramp:
+            left = total - elapsed
+            return angle - 0.5 * self.accel * left * left
+        return 0.5 * self.accel * ramp * ramp + speed * (elapsed - ramp)
+
+    def power_for_time(self, angle, duration):
+        """Lowest power that covers `angle` in `duration` (clamped to the usable power range)"""
+        a = self.accel
+        disc = a * a * duration * duration - 4 * a * angle
+        if disc < 0:
+            return self.max_power
+        speed = (a * duration - math.sqrt(disc)) / 2
+        power = math.ceil(speed / self.max_speed * 100)
+        return max(self.min_power, min(self.max_power, power))
+
+
+class MotionPlanner:
+    """Coordinates pan and tilt so both axes arrive together.
+
+    The slower axis keeps its requested power; the faster one is slowed to
+    finish at the same time, so the aim point moves in a straight line
+    instead of an L, and the controller knows when the move will be done.
+    """
+
+    def __init__(self, pan_model=None, tilt_model=None):
+        self.pan_model = pan_model or MotorModel()
+        self.tilt_model = tilt_model or MotorModel()
+
+    def synchronize(self, pan_power, pan_angle, tilt_power, tilt_angle):
+        """Return (pan_power, tilt_power, duration) for a move where both axes finish together"""
+        pan_time = self.pan_model.move_time(pan_angle, pan_power) if pan_angle else 0.0
+        tilt_time = self.tilt_model.move_time(tilt_angle, tilt_power) if tilt_angle else 0.0
+        duration = max(pan_time, tilt_time)
+        if pan_angle and tilt_angle and math.isfinite(duration):
+            if pan_time < tilt_time:
+                power = min(abs(pan_power), self.pan_model.power_for_time(pan_angle, duration))
+                pan_power = int(math.copysign(power, pan_power))
+            elif tilt_time < pan_time:
+                power = min(abs(tilt_power), self.tilt_model.power_for_time(tilt_angle, duration))
+                tilt_power = int(math.copysign(power, tilt_power))
+            duration = max(self.pan_model.move_time(pan_angle, pan_power),
+                           self.tilt_model.move_time(tilt_angle, tilt_power))
+        return pan_power, tilt_power, duration
+
+    def segments(self, start, waypoints, power=50):
+        """Relative moves visiting absolute (pan, tilt) tacho `waypoints` in order from `start`.
+
+        Each item is (pan_power, pan_angle, tilt_power, tilt_angle) with
+        rotate_both's sign conventions; a positive tacho delta is positive power.
+        """
+        moves = []
+        pan, tilt = start
+        for target_pan, target_tilt in waypoints:
+            pan_delta, tilt_delta = target_pan - pan, target_tilt - tilt
+            if pan_delta or tilt_delta:
+                moves.append((power if pan_delta > 0 else -power, abs(pan_delta),
+                              power if tilt_delta > 0 else -power, abs(tilt_delta)))
+            pan, tilt = target_pan, target_tilt
+        return moves
+
+
+class HomingMotion(EventEmitter):
+    """Background move to a home position that any aim command can interrupt.
+
+    Works with any controller that has a planner, positions(), wait_ready(),
+    stop_motion() and rotate_both(..., preemptible=True). Emits
+    'homing_started', 'homing_progress' (after each leg), and one of
+    'homing_done', 'homing_cancelled' or 'homing_failed'. Every payload
+    carries the run's 'generation', so listeners can tell the finish of a run
+    that start() replaced from the finish of the current one.
+    """
+
+    def __init__(self, controller):
+        super().__init__()
+        self.controller = controller
+        self.state = 'idle'  # idle, homing, done, cancelled, failed
+        self.progress = None
+        self.generation = 0  # incremented by every start()
+        self.thread = None
+        self.cancel_event = threading.Event()  # set by cancel(); the controller's waits watch it
+        self._finished = threading.Event()
+        self._finished.set()
+
+    @property
+    def active(self):
+        return self.state == 'homing'
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def start(self, waypoints, power=50):
+        """Start homing through absolute (pan, tilt) `waypoints`; a homing already running is replaced"""
+        # Bumped first: the replaced run reports 'homing_cancelled' under its own, now stale, generation
+        self.generation += 1
+        generation = self.generation
+        self.cancel(wait=True)
+        self.cancel_event.clear()
+        self._finished.clear()
+        self.state = 'homing'
+        self.progress = None
+        self.thread = threading.Thread(target=self._run, args=(list(waypoints), power, generation), daemon=True)
+        self.thread.start()
+
+    def _run(self, waypoints, power, generation):
+        started = time.monotonic()
+        try:
+            # Plan from where the previous move actually ends
+            ready = self.controller.wait_ready(self.cancel_event)
+            start = self.controller.positions()
+            legs = self.controller.planner.segments(start, waypoints, power) if ready else []
+            self.progress = {'leg': 0, 'legs': len(legs), 'position': start, 'target': waypoints[-1],
+                             'generation': generation}
+            self.emit('homing_started', dict(self.progress))
+            for index, leg in enumerate(legs, 1):
+                # Both calls return False as soon as an aim command cancels the homing
+                if not self.controller.rotate_both(*leg, preemptible=True):
+                    break
+                if not self.controller.wait_ready(self.cancel_event):
+                    break
+                self.progress = dict(self.progress, leg=index, position=self.controller.positions())
+                self.emit('homing_progress', dict(self.progress))
+            self.state = 'cancelled' if self.cancelled else 'done'
+            log.info(f'homing_{self.state}', elapsed=round(time.monotonic() - started, 3), **self.progress)
+            self.emit(f'homing_{self.state}', dict(self.progress, elapsed=time.monotonic() - started))
+        except Exception as e:
+            self.state = 'failed'
+            log.warning('homing_failed', error=str(e))
+            self.emit('homing_failed', {'error': str(e), 'generation': generation})
+        finally:
+            self._finished.set()
+
+    def cancel(self, wait=False):
+        """Stop a running homing where it is (the motors are braked); with `wait`, until its thread has exited"""
+        if not self.active:
+            return False
+        self.cancel_event.set()
+        self.controller.stop_motion()
+        if wait and self.thread is not threading.current_thread():
+            self._finished.wait()
+        return True
+
+    def wait(self, timeout=None):
+        """Block until the current homing finishes; returns False on timeout"""
+        return self._finished.wait(timeout)
+
+    def status(self):
+        return {"state": self.state, "progress": self.progress}
+
 
 class PanTiltTurretController:
     def __init__(self, pan_motor_port, tilt_motor_port):
@@ -16,8 +211,22 @@ class PanTiltTurretController:
         self.pan_motor = None
         self.tilt_motor = None
         self.solenoid_controller = SolenoidController()
+        self.valve_channels = self.solenoid_controller.channels
         self.cooldown = time.time() - 15 # Initialize cooldown timer
+        self.fire_cooldown = 5.0  # seconds between shots
         self.cooldown_lock = threading.Lock()
+        self.perf = None  # PerfRecorder, set by Brain
+        self._last_command_ns = None
+        self.planner = MotionPlanner()
+        self.sync_axes = True  # scale the faster axis so pan and tilt arrive together
+        self._ready_at = 0.0  # monotonic time the last move is predicted to finish
+        self._commanded_at = 0.0  # monotonic time of the last motor command
+        # Every command as sent (after synchronization), for the telemetry recorder
+        self.command_log = CommandLog()
+        self._motion_lock = threading.RLock()  # one thread talks to MotorControl at a time
+        self.homing = HomingMotion(self)
+        # Every tacho/readiness read goes through one poller (started once the brick is up)
+        self.telemetry = MotorTelemetry(self._read_motor_state)
 
         # Try to initialize brick with 3 retries
         max_retries = 3
@@ -62,48 +271,22 @@ class PanTiltTurretController:
         
         #turret should be positioned at 0,0 to reset tacho count
         self.MotCont.reset_tacho([self.pan_motor_port, self.tilt_motor_port])
+        self.telemetry.start()
 
-    async def async_rotate_pan(self, power, angle):
-        self.MotCont.cmd(self.pan_motor_port, power, angle)
-        while not self.MotCont.is_ready(self.pan_motor_port):
-            await asyncio.sleep(0.01)
-        return True
-
-    async def async_rotate_tilt(self, power, angle):
-        self.MotCont.cmd(self.tilt_motor_port, power, angle)
-        while not self.MotCont.is_ready(self.tilt_motor_port):
-            await asyncio.sleep(0.01)
-        return True
-
-    async def async_reset(self, mode:str):
-        '''reset position of pan and tilt motors to 0,0'''
-        pan_tacho = self.pan_motor.get_tacho().tacho_count
-        tilt_tacho = self.tilt_motor.get_tacho().tacho_count
-        factor_y = 1
-        factor_x = 1
-        if pan_tacho < 0:
-            pan_tacho = -pan_tacho
-            factor_x = -1
-        if tilt_tacho < 0:
-            factor_y = -1
-            tilt_tacho = -tilt_tacho
-        print(f"Pan tacho: {pan_tacho}")
-        print(f"Tilt tacho: {tilt_tacho}")
-        asyncio.run(self.async_rotate_pan(-50*factor_x, pan_tacho))
-        print(f"Pan tacho: {pan_tacho}")
-        asyncio.run(self.async_rotate_tilt(-50*factor_y, tilt_tacho))
-        print(f"Tilt tacho: {tilt_tacho}")
-
-        if mode == "face":
-            self.rotate_tilt(-3, 6)
-        elif mode == "hotdog":
-            self.rotate_tilt(3, 6)
+    def _read_motor_state(self):
+        """One output-state read per motor: {axis: (tacho, power, running)}"""
+        state = {}
+        for axis, port in (('pan', self.pan_motor_port), ('tilt', self.tilt_motor_port)):
+            _, power, _, _, _, run_state, _, tacho_count, _, _ = self.brick.get_output_state(port)
+            state[axis] = (tacho_count, power, run_state != RunState.IDLE and power != 0)
+        return state
 
     def rotate_pan(self, power, angle):
         '''positive power is clockwise, negative power is counterclockwise'''
         while not self.MotCont.is_ready(self.pan_motor_port):
             pass
         self.MotCont.cmd(self.pan_motor_port, power, angle)
+        self.command_log.append(power, angle, 0, 0, time.monotonic())
         return True
     
     def rotate_tilt(self, power, angle):
@@ -111,83 +294,143 @@ class PanTiltTurretController:
         while not self.MotCont.is_ready(self.tilt_motor_port):
             pass
         self.MotCont.cmd(self.tilt_motor_port, power, angle)
+        self.command_log.append(0, 0, power, angle, time.monotonic())
         return True
 
-    def rotate_both(self, pan_power: int, pan_angle: int, tilt_power: int, tilt_angle: int) -> bool:
-        """Issue pan & tilt commands together so they move at the same time."""
-        # Wait until both are ready before sending either command
-        while not (self.MotCont.is_ready(self.pan_motor_port) and self.MotCont.is_ready(self.tilt_motor_port)):
-            pass
+    def positions(self):
+        """Current (pan, tilt) tacho counts, from the latest telemetry snapshot when it is running"""
+        if self.telemetry.running and self.telemetry.latest() is not None:
+            return self.telemetry.tachos('pan', 'tilt')
+        return self.pan_motor.get_tacho().tacho_count, self.tilt_motor.get_tacho().tacho_count
+
+    def _motors_ready(self):
+        if self.telemetry.running:
+            # Wakes once per telemetry tick; no USB traffic of our own
+            return self.telemetry.is_ready(self.telemetry.next_snapshot(), since=self._commanded_at)
+        with self._motion_lock:
+            return self.MotCont.is_ready(self.pan_motor_port) and self.MotCont.is_ready(self.tilt_motor_port)
+
+    def _wait_ready(self, cancel=None):
+        """Block until both motors accept commands; None if `cancel` was set first, else whether we had to wait"""
+        # Sleep through the predicted rest of the previous move instead of polling the brick over USB
+        waited = False
+        remaining = self._ready_at - READY_POLL_MARGIN - time.monotonic()
+        if remaining > 0:
+            if cancel is None:
+                time.sleep(remaining)
+            elif cancel.wait(remaining):
+                return None
+            waited = True
+        while not self._motors_ready():
+            if cancel is not None and cancel.is_set():
+                return None
+            waited = True
+        return waited
+
+    def wait_ready(self, cancel=None):
+        """Block until both motors are idle; False if the threading.Event `cancel` was set first"""
+        return self._wait_ready(cancel) is not None
+
+    def stop_motion(self):
+        """Brake both motors where they are"""
+        with self._motion_lock:
+            self.MotCont.set_output_state([self.pan_motor_port, self.tilt_motor_port], 0, 0, True)
+            self._ready_at = self._commanded_at = time.monotonic()
+            self.command_log.append(0, 0, 0, 0, self._commanded_at)
+        log.debug('motion_stopped')
+
+    def rotate_both(self, pan_power: int, pan_angle: int, tilt_power: int, tilt_angle: int,
+                    preemptible: bool = False) -> bool:
+        """Issue pan & tilt commands together so they move at the same time (and, with sync_axes, arrive together).
 
-        if pan_angle:
-            self.MotCont.cmd(self.pan_motor_port, pan_power, pan_angle)
-        if tilt_angle:
-            self.MotCont.cmd(self.tilt_motor_port, tilt_power, tilt_angle)
+        An aim command interrupts a homing motion in progress. Homing issues its
+        legs with `preemptible`, which returns False without moving once cancelled.
+        """
+        if not preemptible and self.homing.active:
+            self.homing.cancel()
+        with self._motion_lock:
+            # Wait until both are ready before sending either command
+            waited = self._wait_ready(self.homing.cancel_event if preemptible else None)
+            if waited is None or (preemptible and self.homing.cancelled):
+                return False
+            if waited and self.perf is not None and self._last_command_ns is not None:
+                # Readiness was seen while waiting, so this is the previous move's issue-to-ready time
+                self.perf.record('motor_ready', time.perf_counter_ns() - self._last_command_ns)
+
+            duration = 0.0
+            if self.sync_axes:
+                pan_power, tilt_power, duration = self.planner.synchronize(pan_power, pan_angle, tilt_power, tilt_angle)
+            if pan_angle:
+                self.MotCont.cmd(self.pan_motor_port, pan_power, pan_angle)
+            if tilt_angle:
+                self.MotCont.cmd(self.tilt_motor_port, tilt_power, tilt_angle)
+            self._last_command_ns = time.perf_counter_ns()
+            self._commanded_at = time.monotonic()
+            self._ready_at = self._commanded_at + duration
+            self.command_log.append(pan_power, pan_angle, tilt_power, tilt_angle, self._commanded_at)
         # Fire both commands back-to-back
-        print(f"Rotating pan: {pan_power} at angle {pan_angle}, tilt: {tilt_power} at angle {tilt_angle}")
+        log.debug('motor_command', pan_power=pan_power, pan_angle=pan_angle, tilt_power=tilt_power, tilt_angle=tilt_angle)
         return True
 
-    def _fire_worker(self, release_time):
+    def _fire_worker(self, valves, cooldown):
         with self.cooldown_lock:
-            if self.cooldown + 5 < time.time():
+            if self.cooldown + cooldown < time.time():
                 self.cooldown = time.time()
-                self.solenoid_controller.solenoid_on()
-                time.sleep(release_time)
-                self.solenoid_controller.solenoid_off()
-
-    def fire(self, release_time=0.5):
-        '''fire ketchup using serial_controller in a separate thread'''
-        threading.Thread(target=self._fire_worker, args=(release_time,), daemon=True).start()
-
-    def reset(self, target_pan=0, target_tilt=0):
-        '''reset position of pan and tilt motors to target positions (default 0,0)'''
-        current_pan = self.pan_motor.get_tacho().tacho_count
-        current_tilt = self.tilt_motor.get_tacho().tacho_count
-        
-        # Calculate movement needed to reach target positions
-        pan_movement = current_pan - target_pan
-        tilt_movement = current_tilt - target_tilt
-        
-        print(f"Current position - Pan: {current_pan}, Tilt: {current_tilt}")
-        print(f"Target position - Pan: {target_pan}, Tilt: {target_tilt}")
-        print(f"Movement needed - Pan: {pan_movement}, Tilt: {tilt_movement}")
-        
-        # Determine movement direction and power
-        pan_power = 0
-        tilt_power = 0
-        pan_angle = abs(pan_movement)
-        tilt_angle = abs(tilt_movement)
-        
-        if pan_movement > 0:
-            pan_power = -50  # Move counter-clockwise to reduce position
-        elif pan_movement < 0:
-            pan_power = 50   # Move clockwise to increase position
-            
-        if tilt_movement > 0:
-            tilt_power = -50  # Move up to reduce position
-        elif tilt_movement < 0:
-            tilt_power = 50   # Move down to increase position
-
-        # Only move if there's actual movement needed
-        if pan_angle > 0 or tilt_angle > 0:
-            self.rotate_both(pan_power, pan_angle, tilt_power, tilt_angle)
-            print(f"Reset complete - moved to target position")
-        else:
-            print("Already at target position - no movement needed")
-            
+                self.solenoid_controller.volley(valves)
+
+    def fire(self, release_time=0.5, cooldown=None, valves=None):
+        '''fire ketchup using serial_controller in a separate thread; `cooldown` overrides fire_cooldown for this shot
+
+        `valves` is [(channel, seconds), ...] to open several condiment valves together (default channel 0)
+        '''
+        cooldown = self.fire_cooldown if cooldown is None else cooldown
+        valves = valves or [(0, release_time)]
+        threading.Thread(target=self._fire_worker, args=(valves, cooldown), daemon=True).start()
+
+    def valve_stats(self):
+        return self.solenoid_controller.stats()
+
+    def move_through(self, waypoints, power=50, start=None):
+        """Visit absolute (pan, tilt) tacho positions in order, one synchronized move per leg.
+
+        Blocks until every move is issued; returns the number of moves.
+        """
+        if start is None:
+            start = self.positions()
+        moves = self.planner.segments(start, waypoints, power)
+        for move in moves:
+            self.rotate_both(*move)
+        return len(moves)
+
+    def reset(self, target_pan=0, target_tilt=0, via=(), wait=False):
+        '''move pan and tilt back to target positions (default 0,0), passing through `via` waypoints.
+
+        Runs in the background as self.homing; the next aim command interrupts it.
+        With `wait`, blocks until homing finishes. Returns the homing state.
+        '''
+        log.info('reset', target_pan=target_pan, target_tilt=target_tilt, via=list(via))
+        self.homing.start(list(via) + [(target_pan, target_tilt)])
+        if wait:
+            self.homing.wait()
+        return self.homing.state
+
     def destroy(self):
+        self.homing.cancel(wait=True)
+        self.telemetry.stop()
         self.MotCont.stop()
+        self.solenoid_controller.close()
 
-async def main():
+def main():
     controller = PanTiltTurretController(nxt.motor.Port.B, nxt.motor.Port.A)
     if controller is None:
         print("Failed to initialize controller")
         exit(1)
-    await controller.async_rotate_pan(-30, 45)
-    await controller.async_rotate_tilt(30, 45)
-    controller.reset("face")
+    controller.homing.on('homing_progress', lambda progress: print(f"🏠 Homing {progress}"))
+    controller.rotate_both(-30, 45, 30, 45)
+    controller.wait_ready()
+    controller.reset(wait=True)
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
 
 
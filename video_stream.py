@@ -0,0 +1,100 @@
+"""
+Multipart MJPEG stream of the annotated tracking frames.
+
+The tracking pipeline publishes frames it has already processed; nothing here
+runs inference. Each frame is JPEG-encoded at most once per quality level and
+the bytes are shared by every viewer. Viewers always get the newest frame
+(older ones are skipped), and a viewer whose connection cannot keep up is
+moved down to a lower quality level.
+"""
+
+import asyncio
+import threading
+import time
+
+import cv2
+from starlette.concurrency import run_in_threadpool
+
+BOUNDARY = "frame"
+QUALITY_LEVELS = (80, 60, 40)
+
+
+class MJPEGStreamer:
+    def __init__(self, max_fps=15, quality_levels=QUALITY_LEVELS):
+        self.frame_interval = 1.0 / max_fps
+        self.quality_levels = quality_levels
+        self._lock = threading.Lock()
+        self._frame = None
+        self._seq = 0
+        self._jpeg_cache = {}
+        self._viewers = 0
+        self.encoded_frames = 0
+
+    @property
+    def has_viewers(self):
+        return self._viewers > 0
+
+    def publish(self, frame):
+        """Hand over the newest annotated frame; cheap, encoding happens on demand"""
+        with self._lock:
+            self._frame = frame
+            self._seq += 1
+            self._jpeg_cache = {}
+
+    def _get_jpeg(self, quality):
+        """Return (seq, jpeg bytes) for the current frame, encoding it once per quality level"""
+        with self._lock:
+            seq = self._seq
+            frame = self._frame
+            jpeg = self._jpeg_cache.get(quality)
+        if frame is None or jpeg is not None:
+            return seq, jpeg
+        ok, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            return seq, None
+        jpeg = buffer.tobytes()
+        with self._lock:
+            if self._seq == seq:
+                self._jpeg_cache.setdefault(quality, jpeg)
+                jpeg = self._jpeg_cache[quality]
+                self.encoded_frames += 1
+        return seq, jpeg
+
+    def _get_jpeg_cached(self, quality):
+        with self._lock:
+            return self._seq, self._jpeg_cache.get(quality)
+
+    async def stream(self):
+        """Async generator of multipart chunks for one viewer"""
+        self._viewers += 1
+        level = 0
+        last_seq = 0
+        try:
+            while True:
+                start_time = time.monotonic()
+                if self._seq != last_seq:
+                    quality = self.quality_levels[level]
+                    seq, jpeg = self._get_jpeg_cached(quality)
+                    if jpeg is None:
+                        seq, jpeg = await run_in_threadpool(self._get_jpeg, quality)
+                    if jpeg is not None:
+                        last_seq = seq
+                        send_start = time.monotonic()
+                        yield (
+                            f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                            f"Content-Length: {len(jpeg)}\r\n\r\n"
+                        ).encode('ascii') + jpeg + b"\r\n"
+                        # A slow consumer keeps us waiting on the send; adapt quality to it
+                        send_time = time.monotonic() - send_start
+                        if send_time > self.frame_interval and level < len(self.quality_levels) - 1:
+                            level += 1
+                        elif send_time < self.frame_interval / 4 and level > 0:
+                            level -= 1
+                sleep_time = self.frame_interval - (time.monotonic() - start_time)
+                await asyncio.sleep(max(0.0, sleep_time))
+        finally:
+            self._viewers -= 1
+
+    @property
+    def media_type(self):
+        return f"multipart/x-mixed-replace; boundary={BOUNDARY}"